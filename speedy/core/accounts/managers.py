@@ -1,4 +1,7 @@
-from django.db.models import Q
+from datetime import date
+
+from django.db.models import Q, F, Func, Value, DateField, IntegerField
+from django.db.models.functions import Cast
 
 from speedy.core.base.models import BaseManager, BaseUserManager
 from speedy.core.base.utils import normalize_username
@@ -33,6 +36,17 @@ class UserManager(BaseUserManager):
     def active(self, *args, **kwargs):
         return self.filter(is_active=True, *args, **kwargs)
 
+    def update_age(self):
+        """
+        Update the age of all the users whose age has changed since it was saved, usually because today is their birthday.
+        Returns the ids of the updated users.
+        """
+        age = Cast(Func(Value('year'), Func(Value(date.today(), output_field=DateField()), F('date_of_birth'), function='AGE'), function='DATE_PART'), output_field=IntegerField())
+        users_ids = list(self.annotate(current_age=age).exclude(age=F('current_age')).values_list('pk', flat=True))
+        if (len(users_ids) > 0):
+            self.filter(pk__in=users_ids).update(age=age)
+        return users_ids
+
     def _create_user(self, slug, password, **extra_fields):
         """
         Creates and saves a User with the given username and password.
@@ -1,5 +1,6 @@
 from django.conf import settings as django_settings
 from django.shortcuts import redirect
+from django.urls import resolve, Resolver404
 from django.utils.deprecation import MiddlewareMixin
 
 
@@ -17,6 +18,13 @@ class SiteProfileMiddleware(MiddlewareMixin):
             for url in django_settings.IGNORE_LAST_VISIT:
                 if (request.path.startswith(url)):
                     update_last_visit = False
+            if (update_last_visit):
+                # The view isn't resolved yet. Requests which are redirected below, or which don't resolve, still update the last visit.
+                try:
+                    if (resolve(request.path_info, urlconf=getattr(request, 'urlconf', None)).view_name in django_settings.IGNORE_LAST_VISIT_VIEW_NAMES):
+                        update_last_visit = False
+                except Resolver404:
+                    pass
             if (update_last_visit):
                 request.user.profile.update_last_visit()
             if (not (request.user.has_confirmed_email_or_registered_now)):
@@ -0,0 +1,32 @@
+# Generated by Django 2.1.15 on 2026-10-18 22:27
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import F, Func, Value
+from django.db.models.functions import Cast
+
+
+def update_age(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    User.objects.update(age=Cast(Func(Value('year'), Func(Value(date.today(), output_field=models.DateField()), F('date_of_birth'), function='AGE'), function='DATE_PART'), output_field=models.IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_auto_20200121_1731'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='age',
+            field=models.SmallIntegerField(blank=True, null=True, verbose_name='age'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'gender', 'age'], name='accounts_us_is_acti_0099c0_idx'),
+        ),
+        migrations.RunPython(update_age, reverse_code=migrations.RunPython.noop),
+    ]
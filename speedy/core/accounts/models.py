@@ -21,7 +21,7 @@ from translated_fields import TranslatedField
 
 from speedy.core.base.mail import send_mail
 from speedy.core.base.models import BaseManager, TimeStampedModel, SmallUDIDField, RegularUDIDField
-from speedy.core.base.utils import normalize_slug, normalize_username, generate_confirmation_token, get_age, string_is_not_empty, get_all_field_names
+from speedy.core.base.utils import normalize_slug, normalize_username, generate_confirmation_token, get_age, get_age_or_default, string_is_not_empty, get_all_field_names
 from speedy.core.uploads.fields import PhotoField
 from .managers import EntityManager, UserManager
 from .utils import get_site_profile_model, normalize_email
@@ -335,6 +335,7 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
     )
     gender = models.SmallIntegerField(verbose_name=_('I am'), choices=GENDER_CHOICES)
     date_of_birth = models.DateField(verbose_name=_('date of birth'))
+    age = models.SmallIntegerField(verbose_name=_('age'), blank=True, null=True)
     diet = models.SmallIntegerField(verbose_name=_('diet'), choices=DIET_CHOICES_WITH_DEFAULT, default=DIET_UNKNOWN)
     smoking_status = models.SmallIntegerField(verbose_name=_('smoking status'), choices=SMOKING_STATUS_CHOICES_WITH_DEFAULT, default=SMOKING_STATUS_UNKNOWN)
     relationship_status = models.SmallIntegerField(verbose_name=_('relationship status'), choices=RELATIONSHIP_STATUS_CHOICES_WITH_DEFAULT, default=RELATIONSHIP_STATUS_UNKNOWN)
@@ -458,6 +459,9 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
         verbose_name_plural = _('users')
         ordering = ('-last_login', 'id')
         swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            models.Index(fields=['is_active', 'gender', 'age']),
+        ]
 
     def __str__(self):
         # Depends on site: full name in Speedy Net, first name in Speedy Match.
@@ -476,6 +480,8 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
         # Superuser must be equal to staff.
         if (not (self.is_superuser == self.is_staff)):
             raise ValidationError(_("Superuser must be equal to staff."))
+        # The age is saved so users can be filtered by age in the database. It's updated daily by the update_age_field command.
+        self.age = get_age_or_default(date_of_birth=self.date_of_birth, default=None)
         return super().save(*args, **kwargs)
 
     def set_password(self, raw_password):
@@ -527,7 +533,7 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
     def get_absolute_url(self):
         return reverse('profiles:user', kwargs={'slug': self.slug})
 
-    def mail_user(self, template_name_prefix, context=None, send_to_unconfirmed=False):
+    def mail_user(self, template_name_prefix, context=None, send_to_unconfirmed=False, enqueue=None):
         site = Site.objects.get_current()
         context = context or {}
         addresses = self.email_addresses.filter(is_primary=True)
@@ -539,7 +545,7 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
             'user': self,
         })
         if (addresses):
-            return addresses[0].mail(template_name_prefix=template_name_prefix, context=context)
+            return addresses[0].mail(template_name_prefix=template_name_prefix, context=context, enqueue=enqueue)
         return False
 
     def get_full_name(self):
@@ -592,7 +598,8 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
             return received_friendship_requests
         elif (django_settings.SITE_ID == django_settings.SPEEDY_MATCH_SITE_ID):
             from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
-            received_friendship_requests = [friendship_request for friendship_request in received_friendship_requests if (self.speedy_match_profile.get_matching_rank(other_profile=friendship_request.from_user.profile) > SpeedyMatchSiteProfile.RANK_0)]
+            ranks = SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.speedy_match_profile, other_profiles=[friendship_request.from_user.profile for friendship_request in received_friendship_requests])
+            received_friendship_requests = [friendship_request for friendship_request in received_friendship_requests if (ranks[friendship_request.from_user.pk] > SpeedyMatchSiteProfile.RANK_0)]
             return received_friendship_requests
         else:
             raise NotImplementedError()
@@ -608,7 +615,8 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
             return sent_friendship_requests
         elif (django_settings.SITE_ID == django_settings.SPEEDY_MATCH_SITE_ID):
             from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
-            sent_friendship_requests = [friendship_request for friendship_request in sent_friendship_requests if (self.speedy_match_profile.get_matching_rank(other_profile=friendship_request.to_user.profile) > SpeedyMatchSiteProfile.RANK_0)]
+            ranks = SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.speedy_match_profile, other_profiles=[friendship_request.to_user.profile for friendship_request in sent_friendship_requests])
+            sent_friendship_requests = [friendship_request for friendship_request in sent_friendship_requests if (ranks[friendship_request.to_user.pk] > SpeedyMatchSiteProfile.RANK_0)]
             return sent_friendship_requests
         else:
             raise NotImplementedError()
@@ -632,7 +640,8 @@ class User(PermissionsMixin, Entity, AbstractBaseUser):
         if (django_settings.SITE_ID == django_settings.SPEEDY_NET_SITE_ID):
             return friends
         elif (django_settings.SITE_ID == django_settings.SPEEDY_MATCH_SITE_ID):
-            friends = [friendship for friendship in friends if (self.speedy_match_profile.get_matching_rank(other_profile=friendship.from_user.profile) > SiteProfile.RANK_0)]
+            ranks = SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.speedy_match_profile, other_profiles=[friendship.from_user.profile for friendship in friends])
+            friends = [friendship for friendship in friends if (ranks[friendship.from_user.pk] > SpeedyMatchSiteProfile.RANK_0)]
             return friends
         else:
             raise NotImplementedError()
@@ -741,7 +750,7 @@ class UserEmailAddress(CleanAndValidateAllFieldsMixin, TimeStampedModel):
     def _generate_confirmation_token(self):
         return generate_confirmation_token()
 
-    def mail(self, template_name_prefix, context=None):
+    def mail(self, template_name_prefix, context=None, enqueue=None):
         site = Site.objects.get_current()
         context = context or {}
         context.update({
@@ -749,7 +758,7 @@ class UserEmailAddress(CleanAndValidateAllFieldsMixin, TimeStampedModel):
             'user': self.user,
             'email_address': self,
         })
-        return send_mail(to=[self.email], template_name_prefix=template_name_prefix, context=context)
+        return send_mail(to=[self.email], template_name_prefix=template_name_prefix, context=context, enqueue=enqueue)
 
     def send_confirmation_email(self):
         if (self.user.has_confirmed_email):
@@ -0,0 +1,38 @@
+from django.conf import settings as django_settings
+
+if (django_settings.LOGIN_ENABLED):
+    from speedy.core.base.test import tests_settings
+    from speedy.core.base.test.models import SiteTestCase
+    from speedy.core.base.test.decorators import only_on_sites_with_login
+    from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+
+    @only_on_sites_with_login
+    class SiteProfileMiddlewareLastVisitTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user = ActiveUserFactory()
+            self.client.login(username=self.user.username, password=tests_settings.USER_PASSWORD)
+            self.last_visit = self.get_last_visit()
+
+        def get_last_visit(self):
+            return self.user.profile.__class__.objects.get(pk=self.user.profile.pk).last_visit
+
+        def test_visit_updates_last_visit(self):
+            r = self.client.get(path='/{}/'.format(self.user.slug))
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertGreater(a=self.get_last_visit(), b=self.last_visit)
+
+        def test_page_not_found_updates_last_visit(self):
+            r = self.client.get(path='/this-page-does-not-exist/a/b/c/')
+            self.assertEqual(first=r.status_code, second=404)
+            self.assertGreater(a=self.get_last_visit(), b=self.last_visit)
+
+        def test_redirected_inactive_user_updates_last_visit(self):
+            self.user.profile.deactivate()
+            self.last_visit = self.get_last_visit()
+            r = self.client.get(path='/{}/'.format(self.user.slug))
+            self.assertEqual(first=r.status_code, second=302)
+            self.assertGreater(a=self.get_last_visit(), b=self.last_visit)
+
+
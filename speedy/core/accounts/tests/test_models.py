@@ -517,6 +517,20 @@ if (django_settings.LOGIN_ENABLED):
             UserEmailAddressFactory(user=user, is_confirmed=True)
             self.assertTrue(expr=user.has_confirmed_email)
 
+        def test_age_is_saved(self):
+            user = DefaultUserFactory()
+            self.assertEqual(first=user.age, second=user.get_age())
+            self.assertEqual(first=User.objects.get(pk=user.pk).age, second=user.get_age())
+
+        def test_update_age(self):
+            user_1 = DefaultUserFactory()
+            user_2 = DefaultUserFactory()
+            User.objects.filter(pk=user_1.pk).update(age=user_1.get_age() - 1)
+            self.assertListEqual(list1=User.objects.update_age(), list2=[user_1.pk])
+            self.assertEqual(first=User.objects.get(pk=user_1.pk).age, second=user_1.get_age())
+            self.assertEqual(first=User.objects.get(pk=user_2.pk).age, second=user_2.get_age())
+            self.assertListEqual(list1=User.objects.update_age(), list2=[])
+
         def test_user_id_length(self):
             user = DefaultUserFactory()
             self.assertEqual(first=len(user.id), second=15)
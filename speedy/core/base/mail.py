@@ -4,52 +4,74 @@ from django.conf import settings as django_settings
 from django.contrib.sites.models import Site
 from django.core.mail import EmailMultiAlternatives
 from django.template.exceptions import TemplateDoesNotExist
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.utils import translation
 from django.utils.translation import gettext_lazy as _
 
 RenderedMail = namedtuple('RenderedMail', 'subject body_plain body_html')
-
-
-def render_mail(template_name_prefix, context=None, base_template_name_prefix='email/base'):
-    subject_template_name = '{}_subject.txt'.format(template_name_prefix)
-    plain_template_name = '{}_body.txt'.format(template_name_prefix)
-    html_template_name = '{}_body.html'.format(template_name_prefix)
-
-    plain_base_template_name = '{}_body.txt'.format(base_template_name_prefix)
-    html_base_template_name = '{}_body.html'.format(base_template_name_prefix)
-
-    context = context or {}
+MailTemplates = namedtuple('MailTemplates', 'subject body_plain body_html base_body_plain base_body_html')
+
+_mail_templates_cache = {}
+
+
+def get_mail_templates(template_name_prefix, base_template_name_prefix='email/base'):
+    """
+    Return the compiled templates of an email, with the base HTML template if the email has no HTML template.
+    They are resolved once per template name prefix and kept in memory, unless DEBUG is on (like Django's cached template loader).
+    """
+    key = (template_name_prefix, base_template_name_prefix)
+    templates = _mail_templates_cache.get(key)
+    if ((templates is None) or (django_settings.DEBUG)):
+        base_body_html = get_template(template_name='{}_body.html'.format(base_template_name_prefix))
+        try:
+            body_html = get_template(template_name='{}_body.html'.format(template_name_prefix))
+        except TemplateDoesNotExist:
+            body_html = base_body_html
+        templates = MailTemplates(
+            subject=get_template(template_name='{}_subject.txt'.format(template_name_prefix)),
+            body_plain=get_template(template_name='{}_body.txt'.format(template_name_prefix)),
+            body_html=body_html,
+            base_body_plain=get_template(template_name='{}_body.txt'.format(base_template_name_prefix)),
+            base_body_html=base_body_html,
+        )
+        _mail_templates_cache[key] = templates
+    return templates
+
+
+def get_site_mail_context():
     site = Site.objects.get_current()
     params = {
         'protocol': 'https' if (django_settings.USE_HTTPS) else 'http',
         'language_code': translation.get_language() or 'en',  # ~~~~ TODO: find solution in order find language in management commands (None is this case)
         'domain': site.domain,
     }
-    context.update({
+    return {
         'SITE_URL': '{protocol}://{language_code}.{domain}'.format(**params),
         'SITE_MAIN_URL': '{protocol}://www.{domain}'.format(**params),
-    })
+    }
+
+
+def _render_mail(templates, site_context, context):
+    context = context or {}
+    context.update(site_context)
 
     # render subject
-    subject = render_to_string(template_name=subject_template_name, context=context)
+    subject = templates.subject.render(context=context)
 
     # render plain text
     context.update({
         'subject': subject,
-        'base_template': plain_base_template_name,
+        # The base templates are passed compiled, so {% extends base_template %} doesn't look them up again.
+        'base_template': templates.base_body_plain.template,
     })
-    body_plain = render_to_string(template_name=plain_template_name, context=context)
+    body_plain = templates.body_plain.render(context=context)
 
     # render html
     context.update({
         'plain_content': body_plain,
-        'base_template': html_base_template_name,
+        'base_template': templates.base_body_html.template,
     })
-    try:
-        body_html = render_to_string(template_name=html_template_name, context=context)
-    except TemplateDoesNotExist:
-        body_html = render_to_string(template_name=html_base_template_name, context=context)
+    body_html = templates.body_html.render(context=context)
 
     return RenderedMail(
         subject=' '.join(subject.splitlines(keepends=False)).strip(),
@@ -58,7 +80,26 @@ def render_mail(template_name_prefix, context=None, base_template_name_prefix='e
     )
 
 
-def send_mail(to, template_name_prefix, context=None, **kwargs):
+def render_mail(template_name_prefix, context=None, base_template_name_prefix='email/base'):
+    templates = get_mail_templates(template_name_prefix=template_name_prefix, base_template_name_prefix=base_template_name_prefix)
+    return _render_mail(templates=templates, site_context=get_site_mail_context(), context=context)
+
+
+def render_mails(template_name_prefix, contexts, base_template_name_prefix='email/base'):
+    """
+    Render the same email with each of the contexts, in the current language. The templates and the site are looked up once.
+    """
+    templates = get_mail_templates(template_name_prefix=template_name_prefix, base_template_name_prefix=base_template_name_prefix)
+    site_context = get_site_mail_context()
+    return [_render_mail(templates=templates, site_context=site_context, context=context) for context in contexts]
+
+
+def send_mail(to, template_name_prefix, context=None, enqueue=None, **kwargs):
+    """
+    Render and send an email. With enqueue (MAIL_QUEUE_ENABLED by default), the email is saved and sent later by the send_queued_mail command, so the request doesn't wait for the mail server.
+    """
+    from .models import OutgoingEmail
+
     site = Site.objects.get_current()
     context = context or {}
     context.update({
@@ -72,6 +113,11 @@ def send_mail(to, template_name_prefix, context=None, **kwargs):
         **kwargs
     )
     msg.attach_alternative(rendered.body_html, 'text/html')
+    if (enqueue is None):
+        enqueue = django_settings.MAIL_QUEUE_ENABLED
+    if (enqueue):
+        OutgoingEmail.objects.enqueue(message=msg)
+        return 1
     return msg.send()
 
 
@@ -0,0 +1,47 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from speedy.core.base.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send the queued emails in batches, reusing one connection to the mail server for each batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of emails sent over one connection.')
+        parser.add_argument('--worker', action='store_true', help='Run forever, checking for queued emails every --interval seconds.')
+        parser.add_argument('--interval', type=int, default=5, help='Number of seconds between runs in worker mode.')
+        parser.add_argument('--max-interval', type=int, default=300, help='Maximum number of seconds between runs in worker mode, after errors.')
+
+    def send_pending(self, batch_size):
+        number_of_emails = 0
+        while True:
+            number_of_emails_in_batch = OutgoingEmail.objects.send_pending(batch_size=batch_size)
+            number_of_emails += number_of_emails_in_batch
+            if (number_of_emails_in_batch < batch_size):
+                break
+        if (number_of_emails > 0):
+            logger.info("send_queued_mail::number_of_emails={number_of_emails}".format(number_of_emails=number_of_emails))
+
+    def handle(self, *args, **options):
+        if (not (options['worker'])):
+            self.send_pending(batch_size=options['batch_size'])
+            return
+        number_of_errors = 0
+        while True:
+            try:
+                self.send_pending(batch_size=options['batch_size'])
+                number_of_errors = 0
+            except Exception as e:
+                # For example the mail server or the database is not available. Keep running, and wait longer after each consecutive error.
+                number_of_errors += 1
+                logger.error("send_queued_mail::Can't send queued emails - exception {}, number_of_errors={}.".format(e, number_of_errors))
+                close_old_connections()
+            time.sleep(min(options['interval'] * 2 ** number_of_errors, options['max_interval']))
+
+
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.15 on 2026-10-19 00:28
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.utils.timezone
+import speedy.core.base.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_updated', models.DateTimeField(auto_now=True, db_index=True)),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='from')),
+                ('to', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None, verbose_name='to')),
+                ('subject', models.TextField(blank=True, verbose_name='subject')),
+                ('body_plain', models.TextField(blank=True, verbose_name='plain text body')),
+                ('body_html', models.TextField(blank=True, verbose_name='HTML body')),
+                ('headers', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, verbose_name='headers')),
+                ('status', models.SmallIntegerField(choices=[(1, 'Pending'), (2, 'Failed')], default=1, verbose_name='status')),
+                ('number_of_attempts', models.SmallIntegerField(default=0, verbose_name='number of attempts')),
+                ('date_send_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='send after')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+            ],
+            options={
+                'verbose_name': 'outgoing email',
+                'verbose_name_plural': 'outgoing emails',
+            },
+            bases=(speedy.core.base.models.ValidateModelMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name='outgoingemail',
+            index=models.Index(fields=['status', 'date_send_after'], name='base_outgoi_status_9a0df6_idx'),
+        ),
+    ]
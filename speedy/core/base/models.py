@@ -1,12 +1,20 @@
+import logging
+from datetime import timedelta
+
 from django.conf import settings as django_settings
 from django.core.exceptions import FieldDoesNotExist
 from django.contrib.auth.models import BaseUserManager as DjangoBaseUserManager
-from django.db import models
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models, transaction
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
 from .utils import generate_regular_udid, generate_small_udid
 from .validators import regular_udid_validator, small_udid_validator
 
+logger = logging.getLogger(__name__)
+
 
 class ValidateModelMixin(object):
     def save(self, *args, **kwargs):
@@ -102,3 +110,104 @@ class RegularUDIDField(UDIDField):
         super().__init__(*args, **kwargs)
 
 
+class OutgoingEmailManager(BaseManager):
+    def enqueue(self, message):
+        """
+        Save an email message to be sent by the send_queued_mail command.
+        """
+        body_html = ''
+        for content, mimetype in getattr(message, 'alternatives', []):
+            if (mimetype == 'text/html'):
+                body_html = content
+        return self.create(
+            from_email=message.from_email,
+            to=list(message.to),
+            subject=message.subject,
+            body_plain=message.body,
+            body_html=body_html,
+            headers=message.extra_headers,
+        )
+
+    def send_pending(self, batch_size):
+        """
+        Send up to batch_size pending emails over one connection. Returns the number of emails sent. Raises if the connection to the mail server can't be opened.
+        A failed email is retried after MAIL_QUEUE_RETRY_DELAY seconds, doubled after each attempt. After MAIL_QUEUE_MAX_ATTEMPTS attempts it's marked as failed and not retried.
+        """
+        with transaction.atomic():
+            # Emails locked by another worker are skipped, and will be sent by it.
+            emails = list(self.select_for_update(skip_locked=True).filter(status=self.model.STATUS_PENDING, date_send_after__lte=now()).order_by('date_send_after')[:batch_size])
+            if (len(emails) == 0):
+                return 0
+            connection = get_connection()
+            try:
+                connection.open()
+            except Exception as e:
+                # The mail server is not available. Leave the emails pending without counting an attempt, the transaction is rolled back and the caller retries later.
+                logger.error("OutgoingEmailManager::send_pending::Can't connect to the mail server - exception {}.".format(e))
+                raise
+            try:
+                number_of_emails = 0
+                for email in emails:
+                    try:
+                        email.get_message(connection=connection).send()
+                    except Exception as e:
+                        email.number_of_attempts += 1
+                        email.last_error = str(e)
+                        if (email.number_of_attempts >= django_settings.MAIL_QUEUE_MAX_ATTEMPTS):
+                            email.status = self.model.STATUS_FAILED
+                        else:
+                            email.date_send_after = now() + timedelta(seconds=django_settings.MAIL_QUEUE_RETRY_DELAY * 2 ** (email.number_of_attempts - 1))
+                        email.save()
+                    else:
+                        email.delete()
+                        number_of_emails += 1
+            finally:
+                connection.close()
+        return number_of_emails
+
+
+class OutgoingEmail(TimeStampedModel):
+    STATUS_PENDING = 1
+    STATUS_FAILED = 2
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_FAILED, _("Failed")),
+    )
+
+    from_email = models.CharField(verbose_name=_('from'), max_length=255, blank=True)
+    to = ArrayField(base_field=models.CharField(max_length=255), verbose_name=_('to'))
+    subject = models.TextField(verbose_name=_('subject'), blank=True)
+    body_plain = models.TextField(verbose_name=_('plain text body'), blank=True)
+    body_html = models.TextField(verbose_name=_('HTML body'), blank=True)
+    headers = JSONField(verbose_name=_('headers'), default=dict, blank=True)
+    status = models.SmallIntegerField(verbose_name=_('status'), choices=STATUS_CHOICES, default=STATUS_PENDING)
+    number_of_attempts = models.SmallIntegerField(verbose_name=_('number of attempts'), default=0)
+    date_send_after = models.DateTimeField(verbose_name=_('send after'), default=now)
+    last_error = models.TextField(verbose_name=_('last error'), blank=True)
+
+    objects = OutgoingEmailManager()
+
+    class Meta:
+        verbose_name = _('outgoing email')
+        verbose_name_plural = _('outgoing emails')
+        indexes = [
+            models.Index(fields=['status', 'date_send_after']),
+        ]
+
+    def __str__(self):
+        return '{}: {}'.format(', '.join(self.to), self.subject)
+
+    def get_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body_plain,
+            from_email=self.from_email or None,
+            to=self.to,
+            headers=self.headers,
+            connection=connection,
+        )
+        if (self.body_html):
+            message.attach_alternative(self.body_html, 'text/html')
+        return message
+
+
@@ -1,6 +1,7 @@
 import shutil
 
 from django.conf import settings as django_settings
+from django.core.cache import cache
 from django.core.management import call_command
 from django.test import TestCase as DjangoTestCase
 from django.test.runner import DiscoverRunner
@@ -48,6 +49,8 @@ class SiteTestCase(DjangoTestCase):
     def _pre_setup(self):
         self.assertTrue(expr=django_settings.TESTS)
         super()._pre_setup()
+        # The database is rolled back after each test, so values cached by previous tests are not valid anymore.
+        cache.clear()
         call_command('load_data', tests_settings.SITES_FIXTURE, verbosity=0)
         self.site = Site.objects.get_current()
         self.site_name = _(self.site.name)
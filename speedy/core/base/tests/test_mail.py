@@ -0,0 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils.timezone import now
+
+from speedy.core.base.test.models import SiteTestCase
+from speedy.core.base.mail import send_mail, render_mail, render_mails, get_mail_templates
+from speedy.core.base.models import OutgoingEmail
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("Connection refused.")
+
+
+class UnavailableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("Connection refused.")
+
+    def send_messages(self, email_messages):
+        return len(email_messages)
+
+
+class OutgoingEmailTestCase(SiteTestCase):
+    def send_mail(self, **kwargs):
+        return send_mail(to=['user@example.com'], template_name_prefix='email/contact_by_form/admin_feedback', headers={'Reply-To': 'sender@example.com'}, **kwargs)
+
+    def test_send_mail_sends_immediately_by_default(self):
+        self.assertEqual(first=self.send_mail(), second=1)
+        self.assertEqual(first=len(mail.outbox), second=1)
+        self.assertEqual(first=OutgoingEmail.objects.count(), second=0)
+
+    def test_send_mail_without_queue(self):
+        self.assertEqual(first=self.send_mail(enqueue=False), second=1)
+        self.assertEqual(first=len(mail.outbox), second=1)
+        self.assertEqual(first=OutgoingEmail.objects.count(), second=0)
+
+    @override_settings(MAIL_QUEUE_ENABLED=True)
+    def test_send_mail_enqueues_email(self):
+        self.assertEqual(first=self.send_mail(), second=1)
+        self.assertEqual(first=len(mail.outbox), second=0)
+        email = OutgoingEmail.objects.get()
+        self.assertListEqual(list1=email.to, list2=['user@example.com'])
+        self.assertEqual(first=email.status, second=OutgoingEmail.STATUS_PENDING)
+        self.assertNotEqual(first=email.body_html, second='')
+
+    def test_send_pending(self):
+        for i in range(3):
+            self.send_mail(enqueue=True)
+        self.assertEqual(first=OutgoingEmail.objects.send_pending(batch_size=2), second=2)
+        self.assertEqual(first=len(mail.outbox), second=2)
+        self.assertEqual(first=OutgoingEmail.objects.count(), second=1)
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(first=len(mail.outbox), second=3)
+        self.assertEqual(first=OutgoingEmail.objects.count(), second=0)
+        message = mail.outbox[0]
+        self.assertListEqual(list1=message.to, list2=['user@example.com'])
+        self.assertEqual(first=message.extra_headers['Reply-To'], second='sender@example.com')
+        self.assertEqual(first=message.alternatives[0][1], second='text/html')
+
+    def test_email_is_not_sent_before_date_send_after(self):
+        self.send_mail(enqueue=True)
+        OutgoingEmail.objects.update(date_send_after=now() + timedelta(minutes=1))
+        self.assertEqual(first=OutgoingEmail.objects.send_pending(batch_size=10), second=0)
+        self.assertEqual(first=len(mail.outbox), second=0)
+
+    @override_settings(EMAIL_BACKEND='speedy.core.base.tests.test_mail.FailingEmailBackend', MAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_failed_email_is_retried_and_then_marked_as_failed(self):
+        self.send_mail(enqueue=True)
+        self.assertEqual(first=OutgoingEmail.objects.send_pending(batch_size=10), second=0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(first=email.status, second=OutgoingEmail.STATUS_PENDING)
+        self.assertEqual(first=email.number_of_attempts, second=1)
+        self.assertEqual(first=email.last_error, second="Connection refused.")
+        self.assertGreater(a=email.date_send_after, b=now())
+        # The email is retried only after the delay.
+        self.assertEqual(first=OutgoingEmail.objects.send_pending(batch_size=10), second=0)
+        self.assertEqual(first=OutgoingEmail.objects.get().number_of_attempts, second=1)
+        OutgoingEmail.objects.update(date_send_after=now())
+        self.assertEqual(first=OutgoingEmail.objects.send_pending(batch_size=10), second=0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(first=email.status, second=OutgoingEmail.STATUS_FAILED)
+        self.assertEqual(first=email.number_of_attempts, second=2)
+        # Failed emails are not sent again.
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            self.assertEqual(first=OutgoingEmail.objects.send_pending(batch_size=10), second=0)
+        self.assertEqual(first=len(mail.outbox), second=0)
+
+    @override_settings(EMAIL_BACKEND='speedy.core.base.tests.test_mail.UnavailableEmailBackend')
+    def test_emails_stay_pending_if_mail_server_is_unavailable(self):
+        self.send_mail(enqueue=True)
+        with self.assertRaises(ConnectionRefusedError):
+            OutgoingEmail.objects.send_pending(batch_size=10)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(first=email.status, second=OutgoingEmail.STATUS_PENDING)
+        self.assertEqual(first=email.number_of_attempts, second=0)
+        self.assertEqual(first=email.last_error, second='')
+
+
+class RenderMailTestCase(SiteTestCase):
+    template_name_prefix = 'email/contact_by_form/admin_feedback'
+
+    def get_context(self, text):
+        return {
+            'site_name': 'Speedy',
+            'feedback': {'sender_name': 'Sender', 'sender_email': 'sender@example.com', 'text': text},
+        }
+
+    def test_render_mail(self):
+        rendered = render_mail(template_name_prefix=self.template_name_prefix, context=self.get_context(text='Hello'))
+        self.assertIn(member='Hello', container=rendered.body_plain)
+        self.assertIn(member='sender@example.com', container=rendered.body_plain)
+        self.assertTrue(expr=rendered.subject.startswith('Speedy: '))
+        # There is no HTML template, so the plain text is rendered in the base HTML template.
+        self.assertIn(member='<html', container=rendered.body_html)
+        self.assertIn(member='Hello', container=rendered.body_html)
+
+    def test_render_mails(self):
+        rendered_mails = render_mails(template_name_prefix=self.template_name_prefix, contexts=[self.get_context(text='Hello'), self.get_context(text='Goodbye')])
+        self.assertEqual(first=len(rendered_mails), second=2)
+        self.assertEqual(first=rendered_mails[0], second=render_mail(template_name_prefix=self.template_name_prefix, context=self.get_context(text='Hello')))
+        self.assertIn(member='Goodbye', container=rendered_mails[1].body_plain)
+        self.assertNotIn(member='Hello', container=rendered_mails[1].body_plain)
+
+    @override_settings(DEBUG=False)
+    def test_templates_are_cached(self):
+        templates = get_mail_templates(template_name_prefix=self.template_name_prefix)
+        self.assertIs(expr1=get_mail_templates(template_name_prefix=self.template_name_prefix), expr2=templates)
+        self.assertIs(expr1=templates.body_html, expr2=templates.base_body_html)
+
+    @override_settings(DEBUG=True)
+    def test_templates_are_not_cached_with_debug(self):
+        templates = get_mail_templates(template_name_prefix=self.template_name_prefix)
+        self.assertIsNot(expr1=get_mail_templates(template_name_prefix=self.template_name_prefix), expr2=templates)
+
+
@@ -0,0 +1,80 @@
+import hashlib
+
+from django.core.cache import cache
+
+BLOCKS_CACHE_KEY = 'speedy_blocks:{user_id}'
+BLOCKS_BLOOM_FILTER_CACHE_KEY = 'speedy_blocks_bloom_filter:{user_id}'
+BLOCKS_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, in seconds.
+
+
+class BloomFilter(object):
+    """
+    A compact set of ids, which may return false positives but never false negatives.
+    """
+    BITS_PER_ID = 10
+    NUMBER_OF_HASHES = 4
+
+    def __init__(self, ids):
+        self.number_of_bits = max(64, len(ids) * self.__class__.BITS_PER_ID)
+        self.bits = 0
+        for id in ids:
+            for position in self._get_positions(id=id):
+                self.bits |= (1 << position)
+
+    def __contains__(self, id):
+        if (self.bits == 0):
+            return False
+        return all((self.bits >> position) & 1 for position in self._get_positions(id=id))
+
+    def _get_positions(self, id):
+        digest = hashlib.md5(str(id).encode()).digest()
+        return [int.from_bytes(digest[i * 4:(i + 1) * 4], byteorder='little') % self.number_of_bits for i in range(self.__class__.NUMBER_OF_HASHES)]
+
+
+def _cache_blocks(user_id):
+    from .models import Block
+
+    blocked_ids, blocker_ids = set(), set()
+    for blocker_id, blocked_id in Block.objects.filter_by_user(user_id=user_id).values_list('blocker_id', 'blocked_id'):
+        if (blocker_id == user_id):
+            blocked_ids.add(blocked_id)
+        else:
+            blocker_ids.add(blocker_id)
+    blocks = {
+        'blocked_ids': frozenset(blocked_ids),
+        'blocker_ids': frozenset(blocker_ids),
+    }
+    bloom_filter = BloomFilter(ids=blocked_ids | blocker_ids)
+    cache.set_many({
+        BLOCKS_CACHE_KEY.format(user_id=user_id): blocks,
+        BLOCKS_BLOOM_FILTER_CACHE_KEY.format(user_id=user_id): bloom_filter,
+    }, timeout=BLOCKS_CACHE_TIMEOUT)
+    return blocks, bloom_filter
+
+
+def get_blocks(user_id):
+    """
+    Return a dict with the ids of the users this user blocked ('blocked_ids') and the ids of the users who blocked this user ('blocker_ids').
+    On a cache miss, the blocks are fetched from the database with one query.
+    """
+    blocks = cache.get(BLOCKS_CACHE_KEY.format(user_id=user_id))
+    if (blocks is None):
+        blocks, bloom_filter = _cache_blocks(user_id=user_id)
+    return blocks
+
+
+def get_blocks_bloom_filter(user_id):
+    """
+    Return a Bloom filter of the ids of the users this user blocked or was blocked by.
+    It's much smaller than the sets of ids, and answers the common "there is no block" case without fetching them.
+    """
+    bloom_filter = cache.get(BLOCKS_BLOOM_FILTER_CACHE_KEY.format(user_id=user_id))
+    if (bloom_filter is None):
+        blocks, bloom_filter = _cache_blocks(user_id=user_id)
+    return bloom_filter
+
+
+def invalidate_blocks(user_ids):
+    cache.delete_many([cache_key.format(user_id=user_id) for user_id in user_ids for cache_key in [BLOCKS_CACHE_KEY, BLOCKS_BLOOM_FILTER_CACHE_KEY]])
+
+
@@ -1,10 +1,12 @@
 from friendship.models import Friend
 
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 
 from speedy.core.base.models import BaseManager
 from speedy.core.accounts.models import User
+from .block_cache import get_blocks, get_blocks_bloom_filter
 
 
 class BlockManager(BaseManager):
@@ -22,11 +24,24 @@ class BlockManager(BaseManager):
     def unblock(self, blocker, blocked):
         self.filter(blocker__pk=blocker.pk, blocked__pk=blocked.pk).delete()
 
+    def filter_by_user(self, user_id):
+        return self.filter(Q(blocker_id=user_id) | Q(blocked_id=user_id))
+
     def has_blocked(self, blocker, blocked):
-        return self.filter(blocker__pk=blocker.pk, blocked__pk=blocked.pk).exists()
+        # The blocks of each user are cached, and most users didn't block anyone - so the Bloom filter usually answers without fetching the blocks.
+        if ((blocker.pk is None) or (blocked.pk is None)):
+            return False
+        if (not (blocked.pk in get_blocks_bloom_filter(user_id=blocker.pk))):
+            return False
+        return (blocked.pk in get_blocks(user_id=blocker.pk)['blocked_ids'])
 
     def there_is_block(self, user_1, user_2):
-        return self.has_blocked(blocker=user_1, blocked=user_2) or self.has_blocked(blocker=user_2, blocked=user_1)
+        if ((user_1.pk is None) or (user_2.pk is None)):
+            return False
+        if (not (user_2.pk in get_blocks_bloom_filter(user_id=user_1.pk))):
+            return False
+        blocks = get_blocks(user_id=user_1.pk)
+        return ((user_2.pk in blocks['blocked_ids']) or (user_2.pk in blocks['blocker_ids']))
 
     def get_blocked_list_to_queryset(self, blocker):
         # filter out users that are only active in another language
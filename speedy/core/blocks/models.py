@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 
 from speedy.core.base.models import TimeStampedModel
 from speedy.core.accounts.models import Entity
 from .managers import BlockManager
+from .block_cache import invalidate_blocks
 
 
 class Block(TimeStampedModel):
@@ -28,3 +30,12 @@ class Block(TimeStampedModel):
         return super().save(*args, **kwargs)
 
 
+@receiver(signal=models.signals.post_save, sender=Block)
+@receiver(signal=models.signals.post_delete, sender=Block)
+def invalidate_blocks_on_block_change(sender, instance: Block, **kwargs):
+    # Invalidate the cached blocks of both users now, for the rest of this transaction, and again after it's committed - in case another request cached the old blocks meanwhile.
+    user_ids = [instance.blocker_id, instance.blocked_id]
+    invalidate_blocks(user_ids=user_ids)
+    transaction.on_commit(lambda: invalidate_blocks(user_ids=user_ids))
+
+
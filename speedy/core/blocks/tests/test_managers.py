@@ -5,6 +5,7 @@ if (django_settings.LOGIN_ENABLED):
     from speedy.core.base.test.models import SiteTestCase
     from speedy.core.base.test.decorators import only_on_sites_with_login
     from speedy.core.blocks.models import Block
+    from speedy.core.blocks.block_cache import BloomFilter, invalidate_blocks
 
     from speedy.core.accounts.test.user_factories import ActiveUserFactory
 
@@ -51,4 +52,50 @@ if (django_settings.LOGIN_ENABLED):
             self.assertEqual(first=str(cm.exception.message), second='Users cannot block themselves.') ###### TODO
             self.assertListEqual(list1=list(cm.exception), list2=['Users cannot block themselves.']) ###### TODO
 
+        def test_there_is_block(self):
+            self.assertFalse(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+            Block.objects.block(blocker=self.user, blocked=self.other_user)
+            self.assertTrue(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+            self.assertTrue(expr=Block.objects.there_is_block(user_1=self.other_user, user_2=self.user))
+            self.assertTrue(expr=Block.objects.has_blocked(blocker=self.user, blocked=self.other_user))
+            self.assertFalse(expr=Block.objects.has_blocked(blocker=self.other_user, blocked=self.user))
+            Block.objects.unblock(blocker=self.user, blocked=self.other_user)
+            self.assertFalse(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+            self.assertFalse(expr=Block.objects.there_is_block(user_1=self.other_user, user_2=self.user))
+            self.assertFalse(expr=Block.objects.has_blocked(blocker=self.user, blocked=self.other_user))
+
+        def test_there_is_block_is_cached(self):
+            third_user = ActiveUserFactory()
+            Block.objects.block(blocker=self.user, blocked=third_user)
+            invalidate_blocks(user_ids=[self.user.pk])
+            with self.assertNumQueries(num=1):
+                self.assertFalse(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+            with self.assertNumQueries(num=0):
+                self.assertFalse(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+                self.assertTrue(expr=Block.objects.there_is_block(user_1=self.user, user_2=third_user))
+                self.assertTrue(expr=Block.objects.has_blocked(blocker=self.user, blocked=third_user))
+
+        def test_saving_or_deleting_a_block_invalidates_the_cache(self):
+            self.assertFalse(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+            Block.objects.create(blocker=self.other_user, blocked=self.user)
+            self.assertTrue(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+            Block.objects.filter(blocker=self.other_user).delete()
+            self.assertFalse(expr=Block.objects.there_is_block(user_1=self.user, user_2=self.other_user))
+
+
+    @only_on_sites_with_login
+    class BloomFilterTestCase(SiteTestCase):
+        def test_bloom_filter(self):
+            ids = list(range(1000, 100000, 1000))
+            bloom_filter = BloomFilter(ids=ids)
+            for id in ids:
+                self.assertIn(member=id, container=bloom_filter)
+            false_positives = len([id for id in range(1, 1000) if (id in bloom_filter)])
+            self.assertLess(a=false_positives, b=50)
+
+        def test_empty_bloom_filter(self):
+            bloom_filter = BloomFilter(ids=[])
+            self.assertEqual(first=bloom_filter.bits, second=0)
+            self.assertNotIn(member=1, container=bloom_filter)
+
 
@@ -1,7 +1,9 @@
 from django.contrib.sites.models import Site
-from django.db.models import Q
+from django.db import transaction, IntegrityError
+from django.db.models import Q, F, OuterRef, Subquery
 
 from speedy.core.base.models import BaseManager
+from .notifications import notify_new_message
 
 
 class ChatManager(BaseManager):
@@ -11,12 +13,25 @@ class ChatManager(BaseManager):
     def chats(self, entity):
         return self.filter(Q(group__in=[entity]) | Q(ent1_id=entity.id) | Q(ent2_id=entity.id))
 
+    def unread_chats(self, entity):
+        # Chats with a message which is newer than the entity's read mark, compared in one query.
+        from .models import ReadMark
+
+        read_mark_date_updated = ReadMark.objects.filter(chat=OuterRef('pk'), entity=entity).values('date_updated')[:1]
+        return self.chats(entity=entity).filter(last_message__isnull=False).annotate(read_mark_date_updated=Subquery(read_mark_date_updated)).filter(Q(read_mark_date_updated__isnull=True) | Q(last_message__date_created__gt=F('read_mark_date_updated')))
+
     def chat_with(self, ent1, ent2, create=True):
+        pair_key = self.model.get_pair_key(ent1_id=ent1.id, ent2_id=ent2.id)
         try:
-            return self.get(Q(ent1=ent1, ent2=ent2) | Q(ent1=ent2, ent2=ent1))
+            return self.get(pair_key=pair_key)
         except self.model.DoesNotExist:
             if (create):
-                return self.create(ent1=ent1, ent2=ent2)
+                try:
+                    with transaction.atomic():
+                        return self.create(ent1=ent1, ent2=ent2)
+                except IntegrityError:
+                    # Another request created this chat meanwhile.
+                    return self.get(pair_key=pair_key)
             else:
                 return None
 
@@ -38,6 +53,7 @@ class MessageManager(BaseManager):
         chat.date_updated = chat.last_message.date_created
         chat.save(update_fields={'last_message', 'date_updated'})
         chat.mark_read(entity=from_entity)
+        notify_new_message(message=chat.last_message)
         return chat.last_message
 
 
@@ -0,0 +1,53 @@
+# Generated by Django 2.1.15 on 2026-10-19 00:20
+
+from django.db import migrations, models
+
+
+def update_pair_key(apps, schema_editor):
+    # Duplicate private chats are merged into the oldest one - their messages and read marks are moved to it, and they are deleted.
+    # Only the newest read mark of each participant is kept in the merged chat, since ReadMark.objects.mark expects one read mark per chat and entity.
+    Chat = apps.get_model('core_messages', 'Chat')
+    Message = apps.get_model('core_messages', 'Message')
+    ReadMark = apps.get_model('core_messages', 'ReadMark')
+    chats_ids = {}
+    merged_chats_ids = set()
+    for chat in Chat.objects.filter(is_group=False, ent1__isnull=False, ent2__isnull=False).order_by('date_created').values('id', 'site_id', 'ent1_id', 'ent2_id').iterator():
+        pair_key = ':'.join(sorted([chat['ent1_id'], chat['ent2_id']]))
+        if ((chat['site_id'], pair_key) not in chats_ids):
+            chats_ids[(chat['site_id'], pair_key)] = chat['id']
+            Chat.objects.filter(id=chat['id']).update(pair_key=pair_key)
+        else:
+            chat_id = chats_ids[(chat['site_id'], pair_key)]
+            Message.objects.filter(chat_id=chat['id']).update(chat_id=chat_id)
+            ReadMark.objects.filter(chat_id=chat['id']).update(chat_id=chat_id)
+            Chat.objects.filter(id=chat['id']).delete()
+            merged_chats_ids.add(chat_id)
+    for chat_id in merged_chats_ids:
+        Chat.objects.filter(id=chat_id).update(last_message=Message.objects.filter(chat_id=chat_id).order_by('-date_created').first())
+        entities_ids = set()
+        for read_mark in ReadMark.objects.filter(chat_id=chat_id).order_by('-date_updated', '-date_created').values('id', 'entity_id'):
+            if (read_mark['entity_id'] in entities_ids):
+                ReadMark.objects.filter(id=read_mark['id']).delete()
+            else:
+                entities_ids.add(read_mark['entity_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('core_messages', '0003_auto_20200106_1119'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='pair_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, verbose_name='participants key'),
+        ),
+        migrations.RunPython(update_pair_key, reverse_code=migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='chat',
+            unique_together={('site', 'pair_key')},
+        ),
+    ]
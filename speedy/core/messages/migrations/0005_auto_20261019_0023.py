@@ -0,0 +1,17 @@
+# Generated by Django 2.1.15 on 2026-10-19 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_messages', '0004_auto_20261019_0020'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat', '-date_created', '-id'], name='core_messag_chat_id_09114d_idx'),
+        ),
+    ]
@@ -17,6 +17,7 @@ class Chat(TimeStampedModel):
     group = models.ManyToManyField(to=Entity, verbose_name=_('participants'))
     is_group = models.BooleanField(verbose_name=_('is group chat'), default=False)
     last_message = models.ForeignKey(to='Message', verbose_name=_('last message'), on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    pair_key = models.CharField(verbose_name=_('participants key'), max_length=255, blank=True, null=True, editable=False)
 
     objects = ChatManager()
     all_sites_objects = BaseManager()
@@ -40,6 +41,7 @@ class Chat(TimeStampedModel):
         verbose_name = _('chat')
         verbose_name_plural = _('chats')
         ordering = ('-last_message__date_created', '-date_updated')
+        unique_together = ('site', 'pair_key')
 
     def __str__(self):
         return ', '.join(str(ent.user.name) if ent else str(_("Unknown")) for ent in self.participants)
@@ -50,9 +52,22 @@ class Chat(TimeStampedModel):
             assert self.ent2
             assert (not (self.ent1 == self.ent2))
             assert self.group.count() == 0
+            self.pair_key = self.__class__.get_pair_key(ent1_id=self.ent1_id, ent2_id=self.ent2_id)
+        else:
+            self.pair_key = None
         self.site = Site.objects.get_current()
         return super().save(*args, **kwargs)
 
+    def validate_unique(self, exclude=None):
+        # The pair key is unique in the database, and chat_with handles a duplicate chat. Don't query it on every save.
+        exclude = list(exclude or []) + ['pair_key']
+        return super().validate_unique(exclude=exclude)
+
+    @staticmethod
+    def get_pair_key(ent1_id, ent2_id):
+        # The same key for both orders of the participants, so a private chat is found with one index lookup.
+        return ':'.join(sorted([ent1_id, ent2_id]))
+
     def get_slug(self, current_user: Entity):
         if (self.is_private):
             if (self.ent1_id == current_user.id):
@@ -82,6 +97,10 @@ class Message(TimeStampedModel):
         verbose_name_plural = _('messages')
         ordering = ('-date_created',)
         get_latest_by = 'date_created'
+        indexes = [
+            # Chat history is paginated by (date_created, id).
+            models.Index(fields=['chat', '-date_created', '-id']),
+        ]
 
     def __str__(self):
         return '{}: {}'.format(self.sender.user if self.sender else str(_("Unknown")), self.text[:140])
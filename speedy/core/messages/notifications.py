@@ -0,0 +1,56 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+CHAT_LAST_MESSAGE_TIMESTAMP_CACHE_KEY = 'speedy_chat_last_message_timestamp:{chat_id}'
+CHAT_LAST_MESSAGE_TIMESTAMP_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, in seconds.
+
+# Wakes up the requests waiting in this process when a message is sent. Requests in other processes notice the new message in the cache within CACHE_CHECK_INTERVAL.
+_new_message_condition = threading.Condition()
+CACHE_CHECK_INTERVAL = 1  # In seconds.
+
+
+def get_last_message_timestamp(chat_id):
+    """
+    Return the timestamp of the last message in this chat, 0 if the chat has no messages, or None if it's not cached.
+    """
+    return cache.get(CHAT_LAST_MESSAGE_TIMESTAMP_CACHE_KEY.format(chat_id=chat_id))
+
+
+def set_last_message_timestamp(chat_id, timestamp):
+    cache.set(CHAT_LAST_MESSAGE_TIMESTAMP_CACHE_KEY.format(chat_id=chat_id), timestamp, timeout=CHAT_LAST_MESSAGE_TIMESTAMP_CACHE_TIMEOUT)
+
+
+def get_or_set_last_message_timestamp(chat):
+    timestamp = get_last_message_timestamp(chat_id=chat.id)
+    if (timestamp is None):
+        # Not cached yet, or evicted. Read it from the database once.
+        last_message_date_created = chat.__class__.objects.filter(pk=chat.pk).values_list('last_message__date_created', flat=True).first()
+        timestamp = (last_message_date_created.timestamp() if (last_message_date_created is not None) else 0)
+        set_last_message_timestamp(chat_id=chat.id, timestamp=timestamp)
+    return timestamp
+
+
+def notify_new_message(message):
+    set_last_message_timestamp(chat_id=message.chat_id, timestamp=message.date_created.timestamp())
+    with _new_message_condition:
+        _new_message_condition.notify_all()
+
+
+def wait_for_new_message(chat, since, timeout):
+    """
+    Wait up to timeout seconds until the chat has a message newer than since (a timestamp). Returns True if it has.
+    Only the cache is checked while waiting, so waiting on an idle chat doesn't query the database.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if (get_or_set_last_message_timestamp(chat=chat) > since):
+            return True
+        remaining = deadline - time.monotonic()
+        if (remaining <= 0):
+            return False
+        with _new_message_condition:
+            _new_message_condition.wait(timeout=min(remaining, CACHE_CHECK_INTERVAL))
+
+
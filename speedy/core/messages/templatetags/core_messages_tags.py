@@ -41,8 +41,8 @@ def annotate_messages_with_read_marks(message_list, entity):
     :type message_list: [speedy.core.messages.models.Message]
     :type entity: speedy.core.accounts.models.Entity
     """
-    chats = set(message.chat for message in message_list)
-    rmarks = {rmark.chat_id: rmark for rmark in ReadMark.objects.filter(chat__in=chats, entity=entity)}
+    chats_ids = set(message.chat_id for message in message_list)
+    rmarks = {rmark.chat_id: rmark for rmark in ReadMark.objects.filter(chat_id__in=chats_ids, entity=entity)}
     for message in message_list:
         rmark = rmarks.get(message.chat_id)
         if (rmark is None):
@@ -64,8 +64,6 @@ def get_chat_slug(chat, current_user):
 
 @register.simple_tag
 def unread_chats_count(entity):
-    chat_list = Chat.objects.chats(entity=entity)
-    annotate_chats_with_read_marks(chat_list=chat_list, entity=entity)
-    return len([c for c in chat_list if (c.is_unread)])
+    return Chat.objects.unread_chats(entity=entity).count()
 
 
@@ -1,6 +1,7 @@
 from time import sleep
 
 from django.conf import settings as django_settings
+from django.db import transaction, IntegrityError
 
 if (django_settings.LOGIN_ENABLED):
     from speedy.core.base.test.models import SiteTestCase
@@ -42,6 +43,25 @@ if (django_settings.LOGIN_ENABLED):
             entities_ids = set(ent.id for ent in chat.participants)
             self.assertSetEqual(set1=entities_ids, set2={self.user1.id, user4.id})
 
+        def test_chat_with_two_users_in_reverse_order_returns_existing_one(self):
+            with self.assertNumQueries(num=1):
+                chat = Chat.objects.chat_with(ent1=self.user2, ent2=self.user1)
+            self.assertEqual(first=chat, second=self.chat_1_2)
+
+        def test_chat_with_two_users_without_create(self):
+            self.assertIsNone(obj=Chat.objects.chat_with(ent1=self.user1, ent2=self.user3, create=False))
+            self.assertEqual(first=Chat.objects.chat_with(ent1=self.user2, ent2=self.user1, create=False), second=self.chat_1_2)
+
+        def test_pair_key(self):
+            self.assertEqual(first=self.chat_1_2.pair_key, second=Chat.get_pair_key(ent1_id=self.user2.id, ent2_id=self.user1.id))
+            self.assertIsNone(obj=self.chat_1_2_3.pair_key)
+
+        def test_cannot_create_duplicate_private_chat(self):
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    Chat(ent1=self.user2, ent2=self.user1).save()
+            self.assertEqual(first=Chat.objects.chat_with(ent1=self.user2, ent2=self.user1), second=self.chat_1_2)
+
         def test_chat_with_multiple_users_creates_new_one(self):
             Chat.objects.group_chat_with(self.user1, self.user2, self.user3)
 
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings as django_settings
+from django.utils.timezone import now
+
+if (django_settings.LOGIN_ENABLED):
+    from speedy.core.base.test.models import SiteTestCase
+    from speedy.core.base.test.decorators import only_on_sites_with_login
+    from speedy.core.messages.models import Chat, Message, ReadMark
+
+    from speedy.core.accounts.test.user_factories import ActiveUserFactory
+    from speedy.core.messages.test.factories import ChatFactory
+
+
+    @only_on_sites_with_login
+    class UpdatePairKeyMigrationTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.update_pair_key = import_module('speedy.core.messages.migrations.0004_auto_20261019_0020').update_pair_key
+            self.user_1 = ActiveUserFactory()
+            self.user_2 = ActiveUserFactory()
+
+        def test_duplicate_chats_are_merged(self):
+            # Duplicate chats which were created before pair_key existed.
+            chat_1 = ChatFactory(ent1=self.user_1, ent2=self.user_2)
+            Chat.objects.filter(pk=chat_1.pk).update(pair_key=None)
+            chat_2 = ChatFactory(ent1=self.user_2, ent2=self.user_1)
+            Chat.objects.filter(pk=chat_2.pk).update(pair_key=None)
+            message_1 = Message.objects.create(chat=chat_1, sender=self.user_1, text='Hello')
+            message_2 = Message.objects.create(chat=chat_2, sender=self.user_2, text='Hi')
+            ReadMark.objects.create(chat=chat_1, entity=self.user_1)
+            newest_read_mark = ReadMark.objects.create(chat=chat_2, entity=self.user_1)
+            ReadMark.objects.filter(pk=newest_read_mark.pk).update(date_updated=now() + timedelta(minutes=1))
+            ReadMark.objects.create(chat=chat_2, entity=self.user_2)
+            self.update_pair_key(apps=apps, schema_editor=None)
+            self.assertListEqual(list1=list(Chat.objects.values_list('pk', flat=True)), list2=[chat_1.pk])
+            chat = Chat.objects.get(pk=chat_1.pk)
+            self.assertEqual(first=chat.pair_key, second=Chat.get_pair_key(ent1_id=self.user_1.id, ent2_id=self.user_2.id))
+            self.assertEqual(first=chat.last_message_id, second=message_2.pk)
+            self.assertSetEqual(set1=set(Message.objects.filter(chat=chat).values_list('pk', flat=True)), set2={message_1.pk, message_2.pk})
+            self.assertListEqual(list1=list(ReadMark.objects.filter(chat=chat, entity=self.user_1).values_list('pk', flat=True)), list2=[newest_read_mark.pk])
+            self.assertEqual(first=ReadMark.objects.filter(chat=chat, entity=self.user_2).count(), second=1)
+            # Only one read mark per participant is left, so it can be marked again.
+            self.assertEqual(first=chat.mark_read(entity=self.user_1).pk, second=newest_read_mark.pk)
+
+
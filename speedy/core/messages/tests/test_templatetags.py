@@ -5,7 +5,7 @@ from django.conf import settings as django_settings
 if (django_settings.LOGIN_ENABLED):
     from speedy.core.base.test.models import SiteTestCase
     from speedy.core.base.test.decorators import only_on_sites_with_login
-    from speedy.core.messages.models import Message, ReadMark
+    from speedy.core.messages.models import Chat, Message, ReadMark
     from speedy.core.messages.templatetags import core_messages_tags
 
     from speedy.core.accounts.test.user_factories import ActiveUserFactory
@@ -120,5 +120,21 @@ if (django_settings.LOGIN_ENABLED):
             self.assertEqual(first=core_messages_tags.unread_chats_count(user1), second=1 + 1 + 0)
             self.assertEqual(first=core_messages_tags.unread_chats_count(user2), second=0 + 0 + 1)
             self.assertEqual(first=core_messages_tags.unread_chats_count(user3), second=0 + 0 + 0)
+            with self.assertNumQueries(num=1):
+                core_messages_tags.unread_chats_count(user1)
+
+        def test_group_chat(self):
+            user1 = ActiveUserFactory()
+            user2 = ActiveUserFactory()
+            user3 = ActiveUserFactory()
+            chat = Chat.objects.group_chat_with(user1, user2, user3)
+            self.assertEqual(first=core_messages_tags.unread_chats_count(user1), second=0)
+            Message.objects.send_message(from_entity=user2, chat=chat, text='text')
+            self.assertEqual(first=core_messages_tags.unread_chats_count(user1), second=1)
+            self.assertEqual(first=core_messages_tags.unread_chats_count(user2), second=0)
+            self.assertEqual(first=core_messages_tags.unread_chats_count(user3), second=1)
+            sleep(0.1)
+            chat.mark_read(entity=user1)
+            self.assertEqual(first=core_messages_tags.unread_chats_count(user1), second=0)
 
 
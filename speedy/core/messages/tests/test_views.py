@@ -1,7 +1,10 @@
-from time import sleep
+import threading
+from time import sleep, monotonic
 
 from django.conf import settings as django_settings
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 if (django_settings.LOGIN_ENABLED):
     from speedy.core.base.test import tests_settings
@@ -10,6 +13,7 @@ if (django_settings.LOGIN_ENABLED):
     from speedy.core.messages.test.mixins import SpeedyCoreMessagesLanguageMixin
     from speedy.core.blocks.models import Block
     from speedy.core.messages.models import Message, ReadMark, Chat
+    from speedy.core.messages.notifications import get_last_message_timestamp, set_last_message_timestamp, notify_new_message, wait_for_new_message
 
     from speedy.core.accounts.test.user_factories import ActiveUserFactory
     from speedy.core.messages.test.factories import ChatFactory
@@ -74,6 +78,73 @@ if (django_settings.LOGIN_ENABLED):
             r = self.client.get(path=self.page_url)
             self.assertEqual(first=r.status_code, second=200)
 
+        def test_chat_page_polls_without_long_polling_by_default(self):
+            self.client.login(username=self.user1.slug, password=tests_settings.USER_PASSWORD)
+            r = self.client.get(path=self.page_url)
+            self.assertContains(response=r, text='data-poll-url')
+            self.assertNotContains(response=r, text='data-long-poll')
+
+        @override_settings(MESSAGES_LONG_POLL_TIMEOUT=25)
+        def test_chat_page_long_polls_if_enabled(self):
+            self.client.login(username=self.user1.slug, password=tests_settings.USER_PASSWORD)
+            r = self.client.get(path=self.page_url)
+            self.assertContains(response=r, text='data-long-poll="1"')
+
+
+    @only_on_sites_with_login
+    class ChatHistoryViewTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user1 = ActiveUserFactory()
+            self.user2 = ActiveUserFactory()
+            self.chat_1_2 = ChatFactory(ent1=self.user1, ent2=self.user2)
+            for i in range(30):
+                Message.objects.send_message(from_entity=self.user1, chat=self.chat_1_2, text='Message {}'.format(i))
+            self.messages = list(Message.objects.filter(chat=self.chat_1_2).order_by('-date_created', '-id'))
+            self.page_url = '/messages/{}/'.format(self.chat_1_2.id)
+            self.older_url = '/messages/{}/older/'.format(self.chat_1_2.id)
+            self.client.login(username=self.user1.slug, password=tests_settings.USER_PASSWORD)
+
+        def test_first_page_has_newest_messages(self):
+            r = self.client.get(path=self.page_url)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertListEqual(list1=list(r.context['message_list']), list2=self.messages[:24])
+            self.assertTrue(expr=r.context['has_older_messages'])
+            self.assertFalse(expr=r.context['has_newer_messages'])
+            self.assertContains(response=r, text='?before={}'.format(self.messages[23].id))
+
+        def test_older_messages(self):
+            r = self.client.get(path=self.older_url, data={'before': self.messages[23].id})
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertListEqual(list1=list(r.context['message_list']), list2=self.messages[24:])
+            self.assertFalse(expr=r.context['has_older_messages'])
+            self.assertNotContains(response=r, text='?before=')
+
+        def test_page_before_message(self):
+            r = self.client.get(path=self.page_url, data={'before': self.messages[3].id})
+            self.assertListEqual(list1=list(r.context['message_list']), list2=self.messages[4:28])
+            self.assertTrue(expr=r.context['has_older_messages'])
+            self.assertTrue(expr=r.context['has_newer_messages'])
+            self.assertNotContains(response=r, text='data-poll-url')
+
+        def test_page_after_message(self):
+            r = self.client.get(path=self.page_url, data={'after': self.messages[25].id})
+            self.assertListEqual(list1=list(r.context['message_list']), list2=self.messages[1:25])
+            self.assertTrue(expr=r.context['has_older_messages'])
+            self.assertTrue(expr=r.context['has_newer_messages'])
+            r = self.client.get(path=self.page_url, data={'after': self.messages[5].id})
+            self.assertListEqual(list1=list(r.context['message_list']), list2=self.messages[:5])
+            self.assertFalse(expr=r.context['has_newer_messages'])
+
+        def test_page_cost_does_not_depend_on_depth(self):
+            self.client.get(path=self.older_url, data={'before': self.messages[0].id})
+            with CaptureQueriesContext(connection) as shallow_queries:
+                self.client.get(path=self.older_url, data={'before': self.messages[0].id})
+            with CaptureQueriesContext(connection) as deep_queries:
+                self.client.get(path=self.older_url, data={'before': self.messages[28].id})
+            self.assertEqual(first=len(deep_queries.captured_queries), second=len(shallow_queries.captured_queries))
+            self.assertFalse(expr=any('OFFSET' in query['sql'] for query in deep_queries.captured_queries))
+
 
     @only_on_sites_with_login
     class SendMessageToChatViewTestCase(SiteTestCase):
@@ -250,3 +321,84 @@ if (django_settings.LOGIN_ENABLED):
             self.assertGreater(a=ReadMark.objects.get(entity_id=self.user1.id).date_updated, b=self.messages[1].date_created)
 
 
+    @only_on_sites_with_login
+    class ChatPollMessagesViewTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user1 = ActiveUserFactory()
+            self.user2 = ActiveUserFactory()
+            self.chat_1_2 = ChatFactory(ent1=self.user1, ent2=self.user2)
+            self.message_1 = Message.objects.send_message(from_entity=self.user1, chat=self.chat_1_2, text='My message')
+            sleep(0.1)
+            self.message_2 = Message.objects.send_message(from_entity=self.user2, chat=self.chat_1_2, text='Your message')
+            self.page_url = '/messages/{}/poll/'.format(self.chat_1_2.id)
+            self.client.login(username=self.user1.slug, password=tests_settings.USER_PASSWORD)
+
+        def test_visitor_has_no_access(self):
+            self.client.logout()
+            r = self.client.get(path=self.page_url, data={'since': self.message_1.date_created.timestamp()})
+            self.assertEqual(first=r.status_code, second=302)
+
+        def test_poll_returns_new_messages(self):
+            r = self.client.get(path=self.page_url, data={'since': self.message_1.date_created.timestamp()})
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertListEqual(list1=list(r.context['message_list']), list2=[self.message_2])
+
+        def test_long_poll_returns_new_messages_without_waiting(self):
+            start_time = monotonic()
+            r = self.client.get(path=self.page_url, data={'since': self.message_1.date_created.timestamp(), 'wait': 1})
+            self.assertLess(a=monotonic() - start_time, b=1)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertListEqual(list1=list(r.context['message_list']), list2=[self.message_2])
+
+        @override_settings(MESSAGES_LONG_POLL_TIMEOUT=0.2)
+        def test_long_poll_times_out_on_idle_chat(self):
+            r = self.client.get(path=self.page_url, data={'since': self.message_2.date_created.timestamp(), 'wait': 1})
+            self.assertEqual(first=r.status_code, second=304)
+
+        def test_poll_without_new_messages_returns_not_modified(self):
+            r = self.client.get(path=self.page_url, data={'since': self.message_2.date_created.timestamp()})
+            self.assertEqual(first=r.status_code, second=304)
+            self.assertEqual(first=r.content, second=b'')
+
+        def test_poll_without_new_messages_does_not_query_messages(self):
+            self.client.get(path=self.page_url, data={'since': self.message_2.date_created.timestamp()})
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(path=self.page_url, data={'since': self.message_2.date_created.timestamp()})
+            self.assertEqual(first=r.status_code, second=304)
+            self.assertFalse(expr=any('FROM "{}"'.format(Message._meta.db_table) in query['sql'] for query in queries.captured_queries))
+
+        def test_idle_poll_does_not_update_last_visit(self):
+            last_visit = self.user1.profile.__class__.objects.get(pk=self.user1.profile.pk).last_visit
+            r = self.client.get(path=self.page_url, data={'since': self.message_2.date_created.timestamp()})
+            self.assertEqual(first=r.status_code, second=304)
+            self.assertEqual(first=self.user1.profile.__class__.objects.get(pk=self.user1.profile.pk).last_visit, second=last_visit)
+
+        def test_poll_with_new_messages_updates_last_visit(self):
+            last_visit = self.user1.profile.__class__.objects.get(pk=self.user1.profile.pk).last_visit
+            r = self.client.get(path=self.page_url, data={'since': self.message_1.date_created.timestamp()})
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertGreater(a=self.user1.profile.__class__.objects.get(pk=self.user1.profile.pk).last_visit, b=last_visit)
+
+        def test_send_message_updates_last_message_timestamp(self):
+            self.assertEqual(first=get_last_message_timestamp(chat_id=self.chat_1_2.id), second=self.message_2.date_created.timestamp())
+
+        def test_waiting_on_idle_chat_does_not_query_the_database(self):
+            with self.assertNumQueries(num=0):
+                self.assertFalse(expr=wait_for_new_message(chat=self.chat_1_2, since=self.message_2.date_created.timestamp() + 0.0001, timeout=0.2))
+
+        def test_waiting_on_uncached_chat_queries_the_database_once(self):
+            set_last_message_timestamp(chat_id=self.chat_1_2.id, timestamp=None)
+            with self.assertNumQueries(num=1):
+                self.assertFalse(expr=wait_for_new_message(chat=self.chat_1_2, since=self.message_2.date_created.timestamp() + 0.0001, timeout=0.2))
+            self.assertEqual(first=get_last_message_timestamp(chat_id=self.chat_1_2.id), second=self.message_2.date_created.timestamp())
+
+        def test_new_message_wakes_up_waiting_request(self):
+            since = self.message_2.date_created.timestamp() - 0.0001
+            set_last_message_timestamp(chat_id=self.chat_1_2.id, timestamp=self.message_1.date_created.timestamp())
+            timer = threading.Timer(interval=0.1, function=notify_new_message, kwargs={'message': self.message_2})
+            timer.start()
+            start_time = monotonic()
+            self.assertTrue(expr=wait_for_new_message(chat=self.chat_1_2, since=since, timeout=10))
+            self.assertLess(a=monotonic() - start_time, b=1)
+            timer.join()
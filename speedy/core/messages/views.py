@@ -1,17 +1,20 @@
 from datetime import datetime
 
+from django.conf import settings as django_settings
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse
-from django.db.models import Q
-from django.http import Http404
+from django.db.models import Q, Subquery
+from django.http import Http404, HttpResponseNotModified
 from django.shortcuts import redirect
 from django.views import generic
 from rules.contrib.views import PermissionRequiredMixin
 
+from speedy.core.accounts.models import Entity
 from speedy.core.profiles.views import UserMixin
 from speedy.core.base.utils import normalize_username
 from .forms import MessageForm
 from .models import Chat
+from .notifications import wait_for_new_message
 
 
 class UserChatsMixin(UserMixin, PermissionRequiredMixin):
@@ -37,18 +40,21 @@ class UserSingleChatMixin(UserChatsMixin):
             return self.handle_no_permission()
 
     def get_chat(self):
+        # The slug is the slug of the other participant of a private chat, or the chat id.
         slug = self.kwargs['chat_slug']
         user = self.get_user()
+        other_entity = Entity.objects.filter(slug=slug).first()
+        if (other_entity is not None):
+            chats = self.get_chat_queryset().filter(pair_key=Chat.get_pair_key(ent1_id=user.id, ent2_id=other_entity.id))
+        else:
+            chats = self.get_chat_queryset().filter(id=slug)
         try:
-            q_id = Q(id=slug)
-            q_slug_1 = Q(ent1__slug=slug, ent2_id=user.id)
-            q_slug_2 = Q(ent1_id=user.id, ent2__slug=slug)
-            return self.get_chat_queryset().filter(q_id | q_slug_1 | q_slug_2)[0]
-        except (IndexError, Chat.DoesNotExist):
+            return chats[0]
+        except IndexError:
             raise Http404()
 
     def get_messages_queryset(self):
-        return self.get_chat().message_set.prefetch_related('sender__user')
+        return self.chat.message_set.prefetch_related('sender__user')
 
     def has_permission(self):
         return ((super().has_permission()) and (self.request.user.has_perm(perm='messages.read_chat', obj=self.chat)))
@@ -61,6 +67,46 @@ class UserSingleChatMixin(UserChatsMixin):
         return cd
 
 
+class ChatMessagesPageMixin(object):
+    """
+    Paginates the chat's messages by (date_created, id) before or after the message in the request, instead of by offset.
+    Each page costs the same however deep in the chat history it is.
+    """
+    page_size = 24
+    context_object_name = 'message_list'
+
+    def get_messages_page(self):
+        before = self.request.GET.get('before')
+        after = self.request.GET.get('after')
+        messages = self.get_messages_queryset()
+        if (after):
+            date_created = Subquery(self.chat.message_set.filter(id=after).values('date_created'))
+            messages = messages.filter(date_created__gte=date_created).filter(Q(date_created__gt=date_created) | Q(id__gt=after)).order_by('date_created', 'id')
+        elif (before):
+            date_created = Subquery(self.chat.message_set.filter(id=before).values('date_created'))
+            messages = messages.filter(date_created__lte=date_created).filter(Q(date_created__lt=date_created) | Q(id__lt=before)).order_by('-date_created', '-id')
+        else:
+            messages = messages.order_by('-date_created', '-id')
+        # Fetch one more message to know if there are more messages.
+        messages = list(messages[:self.page_size + 1])
+        has_more_messages = (len(messages) > self.page_size)
+        messages = messages[:self.page_size]
+        if (after):
+            messages.reverse()
+            self.has_newer_messages, self.has_older_messages = has_more_messages, True
+        else:
+            self.has_newer_messages, self.has_older_messages = bool(before), has_more_messages
+        return messages
+
+    def get_context_data(self, **kwargs):
+        cd = super().get_context_data(**kwargs)
+        cd.update({
+            'has_newer_messages': getattr(self, 'has_newer_messages', False),
+            'has_older_messages': getattr(self, 'has_older_messages', False),
+        })
+        return cd
+
+
 class ChatListView(UserChatsMixin, PermissionRequiredMixin, generic.ListView):
     template_name = 'messages/chat_list.html'
     page_size = 24
@@ -70,10 +116,8 @@ class ChatListView(UserChatsMixin, PermissionRequiredMixin, generic.ListView):
         return self.get_chat_queryset()
 
 
-class ChatDetailView(UserSingleChatMixin, generic.ListView):
+class ChatDetailView(ChatMessagesPageMixin, UserSingleChatMixin, generic.ListView):
     template_name = 'messages/chat_detail.html'
-    page_size = 24
-    paginate_by = page_size
 
     def dispatch(self, request, *args, **kwargs):
         if (not (request.user.is_authenticated)):
@@ -102,7 +146,7 @@ class ChatDetailView(UserSingleChatMixin, generic.ListView):
 
     def get_queryset(self):
         if (self.chat):
-            return self.get_messages_queryset()
+            return self.get_messages_page()
         else:
             return []
 
@@ -120,13 +164,33 @@ class ChatDetailView(UserSingleChatMixin, generic.ListView):
         return cd
 
 
+class ChatOlderMessagesView(ChatMessagesPageMixin, UserSingleChatMixin, generic.ListView):
+    template_name = 'messages/message_list_older.html'
+
+    def get_queryset(self):
+        return self.get_messages_page()
+
+
 class ChatPollMessagesView(UserSingleChatMixin, generic.ListView):
     template_name = 'messages/message_list_poll.html'
 
+    def get_chat_queryset(self):
+        # The last message is not needed, its timestamp is checked in the cache.
+        return Chat.objects.chats(entity=self.get_user()).prefetch_related('ent1__user', 'ent2__user').order_by()
+
+    def get(self, request, *args, **kwargs):
+        self.since = float(self.request.GET.get('since', 0))
+        self.since += 0.0001
+        # Check the chat's last message timestamp in the cache before querying the messages. With wait, it's a long poll - wait until a new message is sent to this chat.
+        timeout = (django_settings.MESSAGES_LONG_POLL_TIMEOUT if (self.request.GET.get('wait')) else 0)
+        if (not (wait_for_new_message(chat=self.chat, since=self.since, timeout=timeout))):
+            return HttpResponseNotModified()
+        # The last visit is not updated by SiteProfileMiddleware for polls, only when there are new messages.
+        self.request.user.profile.update_last_visit()
+        return super().get(request=request, *args, **kwargs)
+
     def get_queryset(self):
-        since = float(self.request.GET.get('since', 0))
-        since += 0.0001
-        return self.get_messages_queryset().filter(date_created__gt=datetime.fromtimestamp(since))
+        return self.get_messages_queryset().filter(date_created__gt=datetime.fromtimestamp(self.since))
 
 
 class SendMessageToChatView(UserSingleChatMixin, generic.CreateView):
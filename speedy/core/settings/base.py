@@ -29,6 +29,11 @@ ALLOWED_HOSTS = ['*']
 DEFAULT_FROM_EMAIL = 'webmaster@speedy.net'
 SERVER_EMAIL = 'webmaster+server@speedy.net'
 
+# With MAIL_QUEUE_ENABLED, emails are saved in the database and sent by the send_queued_mail command. Enable it only where "send_queued_mail --worker" runs, otherwise emails are never sent.
+MAIL_QUEUE_ENABLED = False
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+MAIL_QUEUE_RETRY_DELAY = 60  # In seconds, doubled after each failed attempt.
+
 ADMINS = MANAGERS = (
     ('Uri Rodberg', 'webmaster@speedy.net'),
 )
@@ -55,6 +55,15 @@ IGNORE_LAST_VISIT = [
     '/set-session/',
 ]
 
+# Views which update the last visit themselves, only when needed.
+IGNORE_LAST_VISIT_VIEW_NAMES = [
+    'messages:chat_poll',
+]
+
+# Maximum time in seconds a chat poll waits for a new message before returning an empty response. 0 disables long polling, and the chat page polls every 5 seconds.
+# Each long poll holds a worker for up to this long, so enable it only with threaded workers (uwsgi threads), not with processes only.
+MESSAGES_LONG_POLL_TIMEOUT = 0
+
 LOCALE_PATHS += [
     str(ROOT_DIR / 'speedy/net/locale'),
     str(ROOT_DIR / 'speedy/match/locale'),
@@ -99,20 +99,45 @@ evil.block('@@AutoForm', {
 
 evil.block('@@MessageList', {
     init: function () {
+        if (this.block.data('poll-url')) {
+            this.poll();
+        }
+    },
+
+    'click on @olderMessages a': function (e) {
+        e.preventDefault();
         var _this = this;
-        window.setInterval(function () {
-            _this.poll();
-        }, 5000);
+        var olderMessages = this.$('@olderMessages');
+        var url = olderMessages.find('a').data('url') + '?before=' + this.$('@message').last().data('id');
+        $.get(url, function (data) {
+            olderMessages.remove();
+            $(data).appendTo(_this.block);
+        });
     },
 
     poll: function () {
         var _this = this;
+        var longPoll = this.block.data('long-poll');
         var url = this.block.data('poll-url');
-        var since = this.$('@message').first().data('timestamp');
+        var since = this.$('@message').first().data('timestamp') || 0;
         url += '?since=' + since;
+        if (longPoll) {
+            url += '&wait=1';
+        }
         $.get(url, function (data) {
             $(data).prependTo(_this.block);
+            // With long polling the server holds the request until a new message arrives, so the next poll starts right away.
+            _this.schedulePoll(longPoll ? 0 : 5000);
+        }).fail(function () {
+            _this.schedulePoll(5000);
         });
+    },
+
+    schedulePoll: function (delay) {
+        var _this = this;
+        window.setTimeout(function () {
+            _this.poll();
+        }, delay);
     }
 });
 
@@ -0,0 +1,481 @@
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+import numpy as np
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import transaction
+
+from speedy.core.base.utils import generate_regular_udid
+from speedy.core.accounts.models import User
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_INDEX_VERSION_CACHE_KEY = 'speedy_match_candidate_index_version'
+CANDIDATE_INDEX_NUMBER_OF_CHANGES_CACHE_KEY = 'speedy_match_candidate_index_number_of_changes'
+CANDIDATE_INDEX_CHANGE_CACHE_KEY = 'speedy_match_candidate_index_change:{number}'
+CANDIDATE_INDEX_CHANGE_TIMEOUT = 60 * 60  # 1 hour, in seconds.
+CANDIDATE_INDEX_MAX_CHANGES_TO_UPDATE = 1000  # With more changes, the index is built again instead of updated.
+CANDIDATE_INDEX_ROW_SIGNATURE_CACHE_KEY = 'speedy_match_candidate_index_row_signature:{user_id}'
+CANDIDATE_INDEX_ROW_SIGNATURE_TIMEOUT = 60 * 60 * 24 * 30  # 30 days, in seconds.
+MATCHES_CACHE_VERSION_CACHE_KEY = 'speedy_match_matches_version'
+MATCHES_CACHE_KEY = 'speedy_match_matches:{user_id}:{language_code}'
+
+_candidate_indexes = {}
+_candidate_indexes_lock = threading.Lock()
+
+
+def get_bitmask(values):
+    bitmask = 0
+    for value in values or []:
+        bitmask |= (1 << int(value))
+    return bitmask
+
+
+def get_rank_table_row(match, values_to_match_bitmask, size):
+    """
+    Convert a rank dict such as `diet_match` to a list indexed by value. Values which are not in `values_to_match_bitmask` get RANK_0.
+    """
+    from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+    return [(match.get(str(value), SpeedyMatchSiteProfile.RANK_0) if ((values_to_match_bitmask >> value) & 1) else SpeedyMatchSiteProfile.RANK_0) for value in range(size)]
+
+
+def get_cache_version(cache_key):
+    version = cache.get(cache_key)
+    if (version is None):
+        cache.add(cache_key, generate_regular_udid(), timeout=None)
+        version = cache.get(cache_key)
+    return version
+
+
+def get_candidate_index_version():
+    return get_cache_version(cache_key=CANDIDATE_INDEX_VERSION_CACHE_KEY)
+
+
+def invalidate_candidate_index():
+    cache.set(CANDIDATE_INDEX_VERSION_CACHE_KEY, generate_regular_udid(), timeout=None)
+
+
+def record_candidate_index_change(user_id):
+    """
+    Record that the row of this user in the candidate indexes has changed. Each process updates only the changed rows of its indexes, instead of building them again.
+    """
+    try:
+        number = cache.incr(CANDIDATE_INDEX_NUMBER_OF_CHANGES_CACHE_KEY)
+    except ValueError:
+        # The counter doesn't exist yet, or was evicted. The changes recorded before it can't be applied anymore, so the indexes are built again.
+        cache.add(CANDIDATE_INDEX_NUMBER_OF_CHANGES_CACHE_KEY, 0, timeout=None)
+        invalidate_candidate_index()
+        number = cache.incr(CANDIDATE_INDEX_NUMBER_OF_CHANGES_CACHE_KEY)
+    cache.set(CANDIDATE_INDEX_CHANGE_CACHE_KEY.format(number=number), user_id, timeout=CANDIDATE_INDEX_CHANGE_TIMEOUT)
+
+
+def get_cached_matches(user_id, language_code):
+    """
+    Return the cached list of (user_id, rank) tuples of the matches of this user in this language, or None if it's not cached.
+    """
+    cached_matches = cache.get(MATCHES_CACHE_KEY.format(user_id=user_id, language_code=language_code))
+    if ((cached_matches is not None) and (cached_matches['version'] == get_cache_version(cache_key=MATCHES_CACHE_VERSION_CACHE_KEY))):
+        return cached_matches['matches']
+    return None
+
+
+def set_cached_matches(user_id, language_code, matches):
+    from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+    cached_matches = {
+        'version': get_cache_version(cache_key=MATCHES_CACHE_VERSION_CACHE_KEY),
+        'matches': matches,
+    }
+    cache.set(MATCHES_CACHE_KEY.format(user_id=user_id, language_code=language_code), cached_matches, timeout=SpeedyMatchSiteProfile.settings.MATCHES_CACHE_TIMEOUT)
+
+
+def invalidate_cached_matches(user_ids):
+    cache.delete_many([MATCHES_CACHE_KEY.format(user_id=user_id, language_code=language_code) for user_id in user_ids for language_code, language_name in django_settings.LANGUAGES])
+
+
+def invalidate_all_cached_matches():
+    cache.set(MATCHES_CACHE_VERSION_CACHE_KEY, generate_regular_udid(), timeout=None)
+
+
+def get_profile_signature(site_profile):
+    """
+    Return a hash of all the values of this profile which are stored in the candidate index, except last_visit.
+    """
+    user = site_profile.user
+    values = (
+        user.is_active,
+        user.gender,
+        user.age,
+        user.diet,
+        user.smoking_status,
+        user.relationship_status,
+        tuple(sorted(site_profile.active_languages or [])),
+        site_profile.height,
+        site_profile.not_allowed_to_use_speedy_match,
+        tuple(sorted(site_profile.gender_to_match or [])),
+        site_profile.min_age_to_match,
+        site_profile.max_age_to_match,
+        tuple(sorted((site_profile.diet_match or {}).items())),
+        tuple(sorted((site_profile.smoking_status_match or {}).items())),
+        tuple(sorted((site_profile.relationship_status_match or {}).items())),
+        tuple(site_profile.diet_to_match or []),
+        tuple(site_profile.smoking_status_to_match or []),
+        tuple(site_profile.relationship_status_to_match or []),
+    )
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
+
+def get_profile_visibility(site_profile):
+    """
+    Return the values of this profile which decide whether it may appear in other users' matches at all.
+    """
+    return (
+        site_profile.user.is_active,
+        tuple(sorted(site_profile.active_languages or [])),
+        site_profile.not_allowed_to_use_speedy_match,
+    )
+
+
+def get_matching_user_ids(user_id):
+    """
+    Return the ids of the users who match this user in any language, according to the current row of this user in the candidate indexes.
+    Matching is mutual, so these are also the users who may have this user in their cached matches.
+    """
+    user_ids = set()
+    for language_code, language_name in django_settings.LANGUAGES:
+        user_ids |= get_candidate_index(language_code=language_code).get_matching_user_ids(user_id=user_id)
+    return user_ids
+
+
+def update_caches_after_saving_profile(site_profile, created=False):
+    """
+    Update the row of this profile in the candidate indexes of all processes if any value stored in the index has changed.
+    The cached matches of this user are invalidated too, with the cached matches of the users who matched this user before the change or match this user after it.
+    If the profile was activated, deactivated or its not_allowed_to_use_speedy_match flag was changed - the cached matches of all the users are invalidated.
+    Called on every save (including updating last_visit), so only a cache lookup is done if nothing has changed.
+    """
+    signature = get_profile_signature(site_profile=site_profile)
+    visibility = get_profile_visibility(site_profile=site_profile)
+    cache_key = CANDIDATE_INDEX_ROW_SIGNATURE_CACHE_KEY.format(user_id=site_profile.user_id)
+    cached_value = cache.get(cache_key)
+    if (cached_value == (signature, visibility)):
+        return
+    cache.set(cache_key, (signature, visibility), timeout=CANDIDATE_INDEX_ROW_SIGNATURE_TIMEOUT)
+    if ((cached_value is None) and (not (created))):
+        # The signature is not cached yet, or was evicted - only save it. Invalidating on a miss would update the indexes and the cached matches after every save when the cache is cleared.
+        # If the profile was changed meanwhile, the change is in the index when it's built again, after CANDIDATE_INDEX_MAX_AGE.
+        return
+    user_id = site_profile.user_id
+    if ((cached_value is None) or (not (cached_value[1] == visibility))):
+        user_ids = None
+    else:
+        # Only the pairs which include this user have changed, so only the cached matches of this user and of the users who matched them before or after the change are invalidated.
+        user_ids = get_matching_user_ids(user_id=user_id)
+        user_ids.add(user_id)
+
+    def apply_change():
+        record_candidate_index_change(user_id=user_id)
+        if (user_ids is None):
+            invalidate_all_cached_matches()
+        else:
+            user_ids.update(get_matching_user_ids(user_id=user_id))
+            invalidate_cached_matches(user_ids=user_ids)
+
+    # Apply the change now, for the rest of this transaction, and again after it's committed - other processes may have read the old row or cached the old matches meanwhile.
+    apply_change()
+    transaction.on_commit(apply_change)
+
+
+def get_candidate_index(language_code):
+    cached_values = cache.get_many([CANDIDATE_INDEX_VERSION_CACHE_KEY, CANDIDATE_INDEX_NUMBER_OF_CHANGES_CACHE_KEY])
+    version = cached_values.get(CANDIDATE_INDEX_VERSION_CACHE_KEY)
+    if (version is None):
+        version = get_candidate_index_version()
+    number_of_changes = cached_values.get(CANDIDATE_INDEX_NUMBER_OF_CHANGES_CACHE_KEY, 0)
+    candidate_index = _candidate_indexes.get(language_code)
+    if ((candidate_index is None) or (not (candidate_index.is_up_to_date(version=version))) or (not (candidate_index.number_of_changes == number_of_changes))):
+        with _candidate_indexes_lock:
+            candidate_index = _candidate_indexes.get(language_code)
+            if ((candidate_index is None) or (not (candidate_index.is_up_to_date(version=version)))):
+                candidate_index = CandidateIndex(language_code=language_code, version=version, number_of_changes=number_of_changes)
+            elif (not (candidate_index.number_of_changes == number_of_changes)):
+                candidate_index = candidate_index.get_updated_index(number_of_changes=number_of_changes)
+            _candidate_indexes[language_code] = candidate_index
+    return candidate_index
+
+
+class CandidateIndex(object):
+    """
+    Columnar in-memory index of all the Speedy Match profiles which are active in one language.
+
+    Each column is a NumPy array with one row per profile, so both sides of the compatibility check
+    of one user against all the candidates are evaluated with vectorized operations.
+    """
+    COLUMN_NAMES = ('gender', 'age', 'diet', 'smoking_status', 'relationship_status', 'height', 'gender_to_match', 'min_age_to_match', 'max_age_to_match', 'diet_match', 'smoking_status_match', 'relationship_status_match', 'last_visit', 'is_candidate')
+
+    def __init__(self, language_code, version, number_of_changes=0):
+        start_time = time.time()
+        self.language_code = language_code
+        self.version = version
+        self.number_of_changes = number_of_changes
+        self.date_created = start_time
+        self.user_ids, columns = self._get_columns(rows=self._get_queryset().iterator())
+        for column_name, column in columns.items():
+            setattr(self, column_name, column)
+        self.positions = {user_id: position for position, user_id in enumerate(self.user_ids)}
+        logger.debug("CandidateIndex::__init__:language_code={language_code}, number_of_profiles={number_of_profiles}, time={time:.3f}".format(
+            language_code=language_code,
+            number_of_profiles=len(self),
+            time=time.time() - start_time,
+        ))
+
+    def _get_queryset(self):
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+        return SpeedyMatchSiteProfile.objects.filter(
+            user__is_active=True,
+            user__age__isnull=False,
+            active_languages__contains=[self.language_code],
+            not_allowed_to_use_speedy_match=False,
+            height__isnull=False,
+        ).values_list(
+            'user_id',
+            'user__gender',
+            'user__age',
+            'user__diet',
+            'user__smoking_status',
+            'user__relationship_status',
+            'height',
+            'gender_to_match_bitmask',
+            'min_age_to_match',
+            'max_age_to_match',
+            'diet_match',
+            'smoking_status_match',
+            'relationship_status_match',
+            'diet_to_match_bitmask',
+            'smoking_status_to_match_bitmask',
+            'relationship_status_to_match_bitmask',
+            'last_visit',
+        ).order_by()
+
+    def _get_columns(self, rows):
+        """
+        Return the list of user ids and a dict of the columns (NumPy arrays) of these rows of _get_queryset.
+        """
+        user_ids, gender, age, diet, smoking_status, relationship_status, height = [], [], [], [], [], [], []
+        gender_to_match, min_age_to_match, max_age_to_match, diet_match, smoking_status_match, relationship_status_match, last_visit = [], [], [], [], [], [], []
+        for row in rows:
+            user_ids.append(row[0])
+            gender.append(row[1])
+            age.append(row[2])
+            diet.append(row[3])
+            smoking_status.append(row[4])
+            relationship_status.append(row[5])
+            height.append(row[6])
+            gender_to_match.append(row[7])
+            min_age_to_match.append(row[8])
+            max_age_to_match.append(row[9])
+            diet_match.append(get_rank_table_row(match=row[10], values_to_match_bitmask=row[13], size=User.DIET_MAX_VALUE_PLUS_ONE))
+            smoking_status_match.append(get_rank_table_row(match=row[11], values_to_match_bitmask=row[14], size=User.SMOKING_STATUS_MAX_VALUE_PLUS_ONE))
+            relationship_status_match.append(get_rank_table_row(match=row[12], values_to_match_bitmask=row[15], size=User.RELATIONSHIP_STATUS_MAX_VALUE_PLUS_ONE))
+            last_visit.append(row[16].timestamp())
+        columns = {
+            'gender': np.array(gender, dtype=np.int8),
+            'age': np.array(age, dtype=np.int16),
+            'diet': np.array(diet, dtype=np.int8),
+            'smoking_status': np.array(smoking_status, dtype=np.int8),
+            'relationship_status': np.array(relationship_status, dtype=np.int8),
+            'height': np.array(height, dtype=np.int16),
+            'gender_to_match': np.array(gender_to_match, dtype=np.int16),
+            'min_age_to_match': np.array(min_age_to_match, dtype=np.int16),
+            'max_age_to_match': np.array(max_age_to_match, dtype=np.int16),
+            'diet_match': np.array(diet_match, dtype=np.int8).reshape((len(user_ids), User.DIET_MAX_VALUE_PLUS_ONE)),
+            'smoking_status_match': np.array(smoking_status_match, dtype=np.int8).reshape((len(user_ids), User.SMOKING_STATUS_MAX_VALUE_PLUS_ONE)),
+            'relationship_status_match': np.array(relationship_status_match, dtype=np.int8).reshape((len(user_ids), User.RELATIONSHIP_STATUS_MAX_VALUE_PLUS_ONE)),
+            'last_visit': np.array(last_visit, dtype=np.float64),
+            # Rows of users who are not candidates anymore are kept until the index is built again, and ignored.
+            'is_candidate': np.ones(len(user_ids), dtype=np.bool_),
+        }
+        return user_ids, columns
+
+    def get_updated_index(self, number_of_changes):
+        """
+        Return a copy of this index with the rows of the users recorded by record_candidate_index_change since it was built or updated.
+        If the changes can't be read from the cache, a new index is built instead.
+        """
+        if (self.number_of_changes < number_of_changes <= self.number_of_changes + CANDIDATE_INDEX_MAX_CHANGES_TO_UPDATE):
+            cache_keys = [CANDIDATE_INDEX_CHANGE_CACHE_KEY.format(number=number) for number in range(self.number_of_changes + 1, number_of_changes + 1)]
+            changes = cache.get_many(cache_keys)
+            if (len(changes) == len(cache_keys)):
+                return self._get_index_with_updated_rows(user_ids=set(changes.values()), number_of_changes=number_of_changes)
+        return self.__class__(language_code=self.language_code, version=self.version, number_of_changes=number_of_changes)
+
+    def _get_index_with_updated_rows(self, user_ids, number_of_changes):
+        # The index is copied and not changed in place, since other threads may be using it.
+        candidate_index = copy.copy(self)
+        candidate_index.number_of_changes = number_of_changes
+        candidate_index.user_ids = list(self.user_ids)
+        candidate_index.positions = dict(self.positions)
+        for column_name in self.__class__.COLUMN_NAMES:
+            setattr(candidate_index, column_name, getattr(self, column_name).copy())
+        rows_user_ids, columns = self._get_columns(rows=self._get_queryset().filter(user_id__in=user_ids))
+        new_rows = []
+        for row_number, user_id in enumerate(rows_user_ids):
+            position = candidate_index.positions.get(user_id)
+            if (position is None):
+                new_rows.append(row_number)
+            else:
+                for column_name, column in columns.items():
+                    getattr(candidate_index, column_name)[position] = column[row_number]
+        for user_id in (user_ids - set(rows_user_ids)):
+            position = candidate_index.positions.get(user_id)
+            if (position is not None):
+                candidate_index.is_candidate[position] = False
+        if (len(new_rows) > 0):
+            for column_name, column in columns.items():
+                setattr(candidate_index, column_name, np.concatenate([getattr(candidate_index, column_name), column[new_rows]]))
+            for row_number in new_rows:
+                candidate_index.positions[rows_user_ids[row_number]] = len(candidate_index.user_ids)
+                candidate_index.user_ids.append(rows_user_ids[row_number])
+        return candidate_index
+
+    def __len__(self):
+        return int(np.count_nonzero(self.is_candidate))
+
+    def is_up_to_date(self, version):
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+        return ((self.version == version) and (time.time() - self.date_created < SpeedyMatchSiteProfile.settings.CANDIDATE_INDEX_MAX_AGE))
+
+    def get_matching_user_ids(self, user_id):
+        """
+        Return the set of ids of the candidates who match the candidate user_id in both directions, or an empty set if user_id is not a candidate. Blocks are not checked.
+        """
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+        position = self.positions.get(user_id)
+        if ((position is None) or (not (self.is_candidate[position]))):
+            return set()
+        settings = SpeedyMatchSiteProfile.settings
+        if (not (settings.MIN_HEIGHT_TO_MATCH <= self.height[position] <= settings.MAX_HEIGHT_TO_MATCH)):
+            return set()
+        mask = self.is_candidate.copy()
+        mask[position] = False
+        mask &= (((int(self.gender_to_match[position]) >> self.gender) & 1) == 1)
+        mask &= ((self.min_age_to_match[position] <= self.age) & (self.age <= self.max_age_to_match[position]))
+        mask &= (((self.gender_to_match >> int(self.gender[position])) & 1) == 1)
+        mask &= ((self.min_age_to_match <= self.age[position]) & (self.age[position] <= self.max_age_to_match))
+        mask &= ((settings.MIN_HEIGHT_TO_MATCH <= self.height) & (self.height <= settings.MAX_HEIGHT_TO_MATCH))
+        mask &= (np.minimum(np.minimum(self.diet_match[:, self.diet[position]], self.smoking_status_match[:, self.smoking_status[position]]), self.relationship_status_match[:, self.relationship_status[position]]) > SpeedyMatchSiteProfile.RANK_0)
+        mask &= (np.minimum(np.minimum(self.diet_match[position][self.diet], self.smoking_status_match[position][self.smoking_status]), self.relationship_status_match[position][self.relationship_status]) > SpeedyMatchSiteProfile.RANK_0)
+        return {self.user_ids[position] for position in np.flatnonzero(mask).tolist()}
+
+    def get_matches(self, user_profile, excluded_users_ids, instrumentation=None):
+        """
+        Return a list of (user_id, rank) tuples of all the matches of user_profile, ordered by rank and last visit.
+        """
+        return [(user_id, rank) for user_id, rank, other_user_rank in self.get_mutual_matches(user_profile=user_profile, excluded_users_ids=excluded_users_ids, instrumentation=instrumentation)]
+
+    def get_mutual_matches(self, user_profile, excluded_users_ids, instrumentation=None):
+        """
+        Return a list of (user_id, rank, other_user_rank) tuples of all the matches of user_profile, ordered by rank and last visit.
+        other_user_rank is the rank of user_profile for the other user.
+        If instrumentation is given, the number of candidates left after each predicate and the time of each phase are recorded.
+        """
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+        def count(stage, mask):
+            if (instrumentation is not None):
+                instrumentation.count(stage=stage, number=np.count_nonzero(mask))
+
+        user = user_profile.user
+        settings = SpeedyMatchSiteProfile.settings
+        if (instrumentation is not None):
+            instrumentation.count(stage='candidates', number=len(self))
+        if ((user_profile.height is None) or (not (settings.MIN_HEIGHT_TO_MATCH <= user_profile.height <= settings.MAX_HEIGHT_TO_MATCH)) or (user_profile.not_allowed_to_use_speedy_match)):
+            return []
+        if (len(self) == 0):
+            return []
+        if (not ((0 <= user.diet < User.DIET_MAX_VALUE_PLUS_ONE) and (0 <= user.smoking_status < User.SMOKING_STATUS_MAX_VALUE_PLUS_ONE) and (0 <= user.relationship_status < User.RELATIONSHIP_STATUS_MAX_VALUE_PLUS_ONE))):
+            return []
+        user_age = user.age
+        if (user_age is None):
+            return []
+        user_diet_match = np.array(get_rank_table_row(match=user_profile.diet_match, values_to_match_bitmask=user_profile.diet_to_match_bitmask, size=User.DIET_MAX_VALUE_PLUS_ONE), dtype=np.int8)
+        user_smoking_status_match = np.array(get_rank_table_row(match=user_profile.smoking_status_match, values_to_match_bitmask=user_profile.smoking_status_to_match_bitmask, size=User.SMOKING_STATUS_MAX_VALUE_PLUS_ONE), dtype=np.int8)
+        user_relationship_status_match = np.array(get_rank_table_row(match=user_profile.relationship_status_match, values_to_match_bitmask=user_profile.relationship_status_to_match_bitmask, size=User.RELATIONSHIP_STATUS_MAX_VALUE_PLUS_ONE), dtype=np.int8)
+
+        # The user matches the candidates.
+        mask = self.is_candidate & (((user_profile.gender_to_match_bitmask >> self.gender) & 1) == 1)
+        count(stage='gender', mask=mask)
+        mask &= ((user_profile.min_age_to_match <= self.age) & (self.age <= user_profile.max_age_to_match))
+        count(stage='age', mask=mask)
+        # The candidates match the user.
+        mask &= (((self.gender_to_match >> user.gender) & 1) == 1)
+        count(stage='other_user_gender', mask=mask)
+        mask &= ((self.min_age_to_match <= user_age) & (user_age <= self.max_age_to_match))
+        count(stage='other_user_age', mask=mask)
+        mask &= ((settings.MIN_HEIGHT_TO_MATCH <= self.height) & (self.height <= settings.MAX_HEIGHT_TO_MATCH))
+        count(stage='height', mask=mask)
+        other_user_rank = np.minimum(np.minimum(self.diet_match[:, user.diet], self.smoking_status_match[:, user.smoking_status]), self.relationship_status_match[:, user.relationship_status])
+        mask &= (other_user_rank > SpeedyMatchSiteProfile.RANK_0)
+        count(stage='other_user_rank', mask=mask)
+        rank = np.minimum(np.minimum(user_diet_match[self.diet], user_smoking_status_match[self.smoking_status]), user_relationship_status_match[self.relationship_status])
+        mask &= (rank > SpeedyMatchSiteProfile.RANK_0)
+        count(stage='rank', mask=mask)
+
+        positions = np.flatnonzero(mask)
+        if (instrumentation is not None):
+            instrumentation.end_phase(phase='filter')
+        # Sort by rank and then by last visit, both descending.
+        positions = positions[np.lexsort((-self.last_visit[positions], -rank[positions]))]
+        if (instrumentation is not None):
+            instrumentation.end_phase(phase='sort')
+        excluded_users_ids = set(excluded_users_ids) | {user.pk}
+        matches = []
+        for position in positions.tolist():
+            user_id = self.user_ids[position]
+            if (not (user_id in excluded_users_ids)):
+                matches.append((user_id, int(rank[position]), int(other_user_rank[position])))
+        if (instrumentation is not None):
+            instrumentation.count(stage='blocks', number=len(matches))
+            instrumentation.end_phase(phase='exclude_blocks')
+        return matches
+
+
+class MatchesList(object):
+    """
+    An ordered list of matches which fetches users from the database only when sliced, to be used with a paginator.
+    """
+    def __init__(self, matches):
+        self.matches = matches
+
+    def __len__(self):
+        return len(self.matches)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if (isinstance(key, slice)):
+            return self._get_users(matches=self.matches[key])
+        return self._get_users(matches=[self.matches[key]])[0]
+
+    @property
+    def user_ids(self):
+        return [user_id for user_id, rank in self.matches]
+
+    def _get_users(self, matches):
+        users_dict = {user.pk: user for user in User.objects.filter(pk__in=[user_id for user_id, rank in matches])}
+        users = []
+        for user_id, rank in matches:
+            user = users_dict.get(user_id)
+            if (user is not None):
+                user.speedy_match_profile.rank = rank
+                users.append(user)
+        return users
+
+
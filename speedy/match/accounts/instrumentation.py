@@ -0,0 +1,90 @@
+import json
+import logging
+import time
+
+import numpy as np
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+MATCHES_INSTRUMENTATION_CACHE_KEY = 'speedy_match_get_matches_instrumentation:{language_code}'
+MATCHES_INSTRUMENTATION_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 7 days, in seconds.
+
+
+class MatchesInstrumentation(object):
+    """
+    Records the time of each phase of one call to get_matches, and the number of candidates left after each stage.
+    Enabled only if SPEEDY_MATCH_SITE_PROFILE_SETTINGS.MATCHES_INSTRUMENTATION_ENABLED is True.
+    """
+    def __init__(self, language_code):
+        self.language_code = language_code
+        self.timings = []
+        self.counts = []
+        self.start_time = time.time()
+        self._last_time = self.start_time
+
+    def end_phase(self, phase):
+        current_time = time.time()
+        self.timings.append((phase, current_time - self._last_time))
+        self._last_time = current_time
+
+    def count(self, stage, number):
+        self.counts.append((stage, int(number)))
+
+    def get_record(self):
+        return {
+            'language_code': self.language_code,
+            'total_time': self._last_time - self.start_time,
+            'timings': self.timings,
+            'counts': self.counts,
+        }
+
+    def save(self):
+        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+        record = self.get_record()
+        logger.info("MatchesInstrumentation::save:record={record}".format(record=json.dumps(record, sort_keys=True)))
+        # The last records are saved in the cache as a ring buffer.
+        cache_key = MATCHES_INSTRUMENTATION_CACHE_KEY.format(language_code=self.language_code)
+        records = cache.get(cache_key, [])
+        records.append(record)
+        records = records[-SpeedyMatchSiteProfile.settings.MATCHES_INSTRUMENTATION_RING_BUFFER_SIZE:]
+        cache.set(cache_key, records, timeout=MATCHES_INSTRUMENTATION_CACHE_TIMEOUT)
+
+
+def get_records(language_code):
+    return cache.get(MATCHES_INSTRUMENTATION_CACHE_KEY.format(language_code=language_code), [])
+
+
+def get_summary(language_code):
+    """
+    Return the p50 and p95 latency of get_matches and of each phase, and the average number of candidates left after each stage, in this language.
+    """
+    records = get_records(language_code=language_code)
+    if (len(records) == 0):
+        return None
+    phases, stages = [], []
+    phase_timings, stage_counts = {}, {}
+    for record in records:
+        for phase, phase_time in record['timings']:
+            if (not (phase in phase_timings)):
+                phases.append(phase)
+                phase_timings[phase] = []
+            phase_timings[phase].append(phase_time)
+        for stage, number in record['counts']:
+            if (not (stage in stage_counts)):
+                stages.append(stage)
+                stage_counts[stage] = []
+            stage_counts[stage].append(number)
+    total_times = [record['total_time'] for record in records]
+    return {
+        'language_code': language_code,
+        'number_of_calls': len(records),
+        'p50': float(np.percentile(total_times, 50)),
+        'p95': float(np.percentile(total_times, 95)),
+        'phases': [{'phase': phase, 'p50': float(np.percentile(phase_timings[phase], 50)), 'p95': float(np.percentile(phase_timings[phase], 95))} for phase in phases],
+        'funnel': [{'stage': stage, 'average': float(np.mean(stage_counts[stage]))} for stage in stages],
+    }
+
+
@@ -0,0 +1,109 @@
+import json
+import logging
+import random
+import time
+
+import numpy as np
+
+from django.conf import settings as django_settings
+from django.contrib.sites.models import Site
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+from django.utils.timezone import now
+
+from speedy.core.accounts.models import User
+from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+from speedy.match.accounts.management.commands.generate_population import POPULATION_SLUG_PREFIX
+
+logger = logging.getLogger(__name__)
+
+PAGES = [
+    ('matches_list_view', '/matches/'),
+    ('likes_to_view', '/{slug}/likes/people-i-like/'),
+    ('likes_from_view', '/{slug}/likes/people-who-like-me/'),
+    ('likes_mutual_view', '/{slug}/likes/mutual/'),
+    ('friends_view', '/{slug}/friends/'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Time the matching functions and the list views against a generated population, and report the latency percentiles and the number of queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Number of users to sample from the population.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed used to sample the users.')
+        parser.add_argument('--population-seed', type=int, default=1, help='Seed of the population generated by generate_population.')
+        parser.add_argument('--language', type=str, default='en', choices=[language_code for language_code, language_name in django_settings.LANGUAGES])
+        parser.add_argument('--output', type=str, default=None, help='Path of a JSON file to save the results to.')
+
+    def handle(self, *args, **options):
+        users_ids = list(User.objects.filter(slug__startswith=POPULATION_SLUG_PREFIX.format(seed=options['population_seed'])).order_by('pk').values_list('pk', flat=True))
+        if (len(users_ids) == 0):
+            self.stderr.write("No population with seed {} exists. Generate it first with generate_population.".format(options['population_seed']))
+            return
+        rng = random.Random(options['seed'])
+        sample_ids = rng.sample(users_ids, min(len(users_ids), options['users']))
+        measurements = []
+        with translation.override(options['language']):
+            client = Client(HTTP_HOST="{language_code}.{domain}".format(language_code=options['language'], domain=Site.objects.get_current().domain))
+            for user in User.objects.filter(pk__in=sample_ids).select_related(SpeedyMatchSiteProfile.RELATED_NAME).order_by('pk'):
+                self.benchmark_user(user=user, users_ids=users_ids, rng=rng, client=client, measurements=measurements)
+        results = self.get_results(measurements=measurements)
+        for result in results:
+            self.stdout.write("{name}: calls={number_of_calls}, p50={p50:.4f}s, p95={p95:.4f}s, p99={p99:.4f}s, queries={average_number_of_queries:.1f}".format(**result))
+        if (options['output']):
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'date': now().isoformat(),
+                    'seed': options['seed'],
+                    'population_seed': options['population_seed'],
+                    'population_size': len(users_ids),
+                    'number_of_users': len(sample_ids),
+                    'language_code': options['language'],
+                    'results': results,
+                }, f, indent=4)
+            self.stdout.write("Saved the results to {}.".format(options['output']))
+
+    def measure(self, name, function, measurements):
+        with CaptureQueriesContext(connection) as queries:
+            start_time = time.perf_counter()
+            result = function()
+            measurements.append((name, time.perf_counter() - start_time, len(queries)))
+        return result
+
+    def benchmark_user(self, user, users_ids, rng, client, measurements):
+        user_profile = user.speedy_match_profile
+        self.measure(name='get_matches', function=lambda: SpeedyMatchSiteProfile.objects.get_matches(user_profile=user_profile), measurements=measurements)
+        self.measure(name='get_matches_page', function=lambda: SpeedyMatchSiteProfile.objects.get_matches_page(user_profile=user_profile), measurements=measurements)
+        other_user = User.objects.select_related(SpeedyMatchSiteProfile.RELATED_NAME).get(pk=rng.choice(users_ids))
+        self.measure(name='get_matching_rank', function=lambda: user_profile.get_matching_rank(other_profile=other_user.speedy_match_profile), measurements=measurements)
+        client.force_login(user=user)
+        for name, path in PAGES:
+            r = self.measure(name=name, function=lambda: client.get(path=path.format(slug=user.slug)), measurements=measurements)
+            if (not (r.status_code == 200)):
+                logger.warning("benchmark_matches::{name} returned status code {status_code} for user {user}.".format(name=name, status_code=r.status_code, user=user))
+        client.logout()
+
+    def get_results(self, measurements):
+        names = []
+        times, numbers_of_queries = {}, {}
+        for name, measured_time, number_of_queries in measurements:
+            if (not (name in times)):
+                names.append(name)
+                times[name] = []
+                numbers_of_queries[name] = []
+            times[name].append(measured_time)
+            numbers_of_queries[name].append(number_of_queries)
+        return [{
+            'name': name,
+            'number_of_calls': len(times[name]),
+            'p50': float(np.percentile(times[name], 50)),
+            'p95': float(np.percentile(times[name], 95)),
+            'p99': float(np.percentile(times[name], 99)),
+            'average_number_of_queries': float(np.mean(numbers_of_queries[name])),
+        } for name in names]
+
+
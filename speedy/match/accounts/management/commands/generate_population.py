@@ -0,0 +1,210 @@
+import io
+import logging
+import random
+import time
+from datetime import date, timedelta
+
+from PIL import Image as PILImage
+from friendship.models import Friend
+from friendship.exceptions import AlreadyExistsError, AlreadyFriendsError
+
+from django.conf import settings as django_settings
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from speedy.core.base.utils import normalize_username, to_attribute
+from speedy.core.accounts.models import User, UserEmailAddress
+from speedy.core.blocks.models import Block
+from speedy.core.uploads.models import Image
+from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+from speedy.match.likes.models import UserLike
+
+logger = logging.getLogger(__name__)
+
+POPULATION_SLUG_PREFIX = 'population-{seed}-'
+
+FIRST_NAMES = {
+    User.GENDER_FEMALE: ["Dana", "Noa", "Maya", "Sarah", "Yael", "Tamar", "Jennifer", "Emma", "Olivia", "Michal"],
+    User.GENDER_MALE: ["Doron", "Uri", "Yoni", "David", "Daniel", "Noam", "Michael", "James", "Oren", "Avi"],
+    User.GENDER_OTHER: ["Alex", "Sam", "Charlie", "Robin", "Shai", "Tal", "Noy", "Jordan", "Yuval", "Eden"],
+}
+LAST_NAMES = ["Cohen", "Levi", "Mizrahi", "Peretz", "Biton", "Friedman", "Smith", "Johnson", "Matalon", "Katz"]
+CITIES = ["Tel Aviv", "Jerusalem", "Haifa", "Beer Sheva", "London", "New York", "Berlin", "Paris"]
+
+# Realistic distributions, as lists of (value, weight).
+GENDERS = [(User.GENDER_FEMALE, 48), (User.GENDER_MALE, 48), (User.GENDER_OTHER, 4)]
+DIETS = [(User.DIET_VEGAN, 15), (User.DIET_VEGETARIAN, 20), (User.DIET_CARNIST, 65)]
+SMOKING_STATUSES = [(User.SMOKING_STATUS_NOT_SMOKING, 75), (User.SMOKING_STATUS_SMOKING_OCCASIONALLY, 10), (User.SMOKING_STATUS_SMOKING, 15)]
+RELATIONSHIP_STATUSES = [
+    (User.RELATIONSHIP_STATUS_SINGLE, 60),
+    (User.RELATIONSHIP_STATUS_DIVORCED, 15),
+    (User.RELATIONSHIP_STATUS_WIDOWED, 3),
+    (User.RELATIONSHIP_STATUS_IN_RELATIONSHIP, 5),
+    (User.RELATIONSHIP_STATUS_IN_OPEN_RELATIONSHIP, 3),
+    (User.RELATIONSHIP_STATUS_COMPLICATED, 4),
+    (User.RELATIONSHIP_STATUS_SEPARATED, 4),
+    (User.RELATIONSHIP_STATUS_ENGAGED, 1),
+    (User.RELATIONSHIP_STATUS_MARRIED, 5),
+]
+
+
+def weighted_choice(rng, choices):
+    r = rng.uniform(0, sum(weight for value, weight in choices))
+    for value, weight in choices:
+        r -= weight
+        if (r < 0):
+            return value
+    return choices[-1][0]
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible population of active Speedy Match users, with blocks, likes and friendships, for benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Number of users to generate.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed. The same seed generates the same population.')
+        parser.add_argument('--likes-per-user', type=float, default=5, help='Average number of users each user likes.')
+        parser.add_argument('--friends-per-user', type=float, default=3, help='Average number of friendships each user creates.')
+        parser.add_argument('--blocks-per-user', type=float, default=0.2, help='Average number of users each user blocks.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of users created in each transaction.')
+        parser.add_argument('--delete', action='store_true', help='Delete the population generated with this seed, instead of generating it.')
+
+    def handle(self, *args, **options):
+        slug_prefix = POPULATION_SLUG_PREFIX.format(seed=options['seed'])
+        existing_users = User.objects.filter(slug__startswith=slug_prefix)
+        if (options['delete']):
+            # User.delete deletes the user's email addresses first, so the users are deleted one by one.
+            number_of_users = 0
+            for user in existing_users:
+                user.delete()
+                number_of_users += 1
+            self.stdout.write("Deleted {} users.".format(number_of_users))
+            return
+        if (existing_users.exists()):
+            self.stderr.write("A population with seed {} already exists. Delete it first with --delete.".format(options['seed']))
+            return
+        start_time = time.time()
+        rng = random.Random(options['seed'])
+        photo = self.create_photo()
+        users_ids = []
+        for i in range(0, options['users'], options['chunk_size']):
+            with transaction.atomic():
+                for number in range(i, min(i + options['chunk_size'], options['users'])):
+                    users_ids.append(self.create_user(rng=rng, slug='{}{}'.format(slug_prefix, number), photo=photo))
+            logger.info("generate_population::number_of_users={number_of_users}, time={time:.3f}".format(number_of_users=len(users_ids), time=time.time() - start_time))
+        number_of_likes = self.create_likes(rng=rng, users_ids=users_ids, likes_per_user=options['likes_per_user'])
+        number_of_friendships = self.create_friendships(rng=rng, users_ids=users_ids, friends_per_user=options['friends_per_user'])
+        number_of_blocks = self.create_blocks(rng=rng, users_ids=users_ids, blocks_per_user=options['blocks_per_user'])
+        self.stdout.write("Generated {} users, {} likes, {} friendships and {} blocks in {:.3f} seconds.".format(
+            len(users_ids),
+            number_of_likes,
+            number_of_friendships,
+            number_of_blocks,
+            time.time() - start_time,
+        ))
+
+    def create_photo(self):
+        # All the users share one profile picture, so the thumbnail is rendered only once.
+        image_file = io.BytesIO()
+        PILImage.new(mode='RGB', size=(300, 300), color=(200, 60, 80)).save(image_file, format='JPEG')
+        photo = Image(file=ContentFile(image_file.getvalue(), name='population.jpg'))
+        photo.save()
+        return photo
+
+    def get_date_of_birth(self, rng):
+        # Most users are 20 to 45 years old.
+        age = int(rng.triangular(18, 80, 30))
+        return date.today() - timedelta(days=age * 365 + rng.randint(0, 364))
+
+    def get_rank_match(self, rng, values, own_value):
+        # Users prefer their own value, and don't care much about most other values.
+        rank_match = {}
+        for value in values:
+            if (value == own_value):
+                rank_match[str(value)] = SpeedyMatchSiteProfile.RANK_5
+            else:
+                rank_match[str(value)] = weighted_choice(rng=rng, choices=[(SpeedyMatchSiteProfile.RANK_0, 15), (SpeedyMatchSiteProfile.RANK_2, 10), (SpeedyMatchSiteProfile.RANK_4, 25), (SpeedyMatchSiteProfile.RANK_5, 50)])
+        return rank_match
+
+    def get_gender_to_match(self, rng, gender):
+        if (gender == User.GENDER_OTHER):
+            return User.GENDER_VALID_VALUES
+        other_gender = (User.GENDER_MALE if (gender == User.GENDER_FEMALE) else User.GENDER_FEMALE)
+        return weighted_choice(rng=rng, choices=[([other_gender], 88), ([gender], 7), (User.GENDER_VALID_VALUES, 5)])
+
+    def create_user(self, rng, slug, photo):
+        gender = weighted_choice(rng=rng, choices=GENDERS)
+        user = User(
+            slug=slug,
+            username=normalize_username(username=slug),
+            first_name_en=rng.choice(FIRST_NAMES[gender]),
+            last_name_en=rng.choice(LAST_NAMES),
+            gender=gender,
+            date_of_birth=self.get_date_of_birth(rng=rng),
+            diet=weighted_choice(rng=rng, choices=DIETS),
+            smoking_status=weighted_choice(rng=rng, choices=SMOKING_STATUSES),
+            relationship_status=weighted_choice(rng=rng, choices=RELATIONSHIP_STATUSES),
+            notify_on_message=User.NOTIFICATIONS_OFF,
+        )
+        city = rng.choice(CITIES)
+        for language_code, language_name in django_settings.LANGUAGES:
+            setattr(user, to_attribute(name='city', language_code=language_code), city)
+        user.set_unusable_password()
+        user.save()
+        UserEmailAddress.objects.create(user=user, email='{}@example.com'.format(slug), is_confirmed=True, is_primary=True)
+        user.photo = photo
+        site_profile = user.speedy_match_profile
+        site_profile.notify_on_like = User.NOTIFICATIONS_OFF
+        site_profile.height = int(rng.gauss(165 if (gender == User.GENDER_FEMALE) else 178, 8))
+        site_profile.gender_to_match = self.get_gender_to_match(rng=rng, gender=gender)
+        age = user.get_age()
+        site_profile.min_age_to_match = max(18, age - rng.randint(3, 10))
+        site_profile.max_age_to_match = age + rng.randint(3, 15)
+        site_profile.diet_match = self.get_rank_match(rng=rng, values=User.DIET_VALID_VALUES, own_value=user.diet)
+        site_profile.smoking_status_match = self.get_rank_match(rng=rng, values=User.SMOKING_STATUS_VALID_VALUES, own_value=user.smoking_status)
+        site_profile.relationship_status_match = self.get_rank_match(rng=rng, values=User.RELATIONSHIP_STATUS_VALID_VALUES, own_value=User.RELATIONSHIP_STATUS_SINGLE)
+        site_profile.last_visit = now() - timedelta(seconds=rng.randint(0, 60 * 60 * 24 * 90))
+        for language_code, language_name in django_settings.LANGUAGES:
+            for field_name in ['profile_description', 'match_description']:
+                setattr(site_profile, to_attribute(name=field_name, language_code=language_code), "Hi!")
+            setattr(site_profile, to_attribute(name='children', language_code=language_code), "No.")
+            setattr(site_profile, to_attribute(name='more_children', language_code=language_code), "Maybe.")
+            setattr(site_profile, to_attribute(name='activation_step', language_code=language_code), len(SpeedyMatchSiteProfile.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS))
+        site_profile._set_active_languages(languages=[language_code for language_code, language_name in django_settings.LANGUAGES])
+        user.save_user_and_profile()
+        return user.pk
+
+    def get_number_of_relations(self, rng, average):
+        return int(rng.expovariate(1 / average)) if (average > 0) else 0
+
+    def create_likes(self, rng, users_ids, likes_per_user):
+        number_of_likes = 0
+        for user_id in users_ids:
+            for other_user_id in set(rng.sample(users_ids, min(len(users_ids), self.get_number_of_relations(rng=rng, average=likes_per_user)))) - {user_id}:
+                UserLike.objects.create(from_user=User(pk=user_id), to_user=User(pk=other_user_id))
+                number_of_likes += 1
+        return number_of_likes
+
+    def create_friendships(self, rng, users_ids, friends_per_user):
+        number_of_friendships = 0
+        for user_id in users_ids:
+            for other_user_id in set(rng.sample(users_ids, min(len(users_ids), self.get_number_of_relations(rng=rng, average=friends_per_user)))) - {user_id}:
+                try:
+                    Friend.objects.add_friend(from_user=User(pk=user_id), to_user=User(pk=other_user_id)).accept()
+                    number_of_friendships += 1
+                except (AlreadyExistsError, AlreadyFriendsError):
+                    pass
+        return number_of_friendships
+
+    def create_blocks(self, rng, users_ids, blocks_per_user):
+        number_of_blocks = 0
+        for user_id in users_ids:
+            for other_user_id in set(rng.sample(users_ids, min(len(users_ids), self.get_number_of_relations(rng=rng, average=blocks_per_user)))) - {user_id}:
+                users = User.objects.in_bulk([user_id, other_user_id])
+                Block.objects.block(blocker=users[user_id], blocked=users[other_user_id])
+                number_of_blocks += 1
+        return number_of_blocks
+
+
@@ -0,0 +1,95 @@
+import logging
+import multiprocessing
+import time
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.management import BaseCommand
+from django.db import connections
+from django.utils import translation
+from django.utils.timezone import now
+
+from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+from speedy.match.accounts.candidate_index import get_candidate_index
+
+logger = logging.getLogger(__name__)
+
+
+def close_database_connections():
+    # Each process must open its own database connections.
+    connections.close_all()
+
+
+def precompute_matches_for_users(task):
+    """
+    Calculate the matches of users in one language, which saves them in the match cache and in number_of_matches.
+    Returns the number of users processed.
+    """
+    language_code, users_ids = task
+    number_of_users = 0
+    with translation.override(language_code):
+        site_profiles = SpeedyMatchSiteProfile.objects.filter(pk__in=users_ids).select_related('user')
+        for site_profile in site_profiles:
+            try:
+                SpeedyMatchSiteProfile.objects.get_matches(user_profile=site_profile)
+                number_of_users += 1
+            except Exception as e:
+                logger.error("precompute_matches_for_users::Can't calculate matches of user {}, language_code={} - exception {}.".format(site_profile.user, language_code, e))
+    return number_of_users
+
+
+class Command(BaseCommand):
+    help = 'Calculate the matches of recently active users, so that their matches are in the cache when they enter the site.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Calculate the matches of users who visited the site in this number of days.')
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help='Number of worker processes. If 1, matches are calculated in this process.')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Number of users in each task sent to a worker process.')
+        parser.add_argument('--worker', action='store_true', help='Run forever, calculating the matches again every --interval seconds.')
+        parser.add_argument('--interval', type=int, default=5 * 60, help='Number of seconds between runs in worker mode.')
+
+    def handle(self, *args, **options):
+        while True:
+            self.precompute_matches(days=options['days'], processes=options['processes'], chunk_size=options['chunk_size'])
+            if (not (options['worker'])):
+                break
+            time.sleep(options['interval'])
+
+    def get_tasks(self, days, chunk_size):
+        tasks = []
+        for language_code, language_name in django_settings.LANGUAGES:
+            users_ids = list(SpeedyMatchSiteProfile.objects.filter(
+                user__is_active=True,
+                active_languages__contains=[language_code],
+                last_visit__gte=now() - timedelta(days=days),
+            ).order_by('-last_visit').values_list('user_id', flat=True))
+            for i in range(0, len(users_ids), chunk_size):
+                tasks.append((language_code, users_ids[i:i + chunk_size]))
+        return tasks
+
+    def precompute_matches(self, days, processes, chunk_size):
+        start_time = time.time()
+        tasks = self.get_tasks(days=days, chunk_size=chunk_size)
+        if (processes > 1):
+            # Build the candidate indexes before forking, so that the worker processes share them instead of building their own.
+            for language_code, language_name in django_settings.LANGUAGES:
+                get_candidate_index(language_code=language_code)
+            close_database_connections()
+            with multiprocessing.Pool(processes=processes, initializer=close_database_connections) as pool:
+                number_of_users = sum(pool.imap_unordered(precompute_matches_for_users, tasks))
+        else:
+            number_of_users = sum(precompute_matches_for_users(task=task) for task in tasks)
+        total_time = time.time() - start_time
+        logger.info("precompute_matches::number_of_users={number_of_users}, processes={processes}, time={time:.3f}, users_per_second={users_per_second:.1f}".format(
+            number_of_users=number_of_users,
+            processes=processes,
+            time=total_time,
+            users_per_second=(number_of_users / total_time if (total_time > 0) else 0),
+        ))
+        self.stdout.write("Calculated the matches of {} users in {:.3f} seconds ({:.1f} users/sec).".format(
+            number_of_users,
+            total_time,
+            number_of_users / total_time if (total_time > 0) else 0,
+        ))
+
+
@@ -0,0 +1,22 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from speedy.core.accounts.models import User
+from speedy.match.accounts.candidate_index import invalidate_candidate_index, invalidate_all_cached_matches
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Update the age of the users who had a birthday since the last run. Should run daily, after midnight.'
+
+    def handle(self, *args, **options):
+        users_ids = User.objects.update_age()
+        if (len(users_ids) > 0):
+            # The ages are stored in the candidate indexes and the cached matches.
+            invalidate_candidate_index()
+            invalidate_all_cached_matches()
+        logger.info("update_age_field::number_of_updated_users={number_of_updated_users}".format(number_of_updated_users=len(users_ids)))
+
+
@@ -0,0 +1,33 @@
+import logging
+
+from django.conf import settings as django_settings
+from django.core.management import BaseCommand
+
+from speedy.core.base.utils import to_attribute
+from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Validate the Speedy Match profiles whose validated values were changed, and update their stored is_valid fields. Run it after changing the profile settings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Validate all the profiles again, even if none of the validated values was changed.')
+
+    def handle(self, *args, **options):
+        number_of_profiles, number_of_updated_profiles = 0, 0
+        site_profiles = SpeedyMatchSiteProfile.objects.all().select_related('user').order_by('pk')
+        for site_profile in site_profiles.iterator():
+            number_of_profiles += 1
+            if (options['all']):
+                for language_code, language_name in django_settings.LANGUAGES:
+                    setattr(site_profile, to_attribute(name='validation_fingerprint', language_code=language_code), None)
+            if (site_profile.update_validity(commit=True)):
+                number_of_updated_profiles += 1
+        logger.info("update_is_valid_field::number_of_profiles={number_of_profiles}, number_of_updated_profiles={number_of_updated_profiles}".format(
+            number_of_profiles=number_of_profiles,
+            number_of_updated_profiles=number_of_updated_profiles,
+        ))
+
+
@@ -1,8 +1,10 @@
 import logging
 
+from django.db.models import Q, Case, When, Value, F, Func, IntegerField, TextField, Exists, OuterRef
+from django.db.models.functions import Least, Coalesce, Cast
 from django.utils.translation import get_language
 
-from speedy.core.base.utils import get_age_ranges_match
+from speedy.core.base.utils import to_attribute
 from speedy.core.base.models import BaseManager
 from speedy.core.accounts.models import User
 from speedy.core.blocks.models import Block
@@ -11,73 +13,44 @@ logger = logging.getLogger(__name__)
 
 
 class SiteProfileManager(BaseManager):
-    def get_matches(self, user_profile):
+    def get_matches(self, user_profile, from_cache=False):
         # Same function as user_profile.get_matching_rank(other_profile=user.speedy_match_profile), but more optimized.
-        def get_rank():
-            if (user.pk == other_user.pk):
-                return self.model.RANK_0
-            if (other_user.gender not in user_profile.gender_to_match):
-                return self.model.RANK_0
-            if (user.gender not in other_user.speedy_match_profile.gender_to_match):
-                return self.model.RANK_0
-            if (not (user_profile.min_age_to_match <= other_user.get_age() <= user_profile.max_age_to_match)):
-                return self.model.RANK_0
-            if (not (other_user.speedy_match_profile.min_age_to_match <= user.get_age() <= other_user.speedy_match_profile.max_age_to_match)):
-                return self.model.RANK_0
-            if (not ((self.model.settings.MIN_HEIGHT_TO_MATCH <= user.speedy_match_profile.height <= self.model.settings.MAX_HEIGHT_TO_MATCH) and (self.model.settings.MIN_HEIGHT_TO_MATCH <= other_user.speedy_match_profile.height <= self.model.settings.MAX_HEIGHT_TO_MATCH))):
-                return self.model.RANK_0
-            if (user.speedy_match_profile.not_allowed_to_use_speedy_match or other_user.speedy_match_profile.not_allowed_to_use_speedy_match):
-                return self.model.RANK_0
-            if (other_user.pk in blocked_users_ids):
-                return self.model.RANK_0
-            if (other_user.pk in blocking_users_ids):
-                return self.model.RANK_0
-            other_diet_rank = other_user.speedy_match_profile.diet_match.get(str(user.diet), self.model.RANK_0)
-            other_smoking_status_rank = other_user.speedy_match_profile.smoking_status_match.get(str(user.smoking_status), self.model.RANK_0)
-            other_relationship_status_rank = other_user.speedy_match_profile.relationship_status_match.get(str(user.relationship_status), self.model.RANK_0)
-            other_user_rank = min([other_diet_rank, other_smoking_status_rank, other_relationship_status_rank])
-            if (other_user_rank == self.model.RANK_0):
-                return self.model.RANK_0
-            diet_rank = user_profile.diet_match.get(str(other_user.diet), self.model.RANK_0)
-            smoking_status_rank = user_profile.smoking_status_match.get(str(other_user.smoking_status), self.model.RANK_0)
-            relationship_status_rank = user_profile.relationship_status_match.get(str(other_user.relationship_status), self.model.RANK_0)
-            rank = min([diet_rank, smoking_status_rank, relationship_status_rank])
-            return rank
+        # Candidates are ranked against an in-memory index of all the active profiles in this language, and users are only fetched from the database when a page of matches is displayed.
+        # If from_cache is True, the cached matches of this user are returned if they exist (they are invalidated when they may have changed), and otherwise they are calculated and cached.
+        from .candidate_index import get_candidate_index, get_cached_matches, set_cached_matches, MatchesList
+        from .instrumentation import MatchesInstrumentation
 
         user = user_profile.user
-        user_profile._set_values_to_match()
-        age_ranges = get_age_ranges_match(min_age=user_profile.min_age_to_match, max_age=user_profile.max_age_to_match)
         language_code = get_language()
-        qs = User.objects.active(
-            gender__in=user_profile.gender_to_match,
-            diet__in=user_profile.diet_to_match,
-            smoking_status__in=user_profile.smoking_status_to_match,
-            relationship_status__in=user_profile.relationship_status_to_match,
-            speedy_match_site_profile__gender_to_match__contains=[user.gender],
-            speedy_match_site_profile__diet_to_match__contains=[user.diet],
-            speedy_match_site_profile__smoking_status_to_match__contains=[user.smoking_status],
-            speedy_match_site_profile__relationship_status_to_match__contains=[user.relationship_status],
-            date_of_birth__range=age_ranges,
-            speedy_match_site_profile__min_age_to_match__lte=user.get_age(),
-            speedy_match_site_profile__max_age_to_match__gte=user.get_age(),
-            speedy_match_site_profile__height__range=(self.model.settings.MIN_HEIGHT_TO_MATCH, self.model.settings.MAX_HEIGHT_TO_MATCH),
-            speedy_match_site_profile__not_allowed_to_use_speedy_match=False,
-            speedy_match_site_profile__active_languages__contains=[language_code],
-        ).exclude(pk=user_profile.user_id).order_by('-speedy_match_site_profile__last_visit')
-        user_list = qs[:2000]
+        if (from_cache):
+            matches = get_cached_matches(user_id=user.pk, language_code=language_code)
+            if (matches is not None):
+                return MatchesList(matches=matches)
+        if (self.model.settings.MATCHES_INSTRUMENTATION_ENABLED):
+            instrumentation = MatchesInstrumentation(language_code=language_code)
+        else:
+            instrumentation = None
+        user_profile._set_values_to_match()
+        candidate_index = get_candidate_index(language_code=language_code)
+        if (instrumentation is not None):
+            instrumentation.end_phase(phase='candidate_index')
         blocked_users_ids = Block.objects.filter(blocker__pk=user.pk).values_list('blocked_id', flat=True)
         blocking_users_ids = Block.objects.filter(blocked__pk=user.pk).values_list('blocker_id', flat=True)
-        # matches_list = [user for user in user_list if ((user.speedy_match_profile.is_active) and (user_profile.get_matching_rank(other_profile=user.speedy_match_profile) > self.model.RANK_0))]
-        matches_list = []
-        for other_user in user_list:
-            other_user.speedy_match_profile.rank = get_rank()
-            if ((other_user.speedy_match_profile.is_active) and (other_user.speedy_match_profile.rank > self.model.RANK_0)):
-                matches_list.append(other_user)
-        matches_list = sorted(matches_list, key=lambda user: (user.speedy_match_profile.rank, user.speedy_match_profile.last_visit), reverse=True)
-        matches_list = matches_list[:720]
-        # Save number of matches in this language in user's profile.
+        excluded_users_ids = set(blocked_users_ids) | set(blocking_users_ids)
+        if (instrumentation is not None):
+            instrumentation.end_phase(phase='blocks')
+        matches = candidate_index.get_matches(user_profile=user_profile, excluded_users_ids=excluded_users_ids, instrumentation=instrumentation)
+        matches = matches[:720]
+        matches_list = MatchesList(matches=matches)
+        if (instrumentation is not None):
+            instrumentation.count(stage='cap', number=len(matches))
+        # Save number of matches in this language in user's profile. Only this field is updated, since get_matches also runs in the background (precompute_matches) while the user may edit their profile.
         user_profile.number_of_matches = len(matches_list)
-        user_profile.save()
+        self.filter(pk=user_profile.pk).update(**{to_attribute(name='number_of_matches', language_code=language_code): len(matches_list)})
+        set_cached_matches(user_id=user.pk, language_code=language_code, matches=matches)
+        if (instrumentation is not None):
+            instrumentation.end_phase(phase='save')
+            instrumentation.save()
         logger.debug("SiteProfileManager::get_matches:user={user}, language_code={language_code}, number_of_matches={number_of_matches}".format(
             user=user,
             language_code=language_code,
@@ -93,4 +66,119 @@ class SiteProfileManager(BaseManager):
             ))
         return matches_list
 
+    def matches_queryset(self, user_profile):
+        # Same matches as get_matches, but ranked and ordered in the database, so the queryset can be paginated with LIMIT/OFFSET.
+        # Users are annotated with rank (the rank of each user for user_profile) and other_user_rank (the rank of user_profile for each user).
+        from .candidate_index import get_bitmask
+
+        user = user_profile.user
+        user_profile._set_values_to_match()
+        if ((user_profile.height is None) or (not (self.model.settings.MIN_HEIGHT_TO_MATCH <= user_profile.height <= self.model.settings.MAX_HEIGHT_TO_MATCH)) or (user_profile.not_allowed_to_use_speedy_match)):
+            return User.objects.none()
+        if (user.age is None):
+            return User.objects.none()
+        language_code = get_language()
+        rank = Least(
+            self._get_rank_expression(field_name='diet', match=user_profile.diet_match),
+            self._get_rank_expression(field_name='smoking_status', match=user_profile.smoking_status_match),
+            self._get_rank_expression(field_name='relationship_status', match=user_profile.relationship_status_match),
+        )
+        other_user_rank = Least(
+            self._get_other_user_rank_expression(field_name='speedy_match_site_profile__diet_match', value=user.diet),
+            self._get_other_user_rank_expression(field_name='speedy_match_site_profile__smoking_status_match', value=user.smoking_status),
+            self._get_other_user_rank_expression(field_name='speedy_match_site_profile__relationship_status_match', value=user.relationship_status),
+        )
+        qs = User.objects.active(
+            gender__in=user_profile.gender_to_match,
+            diet__in=user_profile.diet_to_match,
+            smoking_status__in=user_profile.smoking_status_to_match,
+            relationship_status__in=user_profile.relationship_status_to_match,
+            age__range=(user_profile.min_age_to_match, user_profile.max_age_to_match),
+            speedy_match_site_profile__min_age_to_match__lte=user.age,
+            speedy_match_site_profile__max_age_to_match__gte=user.age,
+            speedy_match_site_profile__height__range=(self.model.settings.MIN_HEIGHT_TO_MATCH, self.model.settings.MAX_HEIGHT_TO_MATCH),
+            speedy_match_site_profile__not_allowed_to_use_speedy_match=False,
+            speedy_match_site_profile__active_languages__contains=[language_code],
+        ).exclude(
+            pk=user.pk,
+        ).annotate(
+            is_blocked=Exists(Block.objects.filter(blocker__pk=user.pk, blocked__pk=OuterRef('pk'))),
+            is_blocking=Exists(Block.objects.filter(blocker__pk=OuterRef('pk'), blocked__pk=user.pk)),
+            rank=rank,
+            other_user_rank=other_user_rank,
+            # The user's own values, tested against each user's bitmasks of values to match.
+            matches_gender=F('speedy_match_site_profile__gender_to_match_bitmask').bitand(get_bitmask(values=[user.gender])),
+            matches_diet=F('speedy_match_site_profile__diet_to_match_bitmask').bitand(get_bitmask(values=[user.diet])),
+            matches_smoking_status=F('speedy_match_site_profile__smoking_status_to_match_bitmask').bitand(get_bitmask(values=[user.smoking_status])),
+            matches_relationship_status=F('speedy_match_site_profile__relationship_status_to_match_bitmask').bitand(get_bitmask(values=[user.relationship_status])),
+        ).filter(
+            is_blocked=False,
+            is_blocking=False,
+            matches_gender__gt=0,
+            matches_diet__gt=0,
+            matches_smoking_status__gt=0,
+            matches_relationship_status__gt=0,
+            rank__gt=self.model.RANK_0,
+            other_user_rank__gt=self.model.RANK_0,
+        ).select_related(
+            'speedy_match_site_profile',
+        ).order_by('-rank', '-speedy_match_site_profile__last_visit', '-pk')
+        return qs
+
+    def get_matches_page(self, user_profile, cursor=None, page_size=24):
+        """
+        Return a list of the next page_size matches after cursor, and the cursor of the next page (None if there are no more matches).
+        Matches are ordered by (rank, last_visit, id), all descending, and a cursor is the (rank, last_visit, id) of the last match of the previous page.
+        Only one page is fetched from the database, so all the pages cost the same and there is no limit on the number of matches.
+        """
+        qs = self.matches_queryset(user_profile=user_profile)
+        if (cursor is not None):
+            rank, last_visit, user_id = cursor
+            qs = qs.filter(
+                Q(rank__lt=rank) |
+                Q(rank=rank, speedy_match_site_profile__last_visit__lt=last_visit) |
+                Q(rank=rank, speedy_match_site_profile__last_visit=last_visit, pk__lt=user_id)
+            )
+        matches = list(qs[:page_size + 1])
+        for user in matches:
+            user.speedy_match_profile.rank = user.rank
+        next_cursor = None
+        if (len(matches) > page_size):
+            matches = matches[:page_size]
+            last_match = matches[-1]
+            next_cursor = (last_match.rank, last_match.speedy_match_profile.last_visit, last_match.pk)
+        return matches, next_cursor
+
+    def _get_rank_expression(self, field_name, match):
+        # The rank of the value of field_name according to match, which is one of user_profile's diet_match, smoking_status_match or relationship_status_match.
+        return Case(
+            *[When(**{field_name: int(value), 'then': Value(rank)}) for value, rank in sorted(match.items())],
+            default=Value(self.model.RANK_0),
+            output_field=IntegerField()
+        )
+
+    def _get_other_user_rank_expression(self, field_name, value):
+        # The rank of value in the JSON field field_name of each other user.
+        # The key is passed as a text parameter, since KeyTextTransform treats numeric keys as array indexes.
+        key_text = Func(F(field_name), Value(str(value)), function='', arg_joiner=' ->> ', output_field=TextField())
+        return Coalesce(Cast(key_text, IntegerField()), Value(self.model.RANK_0))
+
+    def rank_many(self, user_profile, other_profiles):
+        # Same as calling user_profile.get_matching_rank(other_profile=other_profile) for each profile in other_profiles, but blocks are queried once and each profile is validated once.
+        # Returns a dict of {user_id: rank}.
+        other_profiles = list(other_profiles)
+        ranks = {other_profile.user_id: self.model.RANK_0 for other_profile in other_profiles}
+        if ((len(other_profiles) == 0) or (not (user_profile.is_active_and_valid))):
+            return ranks
+        user = user_profile.user
+        other_users_ids = list(ranks.keys())
+        blocked_users_ids = Block.objects.filter(blocker__pk=user.pk, blocked__pk__in=other_users_ids).values_list('blocked_id', flat=True)
+        blocking_users_ids = Block.objects.filter(blocked__pk=user.pk, blocker__pk__in=other_users_ids).values_list('blocker_id', flat=True)
+        excluded_users_ids = set(blocked_users_ids) | set(blocking_users_ids) | {user.pk}
+        for other_profile in other_profiles:
+            if ((other_profile.user_id in excluded_users_ids) or (not (other_profile.is_active_and_valid))):
+                continue
+            ranks[other_profile.user_id] = user_profile._get_matching_rank(other_profile=other_profile)
+        return ranks
+
 
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.15 on 2026-10-18 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match_accounts', '0006_auto_20200121_1731'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='siteprofile',
+            name='is_valid_en',
+            field=models.BooleanField(default=False, verbose_name='Is valid'),
+        ),
+        migrations.AddField(
+            model_name='siteprofile',
+            name='is_valid_he',
+            field=models.BooleanField(default=False, verbose_name='Is valid'),
+        ),
+        migrations.AddField(
+            model_name='siteprofile',
+            name='validation_fingerprint_en',
+            field=models.CharField(blank=True, max_length=32, null=True, verbose_name='Validation fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='siteprofile',
+            name='validation_fingerprint_he',
+            field=models.CharField(blank=True, max_length=32, null=True, verbose_name='Validation fingerprint'),
+        ),
+    ]
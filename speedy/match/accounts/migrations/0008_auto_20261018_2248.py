@@ -0,0 +1,52 @@
+# Generated by Django 2.1.15 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+def get_bitmask(values):
+    bitmask = 0
+    for value in values or []:
+        bitmask |= (1 << int(value))
+    return bitmask
+
+
+def update_bitmasks(apps, schema_editor):
+    SiteProfile = apps.get_model('match_accounts', 'SiteProfile')
+    for site_profile in SiteProfile.objects.all().iterator():
+        SiteProfile.objects.filter(pk=site_profile.pk).update(
+            gender_to_match_bitmask=get_bitmask(values=site_profile.gender_to_match),
+            diet_to_match_bitmask=get_bitmask(values=site_profile.diet_to_match),
+            smoking_status_to_match_bitmask=get_bitmask(values=site_profile.smoking_status_to_match),
+            relationship_status_to_match_bitmask=get_bitmask(values=site_profile.relationship_status_to_match),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match_accounts', '0007_auto_20261018_2111'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='siteprofile',
+            name='diet_to_match_bitmask',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='siteprofile',
+            name='gender_to_match_bitmask',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='siteprofile',
+            name='relationship_status_to_match_bitmask',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='siteprofile',
+            name='smoking_status_to_match_bitmask',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.RunPython(update_bitmasks, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
+import hashlib
 import logging
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.dispatch import receiver
 from django.conf import settings as django_settings
 from django.contrib.postgres.fields import JSONField, ArrayField
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _, get_language
 from django.utils.decorators import classproperty
 from django.core.exceptions import ValidationError
@@ -15,6 +19,7 @@ from speedy.core.accounts.models import SiteProfileBase, User
 from speedy.core.blocks.models import Block
 from speedy.match.likes.models import UserLike
 from .managers import SiteProfileManager
+from .candidate_index import get_bitmask, update_caches_after_saving_profile, record_candidate_index_change, invalidate_cached_matches, invalidate_all_cached_matches
 
 logger = logging.getLogger(__name__)
 
@@ -153,6 +158,11 @@ class SiteProfile(SiteProfileBase):
         blank=True,
         null=True,
     )
+    # Bitmasks of gender_to_match, diet_to_match, smoking_status_to_match and relationship_status_to_match (bit n is set if value n is in the list), updated in _set_values_to_match.
+    gender_to_match_bitmask = models.SmallIntegerField(default=0)
+    diet_to_match_bitmask = models.SmallIntegerField(default=0)
+    smoking_status_to_match_bitmask = models.SmallIntegerField(default=0)
+    relationship_status_to_match_bitmask = models.SmallIntegerField(default=0)
     activation_step = TranslatedField(
         field=models.PositiveSmallIntegerField(verbose_name=_('Activation step'), default=2),
     )
@@ -160,6 +170,12 @@ class SiteProfile(SiteProfileBase):
         field=models.PositiveSmallIntegerField(verbose_name=_("Number of matches on last user's search"), default=None, blank=True, null=True),
     )
     not_allowed_to_use_speedy_match = models.BooleanField(default=False)  # If set to True, user will have no matches.
+    is_valid = TranslatedField(
+        field=models.BooleanField(verbose_name=_('Is valid'), default=False),
+    )
+    validation_fingerprint = TranslatedField(
+        field=models.CharField(verbose_name=_('Validation fingerprint'), max_length=32, blank=True, null=True),
+    )
 
     objects = SiteProfileManager()
 
@@ -182,16 +198,12 @@ class SiteProfile(SiteProfileBase):
     @property
     def is_active_and_valid(self):
         if (self.is_active):
-            step, error_messages = self.validate_profile_and_activate(commit=False)
-            error = False
-            if (len(error_messages) > 0):
-                error = True
-            if (not (step == len(__class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS))):
-                error = True
-            if (error):
-                logger.error("is_active_and_valid::user is active but not valid, step={step}, error_messages={error_messages}, self.user.pk={self_user_pk}, self.user.username={self_user_username}, self.user.slug={self_user_slug}".format(
-                    step=step,
-                    error_messages=error_messages,
+            # The result of validating the profile is stored in is_valid, and updated when the profile or the user is saved.
+            # Profiles which were never validated (such as profiles created before is_valid was added) are validated now, once.
+            if (self.validation_fingerprint is None):
+                self.update_validity(commit=True)
+            if (not (self.is_valid)):
+                logger.error("is_active_and_valid::user is active but not valid, self.user.pk={self_user_pk}, self.user.username={self_user_username}, self.user.slug={self_user_slug}".format(
                     self_user_pk=self.user.pk,
                     self_user_username=self.user.username,
                     self_user_slug=self.user.slug,
@@ -199,6 +211,79 @@ class SiteProfile(SiteProfileBase):
                 return False
         return (self.is_active)
 
+    def get_validation_fingerprint(self, language_code):
+        """
+        Return a hash of all the values which are checked by validate_profile_and_activate in this language.
+        """
+        def get_match_items(match):
+            if (isinstance(match, dict)):
+                return sorted(match.items())
+            return match
+
+        user = self.user
+        values = (
+            __class__.settings.MIN_HEIGHT_ALLOWED,
+            __class__.settings.MAX_HEIGHT_ALLOWED,
+            __class__.settings.MIN_AGE_TO_MATCH_ALLOWED,
+            __class__.settings.MAX_AGE_TO_MATCH_ALLOWED,
+            __class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS,
+            user.photo_id,
+            user.has_confirmed_email,
+            getattr(user, to_attribute(name='city', language_code=language_code)),
+            user.diet,
+            user.smoking_status,
+            user.relationship_status,
+            self.height,
+            getattr(self, to_attribute(name='profile_description', language_code=language_code)),
+            getattr(self, to_attribute(name='children', language_code=language_code)),
+            getattr(self, to_attribute(name='more_children', language_code=language_code)),
+            getattr(self, to_attribute(name='match_description', language_code=language_code)),
+            self.gender_to_match,
+            self.min_age_to_match,
+            self.max_age_to_match,
+            get_match_items(match=self.diet_match),
+            get_match_items(match=self.smoking_status_match),
+            get_match_items(match=self.relationship_status_match),
+            getattr(self, to_attribute(name='activation_step', language_code=language_code)),
+        )
+        return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
+    def _update_validity(self, language_code):
+        try:
+            with translation.override(language_code):
+                step, error_messages = self.validate_profile_and_activate(commit=False)
+        except (AttributeError, TypeError) as e:
+            # Invalid values which can't be validated. The profile will not be saved anyway.
+            step, error_messages = None, [str(e)]
+        is_valid = ((len(error_messages) == 0) and (step == len(__class__.settings.SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS)))
+        if (not (is_valid)):
+            logger.debug("SiteProfile::_update_validity:profile is not valid, language_code={language_code}, step={step}, error_messages={error_messages}, self.user.pk={self_user_pk}".format(
+                language_code=language_code,
+                step=step,
+                error_messages=error_messages,
+                self_user_pk=self.user.pk,
+            ))
+        setattr(self, to_attribute(name='is_valid', language_code=language_code), is_valid)
+        setattr(self, to_attribute(name='validation_fingerprint', language_code=language_code), self.get_validation_fingerprint(language_code=language_code))
+
+    def update_validity(self, commit=False):
+        """
+        Validate the profile again in every language in which any of the validated values was changed. Returns True if anything was changed.
+        With commit, only the validity fields are updated in the database, without saving the profile.
+        """
+        updated = False
+        for language_code, language_name in django_settings.LANGUAGES:
+            if (not (getattr(self, to_attribute(name='validation_fingerprint', language_code=language_code)) == self.get_validation_fingerprint(language_code=language_code))):
+                self._update_validity(language_code=language_code)
+                updated = True
+        if ((commit) and (updated)):
+            field_names = []
+            for language_code, language_name in django_settings.LANGUAGES:
+                field_names.append(to_attribute(name='is_valid', language_code=language_code))
+                field_names.append(to_attribute(name='validation_fingerprint', language_code=language_code))
+            self.__class__.objects.filter(pk=self.pk).update(**{field_name: getattr(self, field_name) for field_name in field_names})
+        return updated
+
     class Meta:
         verbose_name = _('Speedy Match Profile')
         verbose_name_plural = _('Speedy Match Profiles')
@@ -216,7 +301,11 @@ class SiteProfile(SiteProfileBase):
             self._deactivate_language(step=self.activation_step, commit=False)
         if ((len(self.active_languages) > 0) and (not (self.user.has_confirmed_email))):
             self._set_active_languages(languages=[])
-        return super().save(*args, **kwargs)
+        self.update_validity()
+        created = self._state.adding
+        return_value = super().save(*args, **kwargs)
+        update_caches_after_saving_profile(site_profile=self, created=created)
+        return return_value
 
     def _set_values_to_match(self):
         from speedy.match.accounts import utils
@@ -236,6 +325,10 @@ class SiteProfile(SiteProfileBase):
             self.diet_to_match = list()
             self.smoking_status_to_match = list()
             self.relationship_status_to_match = list()
+        self.gender_to_match_bitmask = get_bitmask(values=self.gender_to_match)
+        self.diet_to_match_bitmask = get_bitmask(values=self.diet_to_match)
+        self.smoking_status_to_match_bitmask = get_bitmask(values=self.smoking_status_to_match)
+        self.relationship_status_to_match_bitmask = get_bitmask(values=self.relationship_status_to_match)
 
     def _set_active_languages(self, languages):
         self.active_languages = sorted(list(set(languages)))
@@ -289,30 +382,7 @@ class SiteProfile(SiteProfileBase):
         if ((self.is_active_and_valid) and (other_profile.is_active_and_valid)):
             if (Block.objects.there_is_block(user_1=self.user, user_2=other_profile.user)):
                 return self.__class__.RANK_0
-            if (not ((__class__.settings.MIN_HEIGHT_TO_MATCH <= self.height <= __class__.settings.MAX_HEIGHT_TO_MATCH) and (__class__.settings.MIN_HEIGHT_TO_MATCH <= other_profile.height <= __class__.settings.MAX_HEIGHT_TO_MATCH))):
-                return self.__class__.RANK_0
-            if (self.not_allowed_to_use_speedy_match or other_profile.not_allowed_to_use_speedy_match):
-                return self.__class__.RANK_0
-            if (other_profile.user.gender not in self.gender_to_match):
-                return self.__class__.RANK_0
-            if (not (self.min_age_to_match <= other_profile.user.get_age() <= self.max_age_to_match)):
-                return self.__class__.RANK_0
-            if (other_profile.user.diet == User.DIET_UNKNOWN):
-                return self.__class__.RANK_0
-            if (other_profile.user.smoking_status == User.SMOKING_STATUS_UNKNOWN):
-                return self.__class__.RANK_0
-            if (other_profile.user.relationship_status == User.RELATIONSHIP_STATUS_UNKNOWN):
-                return self.__class__.RANK_0
-            diet_rank = self.diet_match.get(str(other_profile.user.diet), self.__class__.RANK_0)
-            smoking_status_rank = self.smoking_status_match.get(str(other_profile.user.smoking_status), self.__class__.RANK_0)
-            relationship_status_rank = self.relationship_status_match.get(str(other_profile.user.relationship_status), self.__class__.RANK_0)
-            rank = min([diet_rank, smoking_status_rank, relationship_status_rank])
-            if (rank > self.__class__.RANK_0) and (second_call):
-                other_user_rank = other_profile.get_matching_rank(other_profile=self, second_call=False)
-                if (other_user_rank == self.__class__.RANK_0):
-                    rank = self.__class__.RANK_0
-            other_profile.rank = rank
-            return rank
+            return self._get_matching_rank(other_profile=other_profile, second_call=second_call)
         else:
             if (not (self.is_active_and_valid)):
                 logger.debug('get_matching_rank::get inside "if (not (self.is_active_and_valid)):", self={self}, other_profile={other_profile}'.format(self=self, other_profile=other_profile))
@@ -320,6 +390,33 @@ class SiteProfile(SiteProfileBase):
                 logger.debug('get_matching_rank::get inside "if (not (other_profile.is_active_and_valid)):", self={self}, other_profile={other_profile}'.format(self=self, other_profile=other_profile))
             return self.__class__.RANK_0
 
+    def _get_matching_rank(self, other_profile, second_call=True) -> int:
+        # Both profiles must be active and valid, and there must be no block between the users.
+        if (not ((__class__.settings.MIN_HEIGHT_TO_MATCH <= self.height <= __class__.settings.MAX_HEIGHT_TO_MATCH) and (__class__.settings.MIN_HEIGHT_TO_MATCH <= other_profile.height <= __class__.settings.MAX_HEIGHT_TO_MATCH))):
+            return self.__class__.RANK_0
+        if (self.not_allowed_to_use_speedy_match or other_profile.not_allowed_to_use_speedy_match):
+            return self.__class__.RANK_0
+        if (not ((self.gender_to_match_bitmask >> other_profile.user.gender) & 1)):
+            return self.__class__.RANK_0
+        if ((other_profile.user.age is None) or (not (self.min_age_to_match <= other_profile.user.age <= self.max_age_to_match))):
+            return self.__class__.RANK_0
+        if (other_profile.user.diet == User.DIET_UNKNOWN):
+            return self.__class__.RANK_0
+        if (other_profile.user.smoking_status == User.SMOKING_STATUS_UNKNOWN):
+            return self.__class__.RANK_0
+        if (other_profile.user.relationship_status == User.RELATIONSHIP_STATUS_UNKNOWN):
+            return self.__class__.RANK_0
+        diet_rank = self.diet_match.get(str(other_profile.user.diet), self.__class__.RANK_0)
+        smoking_status_rank = self.smoking_status_match.get(str(other_profile.user.smoking_status), self.__class__.RANK_0)
+        relationship_status_rank = self.relationship_status_match.get(str(other_profile.user.relationship_status), self.__class__.RANK_0)
+        rank = min([diet_rank, smoking_status_rank, relationship_status_rank])
+        if (rank > self.__class__.RANK_0) and (second_call):
+            other_user_rank = other_profile._get_matching_rank(other_profile=self, second_call=False)
+            if (other_user_rank == self.__class__.RANK_0):
+                rank = self.__class__.RANK_0
+        other_profile.rank = rank
+        return rank
+
     def deactivate(self):
         self._set_active_languages(languages=[])
         self.activation_step = 2
@@ -340,7 +437,12 @@ class SiteProfile(SiteProfileBase):
 
     def get_like_gender(self):
         # No need to query the database if len(self.gender_to_match) is not 1.
-        if ((len(self.gender_to_match) == 1) and ({self.get_match_gender()} == {like.to_user.get_gender() for like in UserLike.objects.get_like_list_to_queryset(user=self.user)} | {like.from_user.get_gender() for like in UserLike.objects.get_like_list_from_queryset(user=self.user)} | {self.get_match_gender()})):
+        # Otherwise, one query checks if any active user this user likes or who likes this user has another gender.
+        if ((len(self.gender_to_match) == 1) and (not (User.objects.filter(
+            Q(pk__in=UserLike.objects.filter(from_user=self.user).values('to_user')) | Q(pk__in=UserLike.objects.filter(to_user=self.user).values('from_user')),
+            is_active=True,
+            **{'{}__active_languages__contains'.format(self.__class__.RELATED_NAME): [get_language()]}
+        ).exclude(gender=self.gender_to_match[0]).exists()))):
             like_gender = self.get_match_gender()
         else:
             like_gender = User.GENDERS_DICT.get(User.GENDER_OTHER)
@@ -356,3 +458,36 @@ class SiteProfile(SiteProfileBase):
         return User.relationship_status_choices(gender=self.get_match_gender())
 
 
+@receiver(signal=models.signals.post_delete, sender=SiteProfile)
+def update_candidate_index_after_deleting_site_profile(sender, instance: SiteProfile, **kwargs):
+    # Apply the change now and again after the transaction is committed, as when saving the profile.
+    user_id = instance.user_id
+
+    def apply_change():
+        record_candidate_index_change(user_id=user_id)
+        invalidate_all_cached_matches()
+
+    apply_change()
+    transaction.on_commit(apply_change)
+
+
+@receiver(signal=models.signals.post_save, sender=Block)
+def invalidate_cached_matches_on_block(sender, instance: Block, **kwargs):
+    invalidate_cached_matches(user_ids=[instance.blocker_id, instance.blocked_id])
+
+
+@receiver(signal=models.signals.post_delete, sender=Block)
+def invalidate_cached_matches_on_unblock(sender, instance: Block, **kwargs):
+    invalidate_cached_matches(user_ids=[instance.blocker_id, instance.blocked_id])
+
+
+@receiver(signal=models.signals.post_save, sender=User)
+def update_validity_after_saving_user(sender, instance: User, created, **kwargs):
+    # Some of the validated values are the user's, so the profile is validated again if only the user was saved.
+    if (created):
+        return
+    site_profile = getattr(instance, SiteProfile.RELATED_NAME, None)
+    if (site_profile is not None):
+        site_profile.update_validity(commit=True)
+
+
@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+
+from django.conf import settings as django_settings
+from django.core.management import call_command
+
+if (django_settings.LOGIN_ENABLED):
+    from speedy.core.base.test.models import SiteTestCase
+    from speedy.core.base.test.decorators import only_on_speedy_match
+    from friendship.models import Friend
+
+    from speedy.core.accounts.models import User
+    from speedy.core.blocks.models import Block
+    from speedy.core.accounts.test.user_factories import ActiveUserFactory
+    from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+    from speedy.match.accounts.candidate_index import get_cached_matches, invalidate_candidate_index
+    from speedy.match.likes.models import UserLike
+
+
+    @only_on_speedy_match
+    class PrecomputeMatchesCommandTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = ActiveUserFactory(gender=User.GENDER_MALE, date_of_birth=date(year=1980, month=1, day=1))
+            self.user_1.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE]
+            self.user_1.save_user_and_profile()
+            self.user_2 = ActiveUserFactory(gender=User.GENDER_FEMALE, date_of_birth=date(year=1982, month=1, day=1))
+            self.user_2.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            self.user_2.save_user_and_profile()
+
+        def test_precompute_matches(self):
+            self.assertIsNone(obj=get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code))
+            out = StringIO()
+            call_command('precompute_matches', processes=1, stdout=out)
+            self.assertIn(member="Calculated the matches of ", container=out.getvalue())
+            self.assertListEqual(list1=get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code), list2=[(self.user_2.pk, SpeedyMatchSiteProfile.RANK_5)])
+            self.assertListEqual(list1=get_cached_matches(user_id=self.user_2.pk, language_code=self.language_code), list2=[(self.user_1.pk, SpeedyMatchSiteProfile.RANK_5)])
+            self.assertEqual(first=SpeedyMatchSiteProfile.objects.get(pk=self.user_1.pk).number_of_matches, second=1)
+            self.assertEqual(first=SpeedyMatchSiteProfile.objects.get(pk=self.user_2.pk).number_of_matches, second=1)
+
+
+    @only_on_speedy_match
+    class UpdateAgeFieldCommandTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = ActiveUserFactory(gender=User.GENDER_MALE, date_of_birth=date(year=1980, month=1, day=1))
+            self.user_1.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE]
+            self.user_1.speedy_match_profile.max_age_to_match = self.user_1.get_age() + 2
+            self.user_1.save_user_and_profile()
+            self.user_2 = ActiveUserFactory(gender=User.GENDER_FEMALE, date_of_birth=date(year=1982, month=1, day=1))
+            self.user_2.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            self.user_2.save_user_and_profile()
+
+        def test_update_age_field(self):
+            self.assertListEqual(list1=SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile).user_ids, list2=[self.user_2.pk])
+            # The saved age of user_2 is wrong, so she is out of user_1's age range.
+            User.objects.filter(pk=self.user_2.pk).update(age=self.user_2.get_age() + 5)
+            invalidate_candidate_index()
+            self.assertListEqual(list1=SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile).user_ids, list2=[])
+            call_command('update_age_field')
+            self.assertEqual(first=User.objects.get(pk=self.user_2.pk).age, second=self.user_2.get_age())
+            self.assertListEqual(list1=SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile).user_ids, list2=[self.user_2.pk])
+
+
+    @only_on_speedy_match
+    class GeneratePopulationCommandTestCase(SiteTestCase):
+        def get_population(self):
+            return [(user.first_name, user.gender, user.date_of_birth, user.diet, user.speedy_match_profile.gender_to_match, user.speedy_match_profile.diet_match) for user in User.objects.filter(slug__startswith='population-7-').order_by('slug')]
+
+        def test_generate_population(self):
+            out = StringIO()
+            call_command('generate_population', users=20, seed=7, likes_per_user=3, friends_per_user=2, blocks_per_user=1, stdout=out)
+            self.assertIn(member="Generated 20 users, ", container=out.getvalue())
+            self.assertEqual(first=User.objects.filter(slug__startswith='population-7-').count(), second=20)
+            for user in User.objects.filter(slug__startswith='population-7-'):
+                self.assertTrue(expr=user.speedy_match_profile.is_active_and_valid)
+            self.assertGreater(a=UserLike.objects.count(), b=0)
+            self.assertGreater(a=Friend.objects.count(), b=0)
+            self.assertGreater(a=Block.objects.count(), b=0)
+
+        def test_same_seed_generates_the_same_population(self):
+            call_command('generate_population', users=10, seed=7, stdout=StringIO())
+            population = self.get_population()
+            call_command('generate_population', seed=7, delete=True, stdout=StringIO())
+            self.assertEqual(first=User.objects.filter(slug__startswith='population-7-').count(), second=0)
+            call_command('generate_population', users=10, seed=7, stdout=StringIO())
+            self.assertListEqual(list1=self.get_population(), list2=population)
+
+
+    @only_on_speedy_match
+    class BenchmarkMatchesCommandTestCase(SiteTestCase):
+        def test_benchmark_matches(self):
+            call_command('generate_population', users=10, seed=7, stdout=StringIO())
+            output_file_descriptor, output_path = tempfile.mkstemp(suffix='.json')
+            os.close(output_file_descriptor)
+            try:
+                call_command('benchmark_matches', users=3, population_seed=7, output=output_path, stdout=StringIO())
+                with open(output_path) as f:
+                    results = json.load(f)
+            finally:
+                os.remove(output_path)
+            self.assertEqual(first=results['number_of_users'], second=3)
+            self.assertEqual(first=results['population_size'], second=10)
+            self.assertListEqual(list1=[result['name'] for result in results['results']], list2=['get_matches', 'get_matches_page', 'get_matching_rank', 'matches_list_view', 'likes_to_view', 'likes_from_view', 'likes_mutual_view', 'friends_view'])
+            for result in results['results']:
+                self.assertEqual(first=result['number_of_calls'], second=3)
+                self.assertLessEqual(a=result['p50'], b=result['p99'])
+
+
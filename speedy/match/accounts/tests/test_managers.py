@@ -0,0 +1,361 @@
+from datetime import date
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+
+if (django_settings.LOGIN_ENABLED):
+    from speedy.core.base.test.models import SiteTestCase
+    from speedy.core.base.test.decorators import only_on_speedy_match
+    from speedy.core.base.test.utils import get_django_settings_class_with_override_settings
+    from speedy.core.accounts.models import User
+    from speedy.core.blocks.models import Block
+    from speedy.core.accounts.test.user_factories import ActiveUserFactory
+    from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+    from speedy.match.accounts.candidate_index import CANDIDATE_INDEX_ROW_SIGNATURE_CACHE_KEY, get_candidate_index, get_cached_matches, set_cached_matches, invalidate_cached_matches, update_caches_after_saving_profile
+    from speedy.match.accounts.instrumentation import MATCHES_INSTRUMENTATION_CACHE_KEY, get_records, get_summary
+
+
+    class SpeedyMatchUsersMixin(object):
+        def get_active_user_doron(self):
+            user = ActiveUserFactory(first_name_en="Doron", last_name_en="Matalon", slug="doron-matalon", date_of_birth=date(year=1958, month=10, day=22), gender=User.GENDER_MALE)
+            user.diet = User.DIET_VEGETARIAN
+            user.smoking_status = User.SMOKING_STATUS_NOT_SMOKING
+            user.relationship_status = User.RELATIONSHIP_STATUS_SINGLE
+            user.speedy_match_profile.min_age_to_match = 20
+            user.speedy_match_profile.max_age_to_match = 180
+            user.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE]
+            user.save_user_and_profile()
+            return user
+
+        def get_active_user_jennifer(self):
+            user = ActiveUserFactory(first_name_en="Jennifer", last_name_en="Connelly", slug="jennifer-connelly", date_of_birth=date(year=1978, month=9, day=12), gender=User.GENDER_FEMALE)
+            user.diet = User.DIET_VEGAN
+            user.smoking_status = User.SMOKING_STATUS_SMOKING
+            user.relationship_status = User.RELATIONSHIP_STATUS_SINGLE
+            user.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            user.save_user_and_profile()
+            return user
+
+        def get_active_user_sarah(self):
+            user = ActiveUserFactory(first_name_en="Sarah", last_name_en="Cohen", slug="sarah-cohen", date_of_birth=date(year=1980, month=1, day=1), gender=User.GENDER_FEMALE)
+            user.diet = User.DIET_CARNIST
+            user.smoking_status = User.SMOKING_STATUS_NOT_SMOKING
+            user.relationship_status = User.RELATIONSHIP_STATUS_SINGLE
+            user.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            user.save_user_and_profile()
+            return user
+
+        def get_active_user_dana(self):
+            user = ActiveUserFactory(first_name_en="Dana", last_name_en="Levi", slug="dana-levi", date_of_birth=date(year=1982, month=6, day=1), gender=User.GENDER_FEMALE)
+            user.diet = User.DIET_VEGAN
+            user.smoking_status = User.SMOKING_STATUS_NOT_SMOKING
+            user.relationship_status = User.RELATIONSHIP_STATUS_DIVORCED
+            user.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            user.save_user_and_profile()
+            return user
+
+
+    @only_on_speedy_match
+    class SiteProfileManagerMatchesTestCase(SpeedyMatchUsersMixin, SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = self.get_active_user_doron()
+            self.user_2 = self.get_active_user_jennifer()
+
+        def test_get_matches(self):
+            matches_list = SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)
+            self.assertEqual(first=len(matches_list), second=1)
+            self.assertListEqual(list1=matches_list.user_ids, list2=[self.user_2.pk])
+            self.assertListEqual(list1=list(matches_list[0:24]), list2=[self.user_2])
+            self.assertEqual(first=matches_list[0].speedy_match_profile.rank, second=self.user_1.speedy_match_profile.get_matching_rank(other_profile=self.user_2.speedy_match_profile))
+            self.assertEqual(first=self.user_1.speedy_match_profile.number_of_matches, second=1)
+            matches_list = SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile)
+            self.assertListEqual(list1=matches_list.user_ids, list2=[self.user_1.pk])
+
+        def test_get_matches_updates_only_number_of_matches(self):
+            site_profile = SpeedyMatchSiteProfile.objects.get(pk=self.user_1.pk)
+            # The user edits their profile while their matches are calculated.
+            self.user_1.speedy_match_profile.profile_description = "I edited my profile."
+            self.user_1.speedy_match_profile.save()
+            SpeedyMatchSiteProfile.objects.get_matches(user_profile=site_profile)
+            site_profile = SpeedyMatchSiteProfile.objects.get(pk=self.user_1.pk)
+            self.assertEqual(first=site_profile.number_of_matches, second=1)
+            self.assertEqual(first=site_profile.profile_description, second="I edited my profile.")
+
+        def test_get_matches_ordered_by_rank(self):
+            user_3 = self.get_active_user_sarah()
+            self.user_1.speedy_match_profile.diet_match = {str(User.DIET_VEGAN): 4, str(User.DIET_VEGETARIAN): 5, str(User.DIET_CARNIST): 5}
+            self.user_1.save_user_and_profile()
+            matches_list = SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)
+            self.assertListEqual(list1=matches_list.user_ids, list2=[user_3.pk, self.user_2.pk])
+            self.assertListEqual(list1=[user.speedy_match_profile.rank for user in matches_list[0:24]], list2=[5, 4])
+
+        def test_get_matches_after_changing_match_settings(self):
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=1)
+            self.user_2.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE]
+            self.user_2.save_user_and_profile()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=0)
+            self.user_2.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 0, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=0)
+
+        def test_get_matches_excludes_blocked_users(self):
+            Block.objects.block(blocker=self.user_2, blocked=self.user_1)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=0)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile)), second=0)
+
+        def test_get_matches_excludes_users_not_allowed_to_use_speedy_match(self):
+            self.user_2.speedy_match_profile.not_allowed_to_use_speedy_match = True
+            self.user_2.save_user_and_profile()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=0)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile)), second=0)
+
+        def test_get_matches_excludes_inactive_users(self):
+            self.user_2.speedy_match_profile.deactivate()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=0)
+
+        def test_get_matches_from_cache(self):
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=1)
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 0, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            # The cached matches of the users who matched user_2 are invalidated.
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=0)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=0)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=0)
+
+        def test_get_matches_from_cache_after_changing_match_settings(self):
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=1)
+            self.user_1.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+            self.user_1.save_user_and_profile()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=0)
+
+        def test_get_matches_from_cache_after_block_and_unblock(self):
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=1)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile)), second=1)
+            Block.objects.block(blocker=self.user_2, blocked=self.user_1)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=0)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile, from_cache=True)), second=0)
+            Block.objects.unblock(blocker=self.user_2, blocked=self.user_1)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=1)
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile, from_cache=True)), second=1)
+
+        def test_get_matches_from_cache_after_deactivating_other_user(self):
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=1)
+            self.user_2.speedy_match_profile.deactivate()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=0)
+
+        def test_get_matches_from_cache_after_other_user_is_not_allowed_to_use_speedy_match(self):
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)), second=1)
+            self.user_2.speedy_match_profile.not_allowed_to_use_speedy_match = True
+            self.user_2.save_user_and_profile()
+            self.assertEqual(first=len(SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)), second=0)
+
+        def test_rank_many(self):
+            user_3 = self.get_active_user_sarah()
+            user_4 = ActiveUserFactory(gender=User.GENDER_MALE)
+            other_profiles = [self.user_2.speedy_match_profile, user_3.speedy_match_profile, user_4.speedy_match_profile, self.user_1.speedy_match_profile]
+            ranks = SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.user_1.speedy_match_profile, other_profiles=other_profiles)
+            self.assertDictEqual(d1=ranks, d2={other_profile.user_id: self.user_1.speedy_match_profile.get_matching_rank(other_profile=other_profile) for other_profile in other_profiles})
+            self.assertDictEqual(d1=ranks, d2={self.user_2.pk: 5, user_3.pk: 5, user_4.pk: SpeedyMatchSiteProfile.RANK_0, self.user_1.pk: SpeedyMatchSiteProfile.RANK_0})
+
+        def test_rank_many_with_block(self):
+            user_3 = self.get_active_user_sarah()
+            Block.objects.block(blocker=user_3, blocked=self.user_1)
+            ranks = SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.user_1.speedy_match_profile, other_profiles=[self.user_2.speedy_match_profile, user_3.speedy_match_profile])
+            self.assertDictEqual(d1=ranks, d2={self.user_2.pk: 5, user_3.pk: SpeedyMatchSiteProfile.RANK_0})
+
+        def test_rank_many_with_inactive_profile(self):
+            self.user_1.speedy_match_profile.deactivate()
+            ranks = SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.user_1.speedy_match_profile, other_profiles=[self.user_2.speedy_match_profile])
+            self.assertDictEqual(d1=ranks, d2={self.user_2.pk: SpeedyMatchSiteProfile.RANK_0})
+            self.assertDictEqual(d1=SpeedyMatchSiteProfile.objects.rank_many(user_profile=self.user_1.speedy_match_profile, other_profiles=[]), d2={})
+
+        def test_matches_queryset(self):
+            user_3 = self.get_active_user_sarah()
+            self.user_1.speedy_match_profile.diet_match = {str(User.DIET_VEGAN): 4, str(User.DIET_VEGETARIAN): 5, str(User.DIET_CARNIST): 5}
+            self.user_1.save_user_and_profile()
+            qs = SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=self.user_1.speedy_match_profile)
+            self.assertListEqual(list1=[(user.pk, user.rank) for user in qs], list2=[(user_3.pk, 5), (self.user_2.pk, 4)])
+            self.assertListEqual(list1=[(user.pk, user.rank) for user in qs], list2=[(user.pk, user.speedy_match_profile.rank) for user in SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)])
+            self.assertEqual(first=qs[0].other_user_rank, second=user_3.speedy_match_profile.get_matching_rank(other_profile=self.user_1.speedy_match_profile, second_call=False))
+            qs = SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=user_3.speedy_match_profile)
+            self.assertListEqual(list1=[(user.pk, user.rank) for user in qs], list2=[(self.user_1.pk, 5)])
+
+        def test_matches_queryset_excludes_blocked_users(self):
+            Block.objects.block(blocker=self.user_1, blocked=self.user_2)
+            self.assertEqual(first=SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=self.user_1.speedy_match_profile).count(), second=0)
+            self.assertEqual(first=SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=self.user_2.speedy_match_profile).count(), second=0)
+
+        def test_matches_queryset_excludes_users_who_dont_match(self):
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 0, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            self.assertEqual(first=SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=self.user_1.speedy_match_profile).count(), second=0)
+            self.assertEqual(first=SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=self.user_2.speedy_match_profile).count(), second=0)
+
+        def test_get_matches_page(self):
+            user_3 = self.get_active_user_sarah()
+            user_4 = self.get_active_user_dana()
+            matches_ids = list(SpeedyMatchSiteProfile.objects.matches_queryset(user_profile=self.user_1.speedy_match_profile).values_list('pk', flat=True))
+            self.assertSetEqual(set1=set(matches_ids), set2={self.user_2.pk, user_3.pk, user_4.pk})
+            matches, cursor = SpeedyMatchSiteProfile.objects.get_matches_page(user_profile=self.user_1.speedy_match_profile, page_size=2)
+            self.assertListEqual(list1=[user.pk for user in matches], list2=matches_ids[:2])
+            self.assertListEqual(list1=[user.speedy_match_profile.rank for user in matches], list2=[5, 5])
+            self.assertEqual(first=cursor, second=(5, matches[1].speedy_match_profile.last_visit, matches[1].pk))
+            matches, cursor = SpeedyMatchSiteProfile.objects.get_matches_page(user_profile=self.user_1.speedy_match_profile, cursor=cursor, page_size=2)
+            self.assertListEqual(list1=[user.pk for user in matches], list2=matches_ids[2:])
+            self.assertIsNone(obj=cursor)
+
+        def test_get_matches_page_with_same_last_visit(self):
+            user_3 = self.get_active_user_sarah()
+            user_4 = self.get_active_user_dana()
+            SpeedyMatchSiteProfile.objects.filter(pk__in=[self.user_2.pk, user_3.pk, user_4.pk]).update(last_visit=self.user_2.speedy_match_profile.last_visit)
+            matches_ids = []
+            cursor = None
+            for i in range(3):
+                matches, cursor = SpeedyMatchSiteProfile.objects.get_matches_page(user_profile=self.user_1.speedy_match_profile, cursor=cursor, page_size=1)
+                matches_ids.extend([user.pk for user in matches])
+            self.assertIsNone(obj=cursor)
+            self.assertListEqual(list1=matches_ids, list2=sorted([self.user_2.pk, user_3.pk, user_4.pk], reverse=True))
+
+        def test_delete_user_who_blocked_another_user(self):
+            Block.objects.block(blocker=self.user_1, blocked=self.user_2)
+            self.user_1.delete()
+            self.assertListEqual(list1=SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile).user_ids, list2=[])
+
+        def test_get_matches_from_cache_without_cached_matches(self):
+            user_3 = self.get_active_user_sarah()
+            invalidate_cached_matches(user_ids=[self.user_1.pk])
+            matches_list = SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)
+            self.assertEqual(first=len(matches_list), second=2)
+            self.assertListEqual(list1=[user.pk for user in matches_list[1:2]], list2=[user.pk for user in SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)[1:2]])
+            self.assertIn(member=matches_list[1:2][0].pk, container={self.user_2.pk, user_3.pk})
+            self.assertEqual(first=matches_list[0].speedy_match_profile.rank, second=5)
+            # The matches are cached again.
+            self.assertListEqual(list1=[user_id for user_id, rank in get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code)], list2=matches_list.user_ids)
+
+
+    @only_on_speedy_match
+    class CandidateIndexTestCase(SpeedyMatchUsersMixin, SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = self.get_active_user_doron()
+            self.user_2 = self.get_active_user_jennifer()
+
+        def get_matches_ids(self, candidate_index):
+            return [user_id for user_id, rank in candidate_index.get_matches(user_profile=self.user_1.speedy_match_profile, excluded_users_ids=[])]
+
+        def test_changed_row_is_updated_without_building_the_index_again(self):
+            candidate_index = get_candidate_index(language_code=self.language_code)
+            self.assertListEqual(list1=self.get_matches_ids(candidate_index=candidate_index), list2=[self.user_2.pk])
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 0, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            updated_candidate_index = get_candidate_index(language_code=self.language_code)
+            self.assertIsNot(expr1=updated_candidate_index, expr2=candidate_index)
+            self.assertEqual(first=updated_candidate_index.date_created, second=candidate_index.date_created)
+            self.assertListEqual(list1=self.get_matches_ids(candidate_index=updated_candidate_index), list2=[])
+            # The index is copied, and the index which was used before is not changed.
+            self.assertListEqual(list1=self.get_matches_ids(candidate_index=candidate_index), list2=[self.user_2.pk])
+            self.assertIs(expr1=get_candidate_index(language_code=self.language_code), expr2=updated_candidate_index)
+
+        def test_new_and_deactivated_users_are_updated(self):
+            candidate_index = get_candidate_index(language_code=self.language_code)
+            user_3 = self.get_active_user_sarah()
+            updated_candidate_index = get_candidate_index(language_code=self.language_code)
+            self.assertEqual(first=updated_candidate_index.date_created, second=candidate_index.date_created)
+            self.assertSetEqual(set1=set(self.get_matches_ids(candidate_index=updated_candidate_index)), set2={self.user_2.pk, user_3.pk})
+            self.user_2.speedy_match_profile.deactivate()
+            updated_candidate_index = get_candidate_index(language_code=self.language_code)
+            self.assertEqual(first=updated_candidate_index.date_created, second=candidate_index.date_created)
+            self.assertListEqual(list1=self.get_matches_ids(candidate_index=updated_candidate_index), list2=[user_3.pk])
+            self.assertEqual(first=len(updated_candidate_index), second=2)
+
+        def test_signature_cache_miss_does_not_update_the_index(self):
+            candidate_index = get_candidate_index(language_code=self.language_code)
+            cache.delete(CANDIDATE_INDEX_ROW_SIGNATURE_CACHE_KEY.format(user_id=self.user_2.pk))
+            update_caches_after_saving_profile(site_profile=self.user_2.speedy_match_profile)
+            self.assertIs(expr1=get_candidate_index(language_code=self.language_code), expr2=candidate_index)
+            update_caches_after_saving_profile(site_profile=self.user_2.speedy_match_profile)
+            self.assertIs(expr1=get_candidate_index(language_code=self.language_code), expr2=candidate_index)
+
+        def test_get_matching_user_ids(self):
+            user_3 = self.get_active_user_sarah()
+            candidate_index = get_candidate_index(language_code=self.language_code)
+            self.assertSetEqual(set1=candidate_index.get_matching_user_ids(user_id=self.user_1.pk), set2={self.user_2.pk, user_3.pk})
+            self.assertSetEqual(set1=candidate_index.get_matching_user_ids(user_id=self.user_2.pk), set2={self.user_1.pk})
+            self.assertSetEqual(set1=candidate_index.get_matching_user_ids(user_id=0), set2=set())
+
+        def test_cached_matches_of_other_users_are_invalidated_when_a_profile_changes(self):
+            user_3 = self.get_active_user_sarah()
+            for user in [self.user_1, self.user_2, user_3]:
+                SpeedyMatchSiteProfile.objects.get_matches(user_profile=user.speedy_match_profile)
+            self.assertSetEqual(set1={user_id for user_id, rank in get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code)}, set2={self.user_2.pk, user_3.pk})
+            # Jennifer doesn't match Doron anymore. Doron's cached matches are invalidated, and Sarah's - who never matched Jennifer - are not.
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 0, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            self.assertIsNone(obj=get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code))
+            self.assertIsNone(obj=get_cached_matches(user_id=self.user_2.pk, language_code=self.language_code))
+            self.assertListEqual(list1=get_cached_matches(user_id=user_3.pk, language_code=self.language_code), list2=[(self.user_1.pk, 5)])
+            self.assertListEqual(list1=[user.pk for user in SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)[0:24]], list2=[user_3.pk])
+            # Jennifer matches Doron again.
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 5, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            self.assertIsNone(obj=get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code))
+            self.assertSetEqual(set1={user.pk for user in SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile, from_cache=True)[0:24]}, set2={self.user_2.pk, user_3.pk})
+
+        def test_caches_are_updated_again_after_the_transaction_is_committed(self):
+            SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)
+            number_of_callbacks = len(connection.run_on_commit)
+            self.user_2.speedy_match_profile.smoking_status_match = {str(User.SMOKING_STATUS_SMOKING): 5, str(User.SMOKING_STATUS_NOT_SMOKING): 0, str(User.SMOKING_STATUS_SMOKING_OCCASIONALLY): 5}
+            self.user_2.save_user_and_profile()
+            self.assertIsNone(obj=get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code))
+            # Another request cached Doron's old matches before the transaction was committed.
+            set_cached_matches(user_id=self.user_1.pk, language_code=self.language_code, matches=[(self.user_2.pk, 5)])
+            # The transaction of a test case is never committed, so the callbacks are run here.
+            for sids, func in connection.run_on_commit[number_of_callbacks:]:
+                func()
+            self.assertIsNone(obj=get_cached_matches(user_id=self.user_1.pk, language_code=self.language_code))
+            self.assertListEqual(list1=self.get_matches_ids(candidate_index=get_candidate_index(language_code=self.language_code)), list2=[])
+
+
+    @only_on_speedy_match
+    class MatchesInstrumentationTestCase(SpeedyMatchUsersMixin, SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            cache.delete(MATCHES_INSTRUMENTATION_CACHE_KEY.format(language_code=self.language_code))
+            self.user_1 = self.get_active_user_doron()
+            self.user_2 = self.get_active_user_jennifer()
+
+        def test_instrumentation_disabled_by_default(self):
+            SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)
+            self.assertListEqual(list1=get_records(language_code=self.language_code), list2=[])
+            self.assertIsNone(obj=get_summary(language_code=self.language_code))
+
+        @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, MATCHES_INSTRUMENTATION_ENABLED=True))
+        def test_instrumentation_records_phases_and_funnel(self):
+            user_3 = self.get_active_user_sarah()
+            Block.objects.block(blocker=user_3, blocked=self.user_1)
+            SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)
+            records = get_records(language_code=self.language_code)
+            self.assertEqual(first=len(records), second=1)
+            counts = dict(records[0]['counts'])
+            self.assertEqual(first=counts['gender'], second=2)
+            self.assertEqual(first=counts['rank'], second=2)
+            self.assertEqual(first=counts['blocks'], second=1)
+            self.assertEqual(first=counts['cap'], second=1)
+            self.assertListEqual(list1=[phase for phase, phase_time in records[0]['timings']], list2=['candidate_index', 'blocks', 'filter', 'sort', 'exclude_blocks', 'save'])
+            SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_2.speedy_match_profile)
+            summary = get_summary(language_code=self.language_code)
+            self.assertEqual(first=summary['number_of_calls'], second=2)
+            self.assertListEqual(list1=[phase['phase'] for phase in summary['phases']], list2=['candidate_index', 'blocks', 'filter', 'sort', 'exclude_blocks', 'save'])
+            self.assertEqual(first=summary['funnel'][-1], second={'stage': 'cap', 'average': 1.0})
+
+        @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, MATCHES_INSTRUMENTATION_ENABLED=True, MATCHES_INSTRUMENTATION_RING_BUFFER_SIZE=2))
+        def test_instrumentation_ring_buffer_size(self):
+            for i in range(3):
+                SpeedyMatchSiteProfile.objects.get_matches(user_profile=self.user_1.speedy_match_profile)
+            self.assertEqual(first=len(get_records(language_code=self.language_code)), second=2)
+
+
@@ -3,6 +3,7 @@ from datetime import date
 
 from django.conf import settings as django_settings
 from django.test import override_settings
+from django.core.management import call_command
 from django.core.exceptions import ValidationError
 from django.db.utils import DataError
 
@@ -19,6 +20,7 @@ if (django_settings.LOGIN_ENABLED):
     from speedy.core.accounts.models import User
     from speedy.core.uploads.test.factories import UserImageFactory
     from speedy.core.accounts.test.user_factories import DefaultUserFactory, InactiveUserFactory, ActiveUserFactory
+    from speedy.match.likes.models import UserLike
 
 
     class SpeedyMatchSiteProfileTestCaseMixin(SpeedyCoreAccountsLanguageMixin, SpeedyMatchAccountsLanguageMixin):
@@ -1361,3 +1363,133 @@ if (django_settings.LOGIN_ENABLED):
             self.assertEqual(first=rank_2, second=5)
 
 
+    @only_on_speedy_match
+    class SpeedyMatchSiteProfileValidityTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user = ActiveUserFactory()
+
+        def get_site_profile_from_database(self):
+            return SpeedyMatchSiteProfile.objects.get(pk=self.user.pk)
+
+        def test_valid_profile(self):
+            site_profile = self.get_site_profile_from_database()
+            self.assertIs(expr1=site_profile.is_valid, expr2=True)
+            self.assertEqual(first=site_profile.validation_fingerprint, second=site_profile.get_validation_fingerprint(language_code=self.language_code))
+            self.assertIs(expr1=site_profile.is_active_and_valid, expr2=True)
+
+        def test_profile_is_validated_again_after_saving_profile(self):
+            self.user.speedy_match_profile.profile_description = ""
+            self.user.save_user_and_profile()
+            site_profile = self.get_site_profile_from_database()
+            self.assertIs(expr1=site_profile.is_valid, expr2=False)
+            self.assertIs(expr1=site_profile.is_active_and_valid, expr2=False)
+            self.user.speedy_match_profile.profile_description = "Hi!"
+            self.user.save_user_and_profile()
+            site_profile = self.get_site_profile_from_database()
+            self.assertIs(expr1=site_profile.is_valid, expr2=True)
+            self.assertIs(expr1=site_profile.is_active_and_valid, expr2=True)
+
+        def test_profile_is_validated_again_after_saving_only_user(self):
+            self.user.city = ""
+            self.user.save()
+            site_profile = self.get_site_profile_from_database()
+            self.assertIs(expr1=site_profile.is_valid, expr2=False)
+            self.assertIs(expr1=site_profile.is_active_and_valid, expr2=False)
+
+        def test_is_active_and_valid_reads_the_stored_value(self):
+            site_profile = SpeedyMatchSiteProfile.objects.select_related('user').get(pk=self.user.pk)
+            site_profile.profile_description = ""
+            with self.assertNumQueries(num=0):
+                self.assertIs(expr1=site_profile.is_active_and_valid, expr2=True)
+
+        def test_is_active_and_valid_validates_a_profile_which_was_never_validated(self):
+            # Profiles which existed before is_valid was added.
+            SpeedyMatchSiteProfile.objects.filter(pk=self.user.pk).update(**{
+                to_attribute(name='is_valid', language_code=self.language_code): False,
+                to_attribute(name='validation_fingerprint', language_code=self.language_code): None,
+            })
+            self.assertIs(expr1=self.get_site_profile_from_database().is_active_and_valid, expr2=True)
+            site_profile = SpeedyMatchSiteProfile.objects.select_related('user').get(pk=self.user.pk)
+            self.assertIs(expr1=site_profile.is_valid, expr2=True)
+            self.assertEqual(first=site_profile.validation_fingerprint, second=site_profile.get_validation_fingerprint(language_code=self.language_code))
+            with self.assertNumQueries(num=0):
+                self.assertIs(expr1=site_profile.is_active_and_valid, expr2=True)
+
+        def test_update_is_valid_field_command(self):
+            SpeedyMatchSiteProfile.objects.filter(pk=self.user.pk).update(**{
+                to_attribute(name='is_valid', language_code=self.language_code): False,
+                to_attribute(name='validation_fingerprint', language_code=self.language_code): None,
+            })
+            self.assertIs(expr1=self.get_site_profile_from_database().is_valid, expr2=False)
+            call_command('update_is_valid_field')
+            site_profile = self.get_site_profile_from_database()
+            self.assertIs(expr1=site_profile.is_valid, expr2=True)
+            self.assertEqual(first=site_profile.validation_fingerprint, second=site_profile.get_validation_fingerprint(language_code=self.language_code))
+
+
+    @only_on_speedy_match
+    class SpeedyMatchSiteProfileBitmasksTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user = ActiveUserFactory()
+
+        def test_bitmasks_are_saved(self):
+            self.user.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE, User.GENDER_OTHER]
+            self.user.speedy_match_profile.diet_match = {str(User.DIET_VEGAN): 5, str(User.DIET_VEGETARIAN): 0, str(User.DIET_CARNIST): 2}
+            self.user.speedy_match_profile.relationship_status_match = {str(relationship_status): (5 if (relationship_status == User.RELATIONSHIP_STATUS_MARRIED) else 0) for relationship_status in User.RELATIONSHIP_STATUS_VALID_VALUES}
+            self.user.save_user_and_profile()
+            site_profile = SpeedyMatchSiteProfile.objects.get(pk=self.user.pk)
+            self.assertEqual(first=site_profile.gender_to_match_bitmask, second=(1 << User.GENDER_FEMALE) | (1 << User.GENDER_OTHER))
+            self.assertEqual(first=site_profile.diet_to_match_bitmask, second=(1 << User.DIET_VEGAN) | (1 << User.DIET_CARNIST))
+            self.assertEqual(first=site_profile.smoking_status_to_match_bitmask, second=sum(1 << smoking_status for smoking_status in User.SMOKING_STATUS_VALID_VALUES))
+            self.assertEqual(first=site_profile.relationship_status_to_match_bitmask, second=1 << User.RELATIONSHIP_STATUS_MARRIED)
+
+        def test_bitmasks_of_invalid_profile(self):
+            site_profile = self.user.speedy_match_profile
+            site_profile.diet_match = {}
+            site_profile._set_values_to_match()
+            self.assertEqual(first=site_profile.diet_to_match_bitmask, second=0)
+            self.assertEqual(first=site_profile.smoking_status_to_match_bitmask, second=0)
+            self.assertEqual(first=site_profile.relationship_status_to_match_bitmask, second=0)
+
+
+    @only_on_speedy_match
+    class SpeedyMatchSiteProfileLikeGenderTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user = ActiveUserFactory(gender=User.GENDER_MALE)
+            self.user.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE]
+            self.user.save_user_and_profile()
+            self.female_user = ActiveUserFactory(gender=User.GENDER_FEMALE)
+            self.male_user = ActiveUserFactory(gender=User.GENDER_MALE)
+
+        def test_like_gender_without_likes(self):
+            with self.assertNumQueries(num=1):
+                self.assertEqual(first=self.user.speedy_match_profile.get_like_gender(), second=User.GENDER_FEMALE_STRING)
+
+        def test_like_gender_with_likes_of_one_gender(self):
+            UserLike.objects.add_like(from_user=self.user, to_user=self.female_user)
+            UserLike.objects.add_like(from_user=ActiveUserFactory(gender=User.GENDER_FEMALE), to_user=self.user)
+            with self.assertNumQueries(num=1):
+                self.assertEqual(first=self.user.speedy_match_profile.get_like_gender(), second=User.GENDER_FEMALE_STRING)
+
+        def test_like_gender_with_likes_of_another_gender(self):
+            UserLike.objects.add_like(from_user=self.user, to_user=self.female_user)
+            UserLike.objects.add_like(from_user=self.male_user, to_user=self.user)
+            with self.assertNumQueries(num=1):
+                self.assertEqual(first=self.user.speedy_match_profile.get_like_gender(), second=User.GENDER_OTHER_STRING)
+
+        def test_like_gender_ignores_inactive_users(self):
+            UserLike.objects.add_like(from_user=self.male_user, to_user=self.user)
+            self.male_user.speedy_match_profile._set_active_languages(languages=[])
+            self.male_user.save_user_and_profile()
+            self.assertEqual(first=self.user.speedy_match_profile.get_like_gender(), second=User.GENDER_FEMALE_STRING)
+
+        def test_like_gender_of_user_who_matches_more_than_one_gender(self):
+            self.user.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE, User.GENDER_MALE]
+            self.user.save_user_and_profile()
+            with self.assertNumQueries(num=0):
+                self.assertEqual(first=self.user.speedy_match_profile.get_like_gender(), second=User.GENDER_OTHER_STRING)
+
+
@@ -9,6 +9,7 @@ class AdminSite(CoreAdminSite):
         urlpatterns = super().get_urls()
         urlpatterns += [
             url(regex=r'^matches/$', view=views.AdminMatchesListView.as_view(), name='matches_list'),
+            url(regex=r'^matches/statistics/$', view=views.AdminMatchesStatisticsView.as_view(), name='matches_statistics'),
         ]
         return urlpatterns
 
@@ -1,5 +1,6 @@
 from datetime import timedelta, datetime, timezone, date
 
+from django.conf import settings as django_settings
 from django.utils.translation import get_language, gettext_lazy as _
 from django.utils.timezone import now
 from django.views import generic
@@ -8,6 +9,7 @@ from speedy.core.admin.mixins import OnlyAdminMixin
 from speedy.core.accounts.utils import get_site_profile_model
 from speedy.core.accounts.models import User
 from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+from speedy.match.accounts.instrumentation import get_summary
 
 
 class AdminMatchesListView(OnlyAdminMixin, generic.ListView):
@@ -122,3 +124,16 @@ class AdminMatchesListView(OnlyAdminMixin, generic.ListView):
         return cd
 
 
+class AdminMatchesStatisticsView(OnlyAdminMixin, generic.TemplateView):
+    template_name = 'admin/matches/statistics.html'
+
+    def get_context_data(self, **kwargs):
+        cd = super().get_context_data(**kwargs)
+        summaries = [get_summary(language_code=language_code) for language_code, language_name in django_settings.LANGUAGES]
+        cd.update({
+            'instrumentation_enabled': SpeedyMatchSiteProfile.settings.MATCHES_INSTRUMENTATION_ENABLED,
+            'summaries': [summary for summary in summaries if (summary is not None)],
+        })
+        return cd
+
+
@@ -0,0 +1,41 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from speedy.match.likes.models import LikeNotification
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send the pending like notification emails, one email per user for all the likes received during LIKE_NOTIFICATIONS_DIGEST_WINDOW.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker', action='store_true', help='Run forever, checking for pending notifications every --interval seconds.')
+        parser.add_argument('--interval', type=int, default=30, help='Number of seconds between runs in worker mode.')
+        parser.add_argument('--max-interval', type=int, default=300, help='Maximum number of seconds between runs in worker mode, after errors.')
+
+    def send_pending(self):
+        number_of_emails = LikeNotification.objects.send_pending()
+        if (number_of_emails > 0):
+            logger.info("send_like_notifications::number_of_emails={number_of_emails}".format(number_of_emails=number_of_emails))
+
+    def handle(self, *args, **options):
+        if (not (options['worker'])):
+            self.send_pending()
+            return
+        number_of_errors = 0
+        while True:
+            try:
+                self.send_pending()
+                number_of_errors = 0
+            except Exception as e:
+                # For example the database is not available. Keep running, and wait longer after each consecutive error.
+                number_of_errors += 1
+                logger.error("send_like_notifications::Can't send like notifications - exception {}, number_of_errors={}.".format(e, number_of_errors))
+                close_old_connections()
+            time.sleep(min(options['interval'] * 2 ** number_of_errors, options['max_interval']))
+
+
@@ -0,0 +1,41 @@
+import logging
+
+from django.core.management import BaseCommand
+from django.db.models import Count, F
+
+from speedy.match.likes.models import UserLike, UserLikeCounters
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Count the likes of all the users again, and repair the like counters which drifted. Should run daily.'
+
+    def get_counts(self, queryset, user_field_name):
+        return {user_id: count for user_id, count in queryset.values_list(user_field_name).annotate(count=Count('pk')).order_by()}
+
+    def handle(self, *args, **options):
+        counts = {
+            'number_of_likes_from_user': self.get_counts(queryset=UserLike.objects.all(), user_field_name='from_user'),
+            'number_of_likes_to_user': self.get_counts(queryset=UserLike.objects.all(), user_field_name='to_user'),
+            'number_of_mutual_likes': self.get_counts(queryset=UserLike.objects.filter(to_user__likes_from_user__to_user=F('from_user')), user_field_name='from_user'),
+            'number_of_new_likes': self.get_counts(queryset=UserLike.objects.filter(date_viewed__isnull=True), user_field_name='to_user'),
+        }
+        users_ids = set()
+        for user_counts in counts.values():
+            users_ids |= set(user_counts.keys())
+        number_of_updated_users = 0
+        for user_like_counters in UserLikeCounters.objects.all().order_by('pk').iterator():
+            users_ids.discard(user_like_counters.user_id)
+            values = {counter: user_counts.get(user_like_counters.user_id, 0) for counter, user_counts in counts.items()}
+            if (not (all(getattr(user_like_counters, counter) == value for counter, value in values.items()))):
+                UserLikeCounters.objects.filter(pk=user_like_counters.pk).update(**values)
+                UserLikeCounters.objects.invalidate_number_of_new_likes(user_id=user_like_counters.user_id)
+                number_of_updated_users += 1
+        for user_id in sorted(users_ids):
+            UserLikeCounters.objects.update_or_create(user_id=user_id, defaults={counter: user_counts.get(user_id, 0) for counter, user_counts in counts.items()})
+            UserLikeCounters.objects.invalidate_number_of_new_likes(user_id=user_id)
+            number_of_updated_users += 1
+        logger.info("update_like_counters::number_of_updated_users={number_of_updated_users}".format(number_of_updated_users=number_of_updated_users))
+
+
@@ -1,9 +1,22 @@
-from django.utils.translation import gettext_lazy as _
+import logging
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min, Max
+from django.utils import translation
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _, get_language
 from django.core.exceptions import ValidationError
 
 from speedy.core.base.models import BaseManager
 from speedy.core.accounts.utils import get_site_profile_model
-from speedy.core.accounts.models import User
+
+logger = logging.getLogger(__name__)
+
+NUMBER_OF_NEW_LIKES_CACHE_KEY = 'speedy_number_of_new_likes:{user_id}'
+NUMBER_OF_NEW_LIKES_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, in seconds.
 
 
 class UserLikeManager(BaseManager):
@@ -19,45 +32,136 @@ class UserLikeManager(BaseManager):
         if (Block.objects.there_is_block(user_1=from_user, user_2=to_user)):
             raise ValidationError(_("User cannot like a blocked user."))
 
-        self.create(from_user=from_user, to_user=to_user)
+        with transaction.atomic():
+            self.create(from_user=from_user, to_user=to_user)
 
     def remove_like(self, from_user, to_user):
         self.filter(from_user=from_user, to_user=to_user).delete()
 
-    def get_like_list_to_queryset(self, user):
-        from speedy.net.accounts.models import SiteProfile as SpeedyNetSiteProfile
-        from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
+    def mark_viewed(self, user):
+        from .models import UserLikeCounters
 
-        SiteProfile = get_site_profile_model()
-
-        # filter out users that are only active in another language
-        liked_users = User.objects.filter(pk__in=self.filter(from_user=user).values_list('to_user_id', flat=True))
-        liked_users = [u.pk for u in liked_users if (u.speedy_match_profile.is_active)]
+        with transaction.atomic():
+            self.filter(to_user=user, date_viewed__isnull=True).update(date_viewed=now())
+            UserLikeCounters.objects.reset_new_likes(user=user)
 
-        return self.filter(from_user=user).filter(to_user__in=liked_users).prefetch_related("to_user", "to_user__{}".format(SpeedyNetSiteProfile.RELATED_NAME), "to_user__{}".format(SpeedyMatchSiteProfile.RELATED_NAME)).distinct().order_by('-to_user__{}__last_visit'.format(SiteProfile.RELATED_NAME))
-
-    def get_like_list_from_queryset(self, user):
+    def _get_like_list_queryset(self, user_field_name):
+        # Only users who are active in the current language are displayed. They are filtered in SQL, so pagination queries only one page of likes.
         from speedy.net.accounts.models import SiteProfile as SpeedyNetSiteProfile
         from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
 
         SiteProfile = get_site_profile_model()
 
-        # filter out users that are only active in another language
-        who_likes_me = User.objects.filter(pk__in=self.filter(to_user=user).values_list('from_user_id', flat=True))
-        who_likes_me = [u.pk for u in who_likes_me if (u.speedy_match_profile.is_active)]
+        return self.filter(**{
+            '{}__is_active'.format(user_field_name): True,
+            '{}__{}__active_languages__contains'.format(user_field_name, SpeedyMatchSiteProfile.RELATED_NAME): [get_language()],
+        }).select_related(
+            user_field_name,
+            "{}__{}".format(user_field_name, SpeedyNetSiteProfile.RELATED_NAME),
+            "{}__{}".format(user_field_name, SpeedyMatchSiteProfile.RELATED_NAME),
+        ).order_by('-{}__{}__last_visit'.format(user_field_name, SiteProfile.RELATED_NAME), '-pk')
 
-        return self.filter(to_user=user).filter(from_user__in=who_likes_me).prefetch_related("from_user", "from_user__{}".format(SpeedyNetSiteProfile.RELATED_NAME), "from_user__{}".format(SpeedyMatchSiteProfile.RELATED_NAME)).distinct().order_by('-from_user__{}__last_visit'.format(SiteProfile.RELATED_NAME))
+    def get_like_list_to_queryset(self, user):
+        return self._get_like_list_queryset(user_field_name='to_user').filter(from_user=user)
+
+    def get_like_list_from_queryset(self, user):
+        return self._get_like_list_queryset(user_field_name='from_user').filter(to_user=user)
 
     def get_like_list_mutual_queryset(self, user):
-        from speedy.net.accounts.models import SiteProfile as SpeedyNetSiteProfile
+        return self._get_like_list_queryset(user_field_name='to_user').filter(from_user=user, to_user__in=self.filter(to_user=user).values('from_user'))
+
+
+class UserLikeCountersManager(BaseManager):
+    def get_counters(self, user):
+        # Returns an unsaved instance with all the counters 0 if the user has no counters yet.
+        counters = self.filter(user_id=user.pk).first()
+        if (counters is None):
+            counters = self.model(user_id=user.pk)
+        return counters
+
+    def get_number_of_new_likes(self, user):
+        # Displayed in the menu on every page, so it's cached until it changes.
+        cache_key = NUMBER_OF_NEW_LIKES_CACHE_KEY.format(user_id=user.pk)
+        number_of_new_likes = cache.get(cache_key)
+        if (number_of_new_likes is None):
+            number_of_new_likes = self.get_counters(user=user).number_of_new_likes
+            cache.set(cache_key, number_of_new_likes, timeout=NUMBER_OF_NEW_LIKES_CACHE_TIMEOUT)
+        return number_of_new_likes
+
+    def invalidate_number_of_new_likes(self, user_id):
+        # Invalidate again after the transaction is committed, in case another request cached the old number meanwhile.
+        cache_key = NUMBER_OF_NEW_LIKES_CACHE_KEY.format(user_id=user_id)
+        cache.delete(cache_key)
+        transaction.on_commit(lambda: cache.delete(cache_key))
+
+    def add(self, user_id, **counters):
+        # Add to the user's counters atomically, without reading them first.
+        # The counters are created only when adding likes, since likes are also removed while deleting the user.
+        values = {counter: F(counter) + value for counter, value in counters.items()}
+        if ((self.filter(user_id=user_id).update(**values) == 0) and (any(value > 0 for value in counters.values()))):
+            self.get_or_create(user_id=user_id)
+            self.filter(user_id=user_id).update(**values)
+        if (counters.get('number_of_new_likes')):
+            self.invalidate_number_of_new_likes(user_id=user_id)
+
+    def reset_new_likes(self, user):
+        self.filter(user_id=user.pk).update(number_of_new_likes=0)
+        self.invalidate_number_of_new_likes(user_id=user.pk)
+
+
+class LikeNotificationManager(BaseManager):
+    def send_pending(self):
+        """
+        Send the pending like notifications of every user whose oldest pending notification is older than LIKE_NOTIFICATIONS_DIGEST_WINDOW.
+        All the likes which arrived meanwhile are sent in one email. Returns the number of emails sent.
+        If sending to a user fails, it's retried after MAIL_QUEUE_RETRY_DELAY seconds, doubled after each attempt. After MAIL_QUEUE_MAX_ATTEMPTS attempts the notifications are deleted.
+        """
         from speedy.match.accounts.models import SiteProfile as SpeedyMatchSiteProfile
 
-        SiteProfile = get_site_profile_model()
-
-        # filter out users that are only active in another language
-        who_likes_me = User.objects.filter(pk__in=self.filter(to_user=user).values_list('from_user_id', flat=True))
-        who_likes_me = [u.pk for u in who_likes_me if (u.speedy_match_profile.is_active)]
-
-        return self.filter(from_user=user, to_user_id__in=who_likes_me).prefetch_related("to_user", "to_user__{}".format(SpeedyNetSiteProfile.RELATED_NAME), "to_user__{}".format(SpeedyMatchSiteProfile.RELATED_NAME)).distinct().order_by('-to_user__{}__last_visit'.format(SiteProfile.RELATED_NAME))
-
-
+        date_created_before = now() - timedelta(seconds=SpeedyMatchSiteProfile.settings.LIKE_NOTIFICATIONS_DIGEST_WINDOW)
+        users_ids = self.values('to_user').annotate(first_date_created=Min('date_created'), last_date_send_after=Max('date_send_after')).filter(first_date_created__lte=date_created_before, last_date_send_after__lte=now()).order_by('first_date_created').values_list('to_user', flat=True)
+        number_of_emails = 0
+        for user_id in list(users_ids):
+            try:
+                if (self.send_to_user(user_id=user_id)):
+                    number_of_emails += 1
+            except Exception as e:
+                # The notifications are left pending, since the transaction of send_to_user is rolled back.
+                self.postpone(user_id=user_id, error=e)
+        return number_of_emails
+
+    def postpone(self, user_id, error):
+        with transaction.atomic():
+            number_of_attempts = (self.filter(to_user_id=user_id).aggregate(number_of_attempts=Max('number_of_attempts'))['number_of_attempts'] or 0) + 1
+            logger.error("LikeNotificationManager::send_pending::Can't send like notifications to user {} - exception {}, number_of_attempts={}.".format(user_id, error, number_of_attempts))
+            if (number_of_attempts >= django_settings.MAIL_QUEUE_MAX_ATTEMPTS):
+                self.filter(to_user_id=user_id).delete()
+            else:
+                self.filter(to_user_id=user_id).update(number_of_attempts=number_of_attempts, date_send_after=now() + timedelta(seconds=django_settings.MAIL_QUEUE_RETRY_DELAY * 2 ** (number_of_attempts - 1)))
+
+    def send_to_user(self, user_id):
+        from speedy.core.accounts.models import User
+
+        with transaction.atomic():
+            # Notifications locked by another worker are skipped, and will be sent by it.
+            notifications = list(self.select_for_update(skip_locked=True, of=('self',)).filter(to_user_id=user_id).select_related('like__from_user', 'to_user').order_by('date_created'))
+            if (len(notifications) == 0):
+                return False
+            user = notifications[0].to_user
+            likes = [notification.like for notification in notifications]
+            is_sent = False
+            # The user may have turned off like notifications since the likes were added.
+            # This already runs in the background, so the email is sent directly instead of being queued again.
+            if (user.speedy_match_profile.notify_on_like == User.NOTIFICATIONS_ON):
+                with translation.override(notifications[-1].language_code):
+                    if (len(likes) == 1):
+                        is_sent = user.mail_user(template_name_prefix='email/likes/like', context={
+                            'like': likes[0],
+                        }, enqueue=False)
+                    else:
+                        is_sent = user.mail_user(template_name_prefix='email/likes/likes_digest', context={
+                            'likes': likes,
+                            'number_of_likes': len(likes),
+                        }, enqueue=False)
+            self.filter(pk__in=[notification.pk for notification in notifications]).delete()
+        return bool(is_sent)
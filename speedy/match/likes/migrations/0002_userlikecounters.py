@@ -0,0 +1,34 @@
+# Generated by Django 2.1.15 on 2026-10-18 23:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import speedy.core.base.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_auto_20261018_2227'),
+        ('likes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLikeCounters',
+            fields=[
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_updated', models.DateTimeField(auto_now=True, db_index=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='like_counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+                ('number_of_likes_from_user', models.IntegerField(default=0, verbose_name='number of users this user likes')),
+                ('number_of_likes_to_user', models.IntegerField(default=0, verbose_name='number of users who like this user')),
+                ('number_of_mutual_likes', models.IntegerField(default=0, verbose_name='number of mutual likes')),
+                ('number_of_new_likes', models.IntegerField(default=0, verbose_name='number of likes this user did not view yet')),
+            ],
+            options={
+                'verbose_name': 'user like counters',
+                'verbose_name_plural': 'user like counters',
+            },
+            bases=(speedy.core.base.models.ValidateModelMixin, models.Model),
+        ),
+    ]
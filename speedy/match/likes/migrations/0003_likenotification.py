@@ -0,0 +1,32 @@
+# Generated by Django 2.1.15 on 2026-10-19 00:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import speedy.core.base.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('likes', '0002_userlikecounters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeNotification',
+            fields=[
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_updated', models.DateTimeField(auto_now=True, db_index=True)),
+                ('like', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='likes.UserLike', verbose_name='like')),
+                ('language_code', models.CharField(choices=[('en', 'English'), ('he', 'Hebrew')], max_length=2, verbose_name='language code')),
+                ('to_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='to user')),
+            ],
+            options={
+                'verbose_name': 'like notification',
+                'verbose_name_plural': 'like notifications',
+            },
+            bases=(speedy.core.base.models.ValidateModelMixin, models.Model),
+        ),
+    ]
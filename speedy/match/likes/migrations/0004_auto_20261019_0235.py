@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-19 02:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0003_likenotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='likenotification',
+            name='date_send_after',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='send after'),
+        ),
+        migrations.AddField(
+            model_name='likenotification',
+            name='number_of_attempts',
+            field=models.SmallIntegerField(default=0, verbose_name='number of attempts'),
+        ),
+    ]
@@ -1,18 +1,19 @@
 from django.conf import settings as django_settings
-from django.db import models
+from django.db import models, transaction
 from django.dispatch import receiver
-from django.utils.translation import gettext_lazy as _
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _, get_language
 from django.core.exceptions import ValidationError
 
 from speedy.core.base.models import TimeStampedModel
 from speedy.core.accounts.models import User
-from .managers import UserLikeManager
+from .managers import UserLikeManager, UserLikeCountersManager, LikeNotificationManager
 
 
 class UserLike(TimeStampedModel):
     from_user = models.ForeignKey(to=django_settings.AUTH_USER_MODEL, verbose_name=_('from user'), on_delete=models.CASCADE, related_name='likes_from_user')
     to_user = models.ForeignKey(to=django_settings.AUTH_USER_MODEL, verbose_name=_('to user'), on_delete=models.CASCADE, related_name='likes_to_user')
-    date_viewed = models.DateTimeField(blank=True, null=True, db_index=True)  # May be used later.
+    date_viewed = models.DateTimeField(blank=True, null=True, db_index=True)  # Set when to_user views the list of users who like them.
 
     objects = UserLikeManager()
 
@@ -31,14 +32,86 @@ class UserLike(TimeStampedModel):
         return super().save(*args, **kwargs)
 
 
+class UserLikeCounters(TimeStampedModel):
+    # Updated on every like and unlike, and repaired by the update_like_counters command.
+    user = models.OneToOneField(to=django_settings.AUTH_USER_MODEL, verbose_name=_('user'), primary_key=True, on_delete=models.CASCADE, related_name='like_counters')
+    number_of_likes_from_user = models.IntegerField(verbose_name=_('number of users this user likes'), default=0)
+    number_of_likes_to_user = models.IntegerField(verbose_name=_('number of users who like this user'), default=0)
+    number_of_mutual_likes = models.IntegerField(verbose_name=_('number of mutual likes'), default=0)
+    number_of_new_likes = models.IntegerField(verbose_name=_('number of likes this user did not view yet'), default=0)
+
+    objects = UserLikeCountersManager()
+
+    class Meta:
+        verbose_name = _('user like counters')
+        verbose_name_plural = _('user like counters')
+
+    def __str__(self):
+        return "Like counters of user {}".format(self.user_id)
+
+
+def update_like_counters(like, value, is_mutual):
+    # Add value (1 or -1) to the counters of both users of this like.
+    with transaction.atomic():
+        UserLikeCounters.objects.add(user_id=like.from_user_id, number_of_likes_from_user=value)
+        UserLikeCounters.objects.add(user_id=like.to_user_id, number_of_likes_to_user=value, number_of_new_likes=(value if (like.date_viewed is None) else 0))
+        if (is_mutual):
+            UserLikeCounters.objects.add(user_id=like.from_user_id, number_of_mutual_likes=value)
+            UserLikeCounters.objects.add(user_id=like.to_user_id, number_of_mutual_likes=value)
+
+
+def get_reverse_like_id(like):
+    return UserLike.objects.filter(from_user_id=like.to_user_id, to_user_id=like.from_user_id).values_list('pk', flat=True).first()
+
+
+@receiver(signal=models.signals.post_save, sender=UserLike)
+def update_like_counters_on_like(sender, instance: UserLike, created, **kwargs):
+    if (created):
+        update_like_counters(like=instance, value=1, is_mutual=(get_reverse_like_id(like=instance) is not None))
+
+
+@receiver(signal=models.signals.pre_delete, sender=UserLike)
+def get_reverse_like_before_unlike(sender, instance: UserLike, **kwargs):
+    instance._reverse_like_id = get_reverse_like_id(like=instance)
+
+
+@receiver(signal=models.signals.post_delete, sender=UserLike)
+def update_like_counters_on_unlike(sender, instance: UserLike, **kwargs):
+    # If both likes of a mutual like are deleted together (when deleting a user), only one of them decreases the number of mutual likes.
+    reverse_like_id = getattr(instance, '_reverse_like_id', None)
+    is_mutual = ((reverse_like_id is not None) and ((UserLike.objects.filter(pk=reverse_like_id).exists()) or (instance.pk < reverse_like_id)))
+    update_like_counters(like=instance, value=-1, is_mutual=is_mutual)
+
+
+class LikeNotification(TimeStampedModel):
+    # A like which to_user has to be notified about by email. Sent by the send_like_notifications command, which coalesces the likes of each user into one email.
+    like = models.OneToOneField(to=UserLike, verbose_name=_('like'), primary_key=True, on_delete=models.CASCADE, related_name='+')
+    to_user = models.ForeignKey(to=django_settings.AUTH_USER_MODEL, verbose_name=_('to user'), on_delete=models.CASCADE, related_name='+')
+    language_code = models.CharField(verbose_name=_('language code'), max_length=2, choices=django_settings.LANGUAGES)
+    number_of_attempts = models.SmallIntegerField(verbose_name=_('number of attempts'), default=0)
+    date_send_after = models.DateTimeField(verbose_name=_('send after'), default=now)
+
+    objects = LikeNotificationManager()
+
+    class Meta:
+        verbose_name = _('like notification')
+        verbose_name_plural = _('like notifications')
+
+    def __str__(self):
+        return "Notify user {} about like {}".format(self.to_user_id, self.like_id)
+
+
 @receiver(signal=models.signals.post_save, sender=UserLike)
-def mail_user_on_new_message(sender, instance: UserLike, created, **kwargs):
+def notify_user_on_new_like(sender, instance: UserLike, created, **kwargs):
     if (not (created)):
         return
     user = instance.to_user
     if (user.speedy_match_profile.notify_on_like == User.NOTIFICATIONS_ON):
-        user.mail_user(template_name_prefix='email/likes/like', context={
-            'like': instance,
-        })
+        if (django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS.LIKE_NOTIFICATIONS_DIGEST_ENABLED):
+            LikeNotification.objects.create(like=instance, to_user_id=instance.to_user_id, language_code=(get_language() or django_settings.LANGUAGE_CODE))
+        else:
+            user.mail_user(template_name_prefix='email/likes/like', context={
+                'like': instance,
+            })
 
 
@@ -0,0 +1,12 @@
+from django import template
+
+from speedy.match.likes.models import UserLikeCounters
+
+register = template.Library()
+
+
+@register.simple_tag
+def new_likes_count(user):
+    return UserLikeCounters.objects.get_number_of_new_likes(user=user)
+
+
@@ -0,0 +1,192 @@
+from io import StringIO
+
+from django.conf import settings as django_settings
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils.timezone import now
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("Connection refused.")
+
+
+if (django_settings.LOGIN_ENABLED):
+    from speedy.core.base.test.models import SiteTestCase
+    from speedy.core.base.test.decorators import only_on_speedy_match
+    from speedy.core.base.test.utils import get_django_settings_class_with_override_settings
+    from speedy.core.accounts.models import User
+    from speedy.core.base.models import OutgoingEmail
+    from speedy.core.blocks.models import Block
+    from speedy.match.likes.models import UserLike, UserLikeCounters, LikeNotification
+    from speedy.core.accounts.test.user_factories import ActiveUserFactory
+
+
+    @only_on_speedy_match
+    class UserLikeCountersTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = ActiveUserFactory()
+            self.user_2 = ActiveUserFactory()
+            self.user_3 = ActiveUserFactory()
+
+        def assert_counters(self, user, number_of_likes_from_user, number_of_likes_to_user, number_of_mutual_likes, number_of_new_likes):
+            counters = UserLikeCounters.objects.get_counters(user=user)
+            self.assertEqual(first=counters.number_of_likes_from_user, second=number_of_likes_from_user)
+            self.assertEqual(first=counters.number_of_likes_to_user, second=number_of_likes_to_user)
+            self.assertEqual(first=counters.number_of_mutual_likes, second=number_of_mutual_likes)
+            self.assertEqual(first=counters.number_of_new_likes, second=number_of_new_likes)
+
+        def test_user_without_likes(self):
+            self.assert_counters(user=self.user_1, number_of_likes_from_user=0, number_of_likes_to_user=0, number_of_mutual_likes=0, number_of_new_likes=0)
+            self.assertEqual(first=UserLikeCounters.objects.count(), second=0)
+
+        def test_add_and_remove_likes(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_2)
+            self.assert_counters(user=self.user_1, number_of_likes_from_user=1, number_of_likes_to_user=0, number_of_mutual_likes=0, number_of_new_likes=0)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=0, number_of_likes_to_user=2, number_of_mutual_likes=0, number_of_new_likes=2)
+            UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+            self.assert_counters(user=self.user_1, number_of_likes_from_user=1, number_of_likes_to_user=1, number_of_mutual_likes=1, number_of_new_likes=1)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=1, number_of_likes_to_user=2, number_of_mutual_likes=1, number_of_new_likes=2)
+            UserLike.objects.remove_like(from_user=self.user_1, to_user=self.user_2)
+            self.assert_counters(user=self.user_1, number_of_likes_from_user=0, number_of_likes_to_user=1, number_of_mutual_likes=0, number_of_new_likes=1)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=1, number_of_likes_to_user=1, number_of_mutual_likes=0, number_of_new_likes=1)
+
+        def test_block_removes_like(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+            Block.objects.block(blocker=self.user_1, blocked=self.user_2)
+            self.assert_counters(user=self.user_1, number_of_likes_from_user=0, number_of_likes_to_user=1, number_of_mutual_likes=0, number_of_new_likes=1)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=1, number_of_likes_to_user=0, number_of_mutual_likes=0, number_of_new_likes=0)
+
+        def test_mark_viewed(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.mark_viewed(user=self.user_2)
+            self.assertIsNotNone(obj=UserLike.objects.get(from_user=self.user_1, to_user=self.user_2).date_viewed)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=0, number_of_likes_to_user=1, number_of_mutual_likes=0, number_of_new_likes=0)
+            # Removing a viewed like doesn't change the number of new likes.
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_2)
+            UserLike.objects.remove_like(from_user=self.user_1, to_user=self.user_2)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=0, number_of_likes_to_user=1, number_of_mutual_likes=0, number_of_new_likes=1)
+
+        def test_number_of_new_likes_is_cached(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            self.assertEqual(first=UserLikeCounters.objects.get_number_of_new_likes(user=self.user_2), second=1)
+            with self.assertNumQueries(num=0):
+                self.assertEqual(first=UserLikeCounters.objects.get_number_of_new_likes(user=self.user_2), second=1)
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_2)
+            self.assertEqual(first=UserLikeCounters.objects.get_number_of_new_likes(user=self.user_2), second=2)
+            UserLike.objects.mark_viewed(user=self.user_2)
+            self.assertEqual(first=UserLikeCounters.objects.get_number_of_new_likes(user=self.user_2), second=0)
+
+        def test_delete_user(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+            self.user_1.delete()
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=0, number_of_likes_to_user=0, number_of_mutual_likes=0, number_of_new_likes=0)
+
+        def test_update_like_counters_command(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_1)
+            UserLikeCounters.objects.filter(user=self.user_1).update(number_of_likes_from_user=7, number_of_mutual_likes=0)
+            UserLikeCounters.objects.filter(user=self.user_3).delete()
+            call_command('update_like_counters', stdout=StringIO())
+            self.assert_counters(user=self.user_1, number_of_likes_from_user=1, number_of_likes_to_user=2, number_of_mutual_likes=1, number_of_new_likes=2)
+            self.assert_counters(user=self.user_2, number_of_likes_from_user=1, number_of_likes_to_user=1, number_of_mutual_likes=1, number_of_new_likes=1)
+            self.assert_counters(user=self.user_3, number_of_likes_from_user=1, number_of_likes_to_user=0, number_of_mutual_likes=0, number_of_new_likes=0)
+
+
+    @only_on_speedy_match
+    @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=True))
+    class LikeNotificationTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = ActiveUserFactory()
+            self.user_2 = ActiveUserFactory()
+            self.user_3 = ActiveUserFactory()
+            for user in [self.user_1, self.user_2]:
+                user.email_addresses.first().make_primary()
+
+        @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=False))
+        def test_like_is_sent_immediately_if_digests_are_disabled(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            self.assertEqual(first=len(mail.outbox), second=1)
+            self.assertIn(member=self.user_1.name, container=mail.outbox[0].body)
+            self.assertListEqual(list1=mail.outbox[0].to, list2=[self.user_2.email])
+            self.assertEqual(first=LikeNotification.objects.count(), second=0)
+
+        def test_like_is_not_sent_immediately(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            self.assertEqual(first=len(mail.outbox), second=0)
+            self.assertEqual(first=LikeNotification.objects.filter(to_user=self.user_2).count(), second=1)
+            # The like is still inside the digest window.
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=0)
+            self.assertEqual(first=len(mail.outbox), second=0)
+            self.assertEqual(first=LikeNotification.objects.count(), second=1)
+
+        @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=True, LIKE_NOTIFICATIONS_DIGEST_WINDOW=0))
+        def test_send_one_like(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            call_command('send_like_notifications', stdout=StringIO())
+            self.assertEqual(first=len(mail.outbox), second=1)
+            self.assertIn(member=self.user_1.name, container=mail.outbox[0].body)
+            self.assertListEqual(list1=mail.outbox[0].to, list2=[self.user_2.email])
+            self.assertEqual(first=LikeNotification.objects.count(), second=0)
+
+        @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=True, LIKE_NOTIFICATIONS_DIGEST_WINDOW=0))
+        def test_likes_are_coalesced(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=2)
+            self.assertEqual(first=len(mail.outbox), second=2)
+            digest = [message for message in mail.outbox if (message.to == [self.user_2.email])][0]
+            self.assertIn(member=self.user_1.name, container=digest.body)
+            self.assertIn(member=self.user_3.name, container=digest.body)
+            self.assertTrue(expr=digest.subject.startswith('2 people like you on '))
+            self.assertEqual(first=LikeNotification.objects.count(), second=0)
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=0)
+
+        @override_settings(MAIL_QUEUE_ENABLED=True, SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=True, LIKE_NOTIFICATIONS_DIGEST_WINDOW=0))
+        def test_likes_are_not_queued_again(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_2)
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=1)
+            self.assertEqual(first=len(mail.outbox), second=1)
+            self.assertEqual(first=OutgoingEmail.objects.count(), second=0)
+
+        @override_settings(SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=True, LIKE_NOTIFICATIONS_DIGEST_WINDOW=0))
+        def test_notifications_turned_off(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            self.user_2.speedy_match_profile.notify_on_like = User.NOTIFICATIONS_OFF
+            self.user_2.save_user_and_profile()
+            UserLike.objects.add_like(from_user=self.user_3, to_user=self.user_2)
+            self.assertEqual(first=LikeNotification.objects.count(), second=1)
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=0)
+            self.assertEqual(first=len(mail.outbox), second=0)
+            self.assertEqual(first=LikeNotification.objects.count(), second=0)
+
+        @override_settings(EMAIL_BACKEND='speedy.match.likes.tests.test_models.FailingEmailBackend', MAIL_QUEUE_MAX_ATTEMPTS=2, SPEEDY_MATCH_SITE_PROFILE_SETTINGS=get_django_settings_class_with_override_settings(django_settings_class=django_settings.SPEEDY_MATCH_SITE_PROFILE_SETTINGS, LIKE_NOTIFICATIONS_DIGEST_ENABLED=True, LIKE_NOTIFICATIONS_DIGEST_WINDOW=0))
+        def test_failed_notifications_are_retried_later(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.add_like(from_user=self.user_2, to_user=self.user_1)
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=0)
+            self.assertEqual(first=LikeNotification.objects.filter(number_of_attempts=1).count(), second=2)
+            # Not retried before date_send_after.
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=0)
+            self.assertEqual(first=LikeNotification.objects.filter(number_of_attempts=1).count(), second=2)
+            LikeNotification.objects.update(date_send_after=now())
+            self.assertEqual(first=LikeNotification.objects.send_pending(), second=0)
+            # Deleted after MAIL_QUEUE_MAX_ATTEMPTS attempts.
+            self.assertEqual(first=LikeNotification.objects.count(), second=0)
+
+        def test_unlike_removes_notification(self):
+            UserLike.objects.add_like(from_user=self.user_1, to_user=self.user_2)
+            UserLike.objects.remove_like(from_user=self.user_1, to_user=self.user_2)
+            self.assertEqual(first=LikeNotification.objects.count(), second=0)
+
+
@@ -5,7 +5,7 @@ if (django_settings.LOGIN_ENABLED):
     from speedy.core.base.test.models import SiteTestCase
     from speedy.core.base.test.decorators import only_on_speedy_match
     from speedy.match.likes.test.factories import UserLikeFactory
-    from speedy.match.likes.models import UserLike
+    from speedy.match.likes.models import UserLike, UserLikeCounters
     from speedy.core.accounts.test.user_factories import ActiveUserFactory
 
 
@@ -97,4 +97,38 @@ if (django_settings.LOGIN_ENABLED):
             self.assertEqual(first=r.status_code, second=200)
             self.assertSetEqual(set1=set(r.context['object_list']), set2=self.mutual_likes)
 
+        def test_users_who_are_not_active_in_this_language_are_not_displayed(self):
+            inactive_like = list(self.to_likes - self.mutual_likes)[0]
+            inactive_like.to_user.speedy_match_profile._set_active_languages(languages=set(inactive_like.to_user.speedy_match_profile.active_languages) - {self.language_code})
+            inactive_like.to_user.save_user_and_profile()
+            r = self.client.get(path=self.to_url)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertSetEqual(set1=set(r.context['object_list']), set2=self.to_likes - {inactive_like})
+
+        def test_like_list_is_filtered_in_one_query(self):
+            with self.assertNumQueries(num=1):
+                self.assertSetEqual(set1=set(UserLike.objects.get_like_list_to_queryset(user=self.user)), set2=self.to_likes)
+            with self.assertNumQueries(num=1):
+                self.assertSetEqual(set1=set(UserLike.objects.get_like_list_from_queryset(user=self.user)), set2=self.from_likes)
+            with self.assertNumQueries(num=1):
+                self.assertSetEqual(set1=set(UserLike.objects.get_like_list_mutual_queryset(user=self.user)), set2=self.mutual_likes)
+
+        def test_viewing_who_likes_me_resets_new_likes(self):
+            self.assertEqual(first=UserLikeCounters.objects.get_counters(user=self.user).number_of_new_likes, second=3)
+            r = self.client.get(path=self.to_url)
+            self.assertIn(member='<span class="badge badge-light">3</span>', container=r.content.decode())
+            r = self.client.get(path=self.from_url)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertEqual(first=UserLikeCounters.objects.get_counters(user=self.user).number_of_new_likes, second=0)
+            self.assertEqual(first=UserLike.objects.filter(to_user=self.user, date_viewed__isnull=True).count(), second=0)
+            r = self.client.get(path=self.to_url)
+            self.assertNotIn(member='<span class="badge badge-light">3</span>', container=r.content.decode())
+
+        def test_viewing_who_likes_me_without_new_likes_does_not_update_likes(self):
+            UserLikeCounters.objects.filter(user=self.user).update(number_of_new_likes=0)
+            UserLikeCounters.objects.invalidate_number_of_new_likes(user_id=self.user.pk)
+            r = self.client.get(path=self.from_url)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertEqual(first=UserLike.objects.filter(to_user=self.user, date_viewed__isnull=True).count(), second=3)
+
 
@@ -7,7 +7,7 @@ from rules.contrib.views import PermissionRequiredMixin
 
 from speedy.core.accounts.models import User
 from speedy.core.profiles.views import UserMixin
-from .models import UserLike
+from .models import UserLike, UserLikeCounters
 
 
 class LikeListDefaultRedirectView(UserMixin, generic.RedirectView):
@@ -55,6 +55,13 @@ class LikeListToView(LikeListViewBase):
 class LikeListFromView(LikeListViewBase):
     display = 'from'
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Most of the time there are no new likes, so don't update anything.
+        if (UserLikeCounters.objects.get_number_of_new_likes(user=self.user) > 0):
+            UserLike.objects.mark_viewed(user=self.user)
+        return response
+
     def get_queryset(self):
         return UserLike.objects.get_like_list_from_queryset(user=self.user)
 
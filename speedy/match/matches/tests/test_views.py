@@ -1,10 +1,14 @@
+from datetime import date
+
 from django.conf import settings as django_settings
 
 if (django_settings.LOGIN_ENABLED):
     from speedy.core.base.test import tests_settings
     from speedy.core.base.test.models import SiteTestCase
     from speedy.core.base.test.decorators import only_on_speedy_match
+    from speedy.core.accounts.models import User
     from speedy.core.accounts.test.user_factories import ActiveUserFactory
+    from speedy.match.accounts.candidate_index import get_cached_matches, set_cached_matches, invalidate_cached_matches
 
 
     class EditViewBaseMixin(object):
@@ -49,3 +53,89 @@ if (django_settings.LOGIN_ENABLED):
             return 'matches/settings/about_me.html'
 
 
+    @only_on_speedy_match
+    class MatchesListViewTestCase(SiteTestCase):
+        page_url = '/matches/'
+
+        def set_up(self):
+            super().set_up()
+            self.user = ActiveUserFactory(gender=User.GENDER_MALE, date_of_birth=date(year=1980, month=1, day=1))
+            self.user.speedy_match_profile.gender_to_match = [User.GENDER_FEMALE]
+            self.user.save_user_and_profile()
+            self.client.login(username=self.user.username, password=tests_settings.USER_PASSWORD)
+
+        def create_other_users(self, number_of_users):
+            other_users = []
+            for i in range(number_of_users):
+                other_user = ActiveUserFactory(gender=User.GENDER_FEMALE, date_of_birth=date(year=1982, month=1, day=1))
+                other_user.speedy_match_profile.gender_to_match = [User.GENDER_MALE]
+                other_user.save_user_and_profile()
+                other_users.append(other_user)
+            return other_users
+
+        def test_user_can_access(self):
+            self.create_other_users(number_of_users=3)
+            r = self.client.get(path=self.page_url)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertTemplateUsed(response=r, template_name='matches/match_list.html')
+            self.assertEqual(first=len(r.context['matches_list']), second=3)
+            self.assertNotIn(member='load_more_url', container=r.context)
+
+        def test_first_page_uses_the_cached_matches(self):
+            other_users = self.create_other_users(number_of_users=3)
+            # Matches precomputed by precompute_matches.
+            set_cached_matches(user_id=self.user.pk, language_code=self.language_code, matches=[(other_users[1].pk, 5)])
+            r = self.client.get(path=self.page_url)
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertListEqual(list1=[user.pk for user in r.context['matches_list']], list2=[other_users[1].pk])
+            invalidate_cached_matches(user_ids=[self.user.pk])
+            r = self.client.get(path=self.page_url)
+            self.assertEqual(first=len(r.context['matches_list']), second=3)
+            self.assertEqual(first=len(get_cached_matches(user_id=self.user.pk, language_code=self.language_code)), second=3)
+
+        def test_load_more(self):
+            other_users = self.create_other_users(number_of_users=26)
+            r = self.client.get(path=self.page_url, data={'cursor': ''})
+            self.assertEqual(first=r.status_code, second=200)
+            matches_ids = [user.pk for user in r.context['matches_list']]
+            self.assertEqual(first=len(matches_ids), second=24)
+            r = self.client.get(path=r.context['load_more_url'])
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertEqual(first=len(r.context['matches_list']), second=2)
+            self.assertNotIn(member='load_more_url', container=r.context)
+            matches_ids += [user.pk for user in r.context['matches_list']]
+            self.assertListEqual(list1=sorted(matches_ids), list2=sorted([other_user.pk for other_user in other_users]))
+
+        def test_first_page_links_to_load_more(self):
+            other_users = self.create_other_users(number_of_users=26)
+            r = self.client.get(path=self.page_url)
+            self.assertEqual(first=r.status_code, second=200)
+            matches_ids = [user.pk for user in r.context['matches_list']]
+            self.assertEqual(first=len(matches_ids), second=24)
+            self.assertFalse(expr=r.context['is_cursor_mode'])
+            self.assertContains(response=r, text=r.context['load_more_url'].replace('&', '&amp;'))
+            self.assertNotContains(response=r, text='page=2')
+            r = self.client.get(path=r.context['load_more_url'])
+            self.assertEqual(first=r.status_code, second=200)
+            self.assertTrue(expr=r.context['is_cursor_mode'])
+            self.assertNotIn(member='load_more_url', container=r.context)
+            matches_ids += [user.pk for user in r.context['matches_list']]
+            self.assertListEqual(list1=sorted(matches_ids), list2=sorted([other_user.pk for other_user in other_users]))
+
+        def test_load_more_is_not_limited_to_the_cached_matches(self):
+            other_users = self.create_other_users(number_of_users=26)
+            r = self.client.get(path=self.page_url)
+            # Only the first 25 matches are cached, as if the cached matches were capped.
+            set_cached_matches(user_id=self.user.pk, language_code=self.language_code, matches=get_cached_matches(user_id=self.user.pk, language_code=self.language_code)[:25])
+            r = self.client.get(path=self.page_url)
+            matches_ids = [user.pk for user in r.context['matches_list']]
+            r = self.client.get(path=r.context['load_more_url'])
+            self.assertEqual(first=len(r.context['matches_list']), second=2)
+            matches_ids += [user.pk for user in r.context['matches_list']]
+            self.assertListEqual(list1=sorted(matches_ids), list2=sorted([other_user.pk for other_user in other_users]))
+
+        def test_load_more_with_invalid_cursor(self):
+            r = self.client.get(path=self.page_url, data={'cursor': 'abc'})
+            self.assertEqual(first=r.status_code, second=404)
+
+
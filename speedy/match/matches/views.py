@@ -1,11 +1,15 @@
 import logging
 
 from django.urls import reverse
+from django.core import signing
 from django.contrib import messages
+from django.http import Http404
 from django.urls import reverse_lazy
 from django.views import generic
 from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
 
 from rules.contrib.views import LoginRequiredMixin
 
@@ -23,6 +27,8 @@ class MatchesListView(LoginRequiredMixin, PaginationMixin, generic.UpdateView):
     paginate_by = page_size
     form_class = SpeedyMatchSettingsMiniForm
     success_url = reverse_lazy('matches:list')
+    cursor_salt = 'speedy.match.matches.views.MatchesListView.cursor'
+    next_cursor = None
 
     def dispatch(self, request, *args, **kwargs):
         if (request.method == 'POST'):
@@ -32,13 +38,34 @@ class MatchesListView(LoginRequiredMixin, PaginationMixin, generic.UpdateView):
     def redirect_on_exception(self):
         return redirect(to='matches:list')
 
+    def encode_cursor(self, cursor):
+        rank, last_visit, user_id = cursor
+        return signing.dumps([rank, last_visit.isoformat(), user_id], salt=self.cursor_salt)
+
+    def decode_cursor(self, value):
+        try:
+            rank, last_visit, user_id = signing.loads(value, salt=self.cursor_salt)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise Http404()
+        return (rank, parse_datetime(last_visit), user_id)
+
     def get_matches_list(self):
         if (self.request.user.is_authenticated):
-            matches_list = SpeedyMatchSiteProfile.objects.get_matches(self.request.user.speedy_match_profile)
+            if (self.is_cursor_mode()):
+                # "Load more" mode - only the next page of matches after the cursor is fetched from the database. An empty cursor returns the first page.
+                cursor = self.request.GET.get('cursor')
+                cursor = (self.decode_cursor(value=cursor) if (cursor) else None)
+                matches_list, self.next_cursor = SpeedyMatchSiteProfile.objects.get_matches_page(user_profile=self.request.user.speedy_match_profile, cursor=cursor, page_size=self.page_size)
+                return matches_list
+            # The cached matches are used if they exist (also if they were precomputed by precompute_matches), and otherwise they are calculated and cached.
+            matches_list = SpeedyMatchSiteProfile.objects.get_matches(self.request.user.speedy_match_profile, from_cache=True)
         else:
             matches_list = []
         return matches_list
 
+    def is_cursor_mode(self):
+        return ('cursor' in self.request.GET)
+
     def get_object_list(self):
         if (self.request.method == 'POST'):
             return []
@@ -54,6 +81,17 @@ class MatchesListView(LoginRequiredMixin, PaginationMixin, generic.UpdateView):
             'matches_list': self.page.object_list,
             'total_number_of_active_members_text': utils.get_total_number_of_active_members_text(),
         })
+        if ((not (self.is_cursor_mode())) and (self.page.number == 1) and (self.page.has_next())):
+            # The next pages are loaded with "Load more", after the last match of the first page. They are fetched from the database, so they are not limited to the cached matches.
+            last_match = self.page.object_list[-1]
+            self.next_cursor = (last_match.speedy_match_profile.rank, last_match.speedy_match_profile.last_visit, last_match.pk)
+        cd.update({
+            'is_cursor_mode': self.is_cursor_mode(),
+        })
+        if (self.next_cursor is not None):
+            cd.update({
+                'load_more_url': '{}?{}'.format(reverse('matches:list'), urlencode({'cursor': self.encode_cursor(cursor=self.next_cursor)})),
+            })
         return cd
 
 
@@ -10,6 +10,16 @@ class SPEEDY_MATCH_SITE_PROFILE_SETTINGS(object):
     MIN_HEIGHT_TO_MATCH = 20  # In cm.
     MAX_HEIGHT_TO_MATCH = 320  # In cm.
 
+    CANDIDATE_INDEX_MAX_AGE = 5 * 60  # In seconds.
+    MATCHES_CACHE_TIMEOUT = 60 * 60  # In seconds.
+
+    MATCHES_INSTRUMENTATION_ENABLED = False
+    MATCHES_INSTRUMENTATION_RING_BUFFER_SIZE = 1000
+
+    # With LIKE_NOTIFICATIONS_DIGEST_ENABLED, like notifications are sent as digests by the send_like_notifications command. Enable it only where "send_like_notifications --worker" runs, otherwise like emails are never sent.
+    LIKE_NOTIFICATIONS_DIGEST_ENABLED = False
+    LIKE_NOTIFICATIONS_DIGEST_WINDOW = 10 * 60  # In seconds. Likes which arrive during this time are sent in one email.
+
     SPEEDY_MATCH_SITE_PROFILE_FORM_FIELDS = [
         [],  # There's no step 0
         [],  # Step 1 = registration form
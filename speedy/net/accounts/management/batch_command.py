@@ -0,0 +1,50 @@
+import time
+
+from django.core.management import BaseCommand
+
+from speedy.net.accounts.models import BatchCommandCheckpoint
+
+
+class BatchCommand(BaseCommand):
+    """
+    A command which processes rows in batches, ordered by primary key.
+    After each batch the last primary key is saved in the database, so an interrupted run (also in another process) continues from there, unless --restart is given.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows in each batch.')
+        parser.add_argument('--dry-run', action='store_true', help="Print what would be done, without changing anything.")
+        parser.add_argument('--restart', action='store_true', help='Start from the first row, ignoring the checkpoint of an interrupted run.')
+
+    def execute(self, *args, **options):
+        self.options = options
+        return super().execute(*args, **options)
+
+    def iterate_batches(self, queryset, name):
+        """
+        Yield lists of the primary keys of the queryset, --batch-size each. Each batch is selected by primary key after the previous batch, so each batch costs the same.
+        """
+        last_pk = (None if (self.options['restart']) else BatchCommandCheckpoint.objects.filter(name=name).values_list('last_pk', flat=True).first())
+        if (last_pk is not None):
+            self.stdout.write("{}: continuing after {}.".format(name, last_pk))
+        number_of_rows, start_time = 0, time.time()
+        while True:
+            batch = queryset.order_by('pk')
+            if (last_pk is not None):
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:self.options['batch_size']])
+            if (len(pks) == 0):
+                break
+            yield pks
+            last_pk = pks[-1]
+            number_of_rows += len(pks)
+            if (not (self.options['dry_run'])):
+                BatchCommandCheckpoint.objects.update_or_create(name=name, defaults={'last_pk': last_pk})
+            self.stdout.write("{name}: {number_of_rows} rows, {rows_per_second:.1f} rows/sec.".format(
+                name=name,
+                number_of_rows=number_of_rows,
+                rows_per_second=number_of_rows / max(time.time() - start_time, 0.001),
+            ))
+        if (not (self.options['dry_run'])):
+            BatchCommandCheckpoint.objects.filter(name=name).delete()
+
+
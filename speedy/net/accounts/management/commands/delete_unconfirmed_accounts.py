@@ -1,35 +1,52 @@
 import logging
 from datetime import timedelta
 
-from django.core.management import BaseCommand
 from django.utils.timezone import now
 
 from speedy.core.accounts.models import User, UserEmailAddress
+from speedy.net.accounts.management.batch_command import BatchCommand
 
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(BatchCommand):
+    help = 'Delete unconfirmed email addresses added more than 10 days ago, and users without a confirmed email address who registered more than 14 days ago.'
+
     def handle(self, *args, **options):
         emails = UserEmailAddress.objects.filter(is_confirmed=False, date_created__lte=(now() - timedelta(days=10)), confirmation_sent__gte=2).exclude(user__is_staff=True)
-        for email in emails:
-            user = email.user
-            if (not (user.is_staff)):
-                if (email.date_created <= now() - timedelta(days=10)):
-                    if ((email.is_confirmed is False) and (email.confirmation_sent >= 2)):
-                        logger.warning("Deleting email {} of user {} - unconfirmed. Confirmation sent {} times, Added on {}.".format(email, user, email.confirmation_sent, email.date_created))
-                        email.delete()
-
+        number_of_deleted_emails = 0
+        for emails_ids in self.iterate_batches(queryset=emails, name='delete_unconfirmed_accounts:emails'):
+            for email in UserEmailAddress.objects.filter(pk__in=emails_ids).select_related('user').order_by('pk'):
+                number_of_deleted_emails += 1
+                if (options['dry_run']):
+                    self.stdout.write("Would delete email {} of user {}.".format(email, email.user))
+                else:
+                    logger.warning("Deleting email {} of user {} - unconfirmed. Confirmation sent {} times, Added on {}.".format(email, email.user, email.confirmation_sent, email.date_created))
+                    email.delete()
+
+        confirmed_users_ids = UserEmailAddress.objects.filter(is_confirmed=True).values('user_id')
         users = User.objects.filter(date_created__lte=(now() - timedelta(days=14)), has_confirmed_email=False).exclude(is_staff=True)
-        for user in users:
-            if (not (user.is_staff)):
-                if (user.date_created <= now() - timedelta(days=14)):
-                    user._update_has_confirmed_email_field()
-                    if (not (user.has_confirmed_email)):
-                        try:
-                            logger.warning("Deleting user {} - no confirmed email. Registered on {}.".format(user, user.date_created))
-                            user.delete()
-                        except Exception as e:
-                            logger.error("Can't delete user {} - exception {}.".format(user, e))
+        if (not (options['dry_run'])):
+            # Users with a confirmed email address whose field is wrong are not deleted, and their field is updated.
+            for user in users.filter(pk__in=confirmed_users_ids):
+                user._update_has_confirmed_email_field()
+        number_of_deleted_users = 0
+        for users_ids in self.iterate_batches(queryset=users.exclude(pk__in=confirmed_users_ids), name='delete_unconfirmed_accounts:users'):
+            for user in User.objects.filter(pk__in=users_ids).order_by('pk'):
+                number_of_deleted_users += 1
+                if (options['dry_run']):
+                    self.stdout.write("Would delete user {}.".format(user))
+                else:
+                    try:
+                        # Users are deleted one by one, since deleting a user deletes their email addresses first.
+                        logger.warning("Deleting user {} - no confirmed email. Registered on {}.".format(user, user.date_created))
+                        user.delete()
+                    except Exception as e:
+                        logger.error("Can't delete user {} - exception {}.".format(user, e))
+        logger.info("delete_unconfirmed_accounts::number_of_deleted_emails={number_of_deleted_emails}, number_of_deleted_users={number_of_deleted_users}, dry_run={dry_run}".format(
+            number_of_deleted_emails=number_of_deleted_emails,
+            number_of_deleted_users=number_of_deleted_users,
+            dry_run=options['dry_run'],
+        ))
 
 
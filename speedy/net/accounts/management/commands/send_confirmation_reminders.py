@@ -1,23 +1,28 @@
 import logging
 from datetime import timedelta
 
-from django.core.management import BaseCommand
 from django.utils.timezone import now
 
 from speedy.core.accounts.models import UserEmailAddress
+from speedy.net.accounts.management.batch_command import BatchCommand
 
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(BatchCommand):
+    help = 'Send a confirmation reminder to unconfirmed email addresses of active users, added more than 5 days ago.'
+
     def handle(self, *args, **options):
-        emails = UserEmailAddress.objects.filter(is_confirmed=False, date_created__lte=(now() - timedelta(days=5)), confirmation_sent__lte=1).exclude(confirmation_token='')
-        for email in emails:
-            user = email.user
-            if (email.date_created <= now() - timedelta(days=5)):
-                if ((email.is_confirmed is False) and (email.confirmation_sent <= 1)):
-                    if (user.is_active):
-                        logger.debug("Sending confirmation to email {} of user {}. Confirmation sent {} times, Added on {}.".format(email, user, email.confirmation_sent, email.date_created))
-                        email.send_confirmation_email()
+        emails = UserEmailAddress.objects.filter(is_confirmed=False, date_created__lte=(now() - timedelta(days=5)), confirmation_sent__lte=1, user__is_active=True).exclude(confirmation_token='')
+        number_of_emails = 0
+        for emails_ids in self.iterate_batches(queryset=emails, name='send_confirmation_reminders'):
+            for email in UserEmailAddress.objects.filter(pk__in=emails_ids).select_related('user').order_by('pk'):
+                number_of_emails += 1
+                logger.debug("Sending confirmation to email {} of user {}. Confirmation sent {} times, Added on {}.".format(email, email.user, email.confirmation_sent, email.date_created))
+                if (options['dry_run']):
+                    self.stdout.write("Would send confirmation to email {} of user {}.".format(email, email.user))
+                else:
+                    email.send_confirmation_email()
+        logger.info("send_confirmation_reminders::number_of_emails={number_of_emails}, dry_run={dry_run}".format(number_of_emails=number_of_emails, dry_run=options['dry_run']))
 
 
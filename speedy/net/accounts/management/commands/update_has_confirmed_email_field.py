@@ -1,18 +1,28 @@
 import logging
-from datetime import timedelta
 
-from django.core.management import BaseCommand
-from django.utils.timezone import now
+from django.db.models import Q
 
 from speedy.core.accounts.models import User, UserEmailAddress
+from speedy.net.accounts.management.batch_command import BatchCommand
 
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(BatchCommand):
+    help = "Update the has_confirmed_email field of the users whose field doesn't match their email addresses."
+
     def handle(self, *args, **options):
-        users = User.objects.all()
-        for user in users:
-            user._update_has_confirmed_email_field()
+        confirmed_users_ids = UserEmailAddress.objects.filter(is_confirmed=True).values('user_id')
+        number_of_updated_users = 0
+        for users_ids in self.iterate_batches(queryset=User.objects.all(), name='update_has_confirmed_email_field'):
+            # The users whose field is wrong are found with one query for the whole batch. Only they are saved, with their profiles.
+            users = User.objects.filter(pk__in=users_ids).filter(Q(has_confirmed_email=False, pk__in=confirmed_users_ids) | (Q(has_confirmed_email=True) & ~Q(pk__in=confirmed_users_ids)))
+            for user in users:
+                number_of_updated_users += 1
+                if (options['dry_run']):
+                    self.stdout.write("Would update has_confirmed_email of user {} to {}.".format(user, not (user.has_confirmed_email)))
+                else:
+                    user._update_has_confirmed_email_field()
+        logger.info("update_has_confirmed_email_field::number_of_updated_users={number_of_updated_users}, dry_run={dry_run}".format(number_of_updated_users=number_of_updated_users, dry_run=options['dry_run']))
 
 
@@ -0,0 +1,28 @@
+# Generated by Django 2.1.15 on 2026-10-19 02:49
+
+from django.db import migrations, models
+import speedy.core.base.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('net_accounts', '0002_auto_20200103_0918'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchCommandCheckpoint',
+            fields=[
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('date_updated', models.DateTimeField(auto_now=True, db_index=True)),
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='name')),
+                ('last_pk', models.CharField(max_length=255, verbose_name='last primary key')),
+            ],
+            options={
+                'verbose_name': 'batch command checkpoint',
+                'verbose_name_plural': 'batch command checkpoints',
+            },
+            bases=(speedy.core.base.models.ValidateModelMixin, models.Model),
+        ),
+    ]
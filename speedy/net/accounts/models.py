@@ -7,6 +7,7 @@ from django.contrib.sites.models import Site
 
 from translated_fields import TranslatedField
 
+from speedy.core.base.models import TimeStampedModel
 from speedy.core.accounts.models import SiteProfileBase, User
 
 logger = logging.getLogger(__name__)
@@ -65,3 +66,16 @@ class SiteProfile(SiteProfileBase):
         pass
 
 
+class BatchCommandCheckpoint(TimeStampedModel):
+    # The last primary key processed by an interrupted run of a batch command (see management/batch_command.py). It's saved in the database, so the next run continues after it also in another process or on another server.
+    name = models.CharField(verbose_name=_('name'), max_length=255, primary_key=True)
+    last_pk = models.CharField(verbose_name=_('last primary key'), max_length=255)
+
+    class Meta:
+        verbose_name = _('batch command checkpoint')
+        verbose_name_plural = _('batch command checkpoints')
+
+    def __str__(self):
+        return "{} continues after {}".format(self.name, self.last_pk)
+
+
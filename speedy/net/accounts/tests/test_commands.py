@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings as django_settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils.timezone import now
+
+if (django_settings.LOGIN_ENABLED):
+    from speedy.core.base.test import tests_settings
+    from speedy.core.base.test.models import SiteTestCase
+    from speedy.core.base.test.decorators import only_on_speedy_net
+    from speedy.core.accounts.models import User, UserEmailAddress
+    from speedy.core.accounts.test.user_factories import ActiveUserFactory
+    from speedy.core.accounts.test.user_email_address_factories import UserEmailAddressFactory
+    from speedy.net.accounts.models import BatchCommandCheckpoint
+
+
+    @only_on_speedy_net
+    class UpdateHasConfirmedEmailFieldCommandTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = ActiveUserFactory()
+            UserEmailAddressFactory(user=self.user_1, is_confirmed=True)
+            self.user_2 = ActiveUserFactory()
+            UserEmailAddressFactory(user=self.user_2, is_confirmed=False)
+            self.user_3 = ActiveUserFactory()
+            UserEmailAddressFactory(user=self.user_3, is_confirmed=True)
+            # Make the fields of users 1 and 2 wrong.
+            User.objects.filter(pk=self.user_1.pk).update(has_confirmed_email=False)
+            User.objects.filter(pk=self.user_2.pk).update(has_confirmed_email=True)
+
+        def assert_has_confirmed_email(self, user_1, user_2, user_3):
+            self.assertEqual(first=User.objects.get(pk=self.user_1.pk).has_confirmed_email, second=user_1)
+            self.assertEqual(first=User.objects.get(pk=self.user_2.pk).has_confirmed_email, second=user_2)
+            self.assertEqual(first=User.objects.get(pk=self.user_3.pk).has_confirmed_email, second=user_3)
+
+        def test_update_has_confirmed_email_field(self):
+            out = StringIO()
+            call_command('update_has_confirmed_email_field', batch_size=1, stdout=out)
+            self.assert_has_confirmed_email(user_1=True, user_2=False, user_3=True)
+            self.assertIn(member='rows/sec', container=out.getvalue())
+            self.assertFalse(expr=BatchCommandCheckpoint.objects.filter(name='update_has_confirmed_email_field').exists())
+
+        def test_dry_run(self):
+            out = StringIO()
+            call_command('update_has_confirmed_email_field', dry_run=True, stdout=out)
+            self.assert_has_confirmed_email(user_1=False, user_2=True, user_3=True)
+            self.assertEqual(first=out.getvalue().count('Would update'), second=2)
+
+        def test_resume_from_checkpoint(self):
+            last_pk = max(self.user_1.pk, self.user_2.pk, self.user_3.pk)
+            BatchCommandCheckpoint.objects.create(name='update_has_confirmed_email_field', last_pk=last_pk)
+            call_command('update_has_confirmed_email_field', stdout=StringIO())
+            self.assert_has_confirmed_email(user_1=False, user_2=True, user_3=True)
+            self.assertFalse(expr=BatchCommandCheckpoint.objects.filter(name='update_has_confirmed_email_field').exists())
+            BatchCommandCheckpoint.objects.create(name='update_has_confirmed_email_field', last_pk=last_pk)
+            call_command('update_has_confirmed_email_field', restart=True, stdout=StringIO())
+            self.assert_has_confirmed_email(user_1=True, user_2=False, user_3=True)
+
+
+    @only_on_speedy_net
+    class UpdateHasConfirmedEmailFieldCommandInAnotherProcessTestCase(TransactionTestCase):
+        # The rows are committed to the database, so the command can see them when it runs in another process.
+        def setUp(self):
+            super().setUp()
+            cache.clear()
+            call_command('load_data', tests_settings.SITES_FIXTURE, verbosity=0)
+            self.users = [ActiveUserFactory() for i in range(3)]
+            for user in self.users:
+                UserEmailAddressFactory(user=user, is_confirmed=True)
+            User.objects.update(has_confirmed_email=False)
+            self.users_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+        def call_command_in_another_process(self, *args):
+            settings_dict = connection.settings_dict
+            env = dict(os.environ, DATABASE_URL='postgres://{user}{password}@{host}:{port}/{name}'.format(
+                user=settings_dict['USER'],
+                password=(':{}'.format(settings_dict['PASSWORD']) if (settings_dict['PASSWORD']) else ''),
+                host=settings_dict['HOST'],
+                port=settings_dict['PORT'],
+                name=settings_dict['NAME'],
+            ))
+            return subprocess.run([sys.executable, str(django_settings.APP_DIR / 'tests_manage.py')] + list(args), env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, check=True).stdout
+
+        def test_resume_from_checkpoint_in_another_process(self):
+            # A run in this process was interrupted after the first user.
+            BatchCommandCheckpoint.objects.create(name='update_has_confirmed_email_field', last_pk=self.users_ids[0])
+            out = self.call_command_in_another_process('update_has_confirmed_email_field', '--batch-size=1')
+            self.assertIn(member='update_has_confirmed_email_field: continuing after {}.'.format(self.users_ids[0]), container=out)
+            self.assertListEqual(list1=[User.objects.get(pk=user_id).has_confirmed_email for user_id in self.users_ids], list2=[False, True, True])
+            self.assertFalse(expr=BatchCommandCheckpoint.objects.filter(name='update_has_confirmed_email_field').exists())
+
+
+    @only_on_speedy_net
+    class SendConfirmationRemindersCommandTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.user_1 = ActiveUserFactory()
+            self.email_1 = UserEmailAddressFactory(user=self.user_1, is_confirmed=False)
+            self.email_2 = UserEmailAddressFactory(user=ActiveUserFactory(), is_confirmed=False)
+            UserEmailAddress.objects.filter(pk=self.email_1.pk).update(date_created=now() - timedelta(days=6))
+
+        def test_send_confirmation_reminders(self):
+            call_command('send_confirmation_reminders', batch_size=1, stdout=StringIO())
+            self.assertEqual(first=len(mail.outbox), second=1)
+            self.assertListEqual(list1=mail.outbox[0].to, list2=[self.email_1.email])
+            self.assertEqual(first=UserEmailAddress.objects.get(pk=self.email_1.pk).confirmation_sent, second=1)
+            self.assertEqual(first=UserEmailAddress.objects.get(pk=self.email_2.pk).confirmation_sent, second=0)
+
+        def test_dry_run(self):
+            out = StringIO()
+            call_command('send_confirmation_reminders', dry_run=True, stdout=out)
+            self.assertEqual(first=len(mail.outbox), second=0)
+            self.assertEqual(first=UserEmailAddress.objects.get(pk=self.email_1.pk).confirmation_sent, second=0)
+            self.assertIn(member='Would send confirmation to email {}'.format(self.email_1.email), container=out.getvalue())
+
+
+    @only_on_speedy_net
+    class DeleteUnconfirmedAccountsCommandTestCase(SiteTestCase):
+        def set_up(self):
+            super().set_up()
+            self.confirmed_user = ActiveUserFactory()
+            UserEmailAddressFactory(user=self.confirmed_user, is_confirmed=True)
+            self.unconfirmed_email = UserEmailAddressFactory(user=self.confirmed_user, is_confirmed=False, confirmation_sent=2)
+            self.unconfirmed_user = ActiveUserFactory()
+            UserEmailAddressFactory(user=self.unconfirmed_user, is_confirmed=False)
+            self.new_user = ActiveUserFactory()
+            UserEmailAddress.objects.update(date_created=now() - timedelta(days=11))
+            User.objects.exclude(pk=self.new_user.pk).update(date_created=now() - timedelta(days=15))
+            # This user's field is wrong, and the user must not be deleted.
+            User.objects.filter(pk=self.confirmed_user.pk).update(has_confirmed_email=False)
+
+        def test_delete_unconfirmed_accounts(self):
+            call_command('delete_unconfirmed_accounts', batch_size=1, stdout=StringIO())
+            self.assertSetEqual(set1=set(User.objects.values_list('pk', flat=True)), set2={self.confirmed_user.pk, self.new_user.pk})
+            self.assertFalse(expr=UserEmailAddress.objects.filter(pk=self.unconfirmed_email.pk).exists())
+            self.assertTrue(expr=User.objects.get(pk=self.confirmed_user.pk).has_confirmed_email)
+
+        def test_dry_run(self):
+            out = StringIO()
+            call_command('delete_unconfirmed_accounts', dry_run=True, stdout=out)
+            self.assertEqual(first=User.objects.count(), second=3)
+            self.assertTrue(expr=UserEmailAddress.objects.filter(pk=self.unconfirmed_email.pk).exists())
+            self.assertIn(member='Would delete user {}'.format(self.unconfirmed_user), container=out.getvalue())
+            self.assertIn(member='Would delete email {}'.format(self.unconfirmed_email), container=out.getvalue())
+
+